@@ -0,0 +1,213 @@
+"""
+Async facade over storage.
+
+Handlers must not call storage.* directly: file/SQLite I/O would block
+the event loop for every other user. Reads run on a bounded thread pool
+(concurrently), writes go through a single writer thread, so they are
+serialized without an asyncio.Lock.
+
+With WRITE_QUEUE_ENABLED, add_registration goes through the write-behind
+RegistrationQueue (batched commits); lookups see queued rows too. Not
+with WORKERS > 1: the queue's duplicate check only covers this process.
+"""
+import asyncio
+import csv
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Set, Tuple
+
+import metrics
+import storage
+from config import (
+    STORAGE_READ_WORKERS,
+    UNSAVED_REGISTRATIONS_PATH,
+    WRITE_QUEUE_ENABLED,
+    WRITE_QUEUE_MAX_BATCH,
+    WRITE_QUEUE_MAX_DELAY_MS,
+    WRITE_QUEUE_MAX_PENDING,
+    WRITE_QUEUE_STOP_TIMEOUT_S,
+    WORKERS,
+)
+from write_queue import RegistrationQueue
+
+_readers = ThreadPoolExecutor(max_workers=STORAGE_READ_WORKERS, thread_name_prefix="storage-read")
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-write")
+_queue: Optional[RegistrationQueue] = None
+_warm: Optional[asyncio.Future] = None
+
+logger = logging.getLogger(__name__)
+
+
+async def _run(executor: ThreadPoolExecutor, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    if not metrics.ENABLED:
+        return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+    # includes the wait for a free thread: that is what the handler feels
+    t0 = time.perf_counter()
+    try:
+        return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+    finally:
+        metrics.observe("bot_storage_seconds", "op", fn.__name__.lstrip("_"), time.perf_counter() - t0)
+
+
+def _find_conflict(telegram_id: str, phone_norm: str) -> Optional[str]:
+    if storage.find_by_telegram_id(telegram_id):
+        return "already_registered_by_tg"
+    if phone_norm and storage.find_by_phone(phone_norm):
+        return "phone_already_used"
+    return None
+
+
+async def _check_committed(telegram_id: str, phone_norm: str) -> Optional[str]:
+    return await _run(_readers, _find_conflict, telegram_id, phone_norm)
+
+
+async def init():
+    """
+    Startup. The store is warmed (file created/migrated, rows loaded or
+    the index opened) in the background, so the bot takes updates right
+    away; storage calls made meanwhile wait for it on the store's lock.
+    """
+    global _queue, _warm
+    if _warm is None:
+        # migration may rewrite the file -> writer
+        _warm = asyncio.ensure_future(_run(_writer, storage.init_storage))
+        _warm.add_done_callback(_warm_done)
+
+    if WRITE_QUEUE_ENABLED and WORKERS == 1 and _queue is None:
+        _queue = RegistrationQueue(
+            commit=commit_registrations,
+            check=_check_committed,
+            max_batch=WRITE_QUEUE_MAX_BATCH,
+            max_delay_s=WRITE_QUEUE_MAX_DELAY_MS / 1000,
+            max_pending=WRITE_QUEUE_MAX_PENDING,
+        )
+        _queue.start()
+
+
+def _warm_done(fut: asyncio.Future):
+    if not fut.cancelled() and fut.exception() is not None:
+        # the store loads itself on first use, that call will raise again
+        logger.error("Storage warm-up failed", exc_info=fut.exception())
+
+
+async def wait_warm():
+    """Until the background warm-up from init() is done (re-raises its error)."""
+    if _warm is not None:
+        await asyncio.shield(_warm)
+
+
+def queue_stats() -> Optional[Dict[str, float]]:
+    return _queue.stats() if _queue is not None else None
+
+
+async def find_by_telegram_id(telegram_id: int) -> Optional[Dict[str, str]]:
+    if _queue is not None:
+        row = _queue.pending_by_telegram_id(telegram_id)
+        if row:
+            return dict(row)
+    return await _run(_readers, storage.find_by_telegram_id, telegram_id)
+
+
+async def find_by_phone(phone: str) -> Optional[Dict[str, str]]:
+    if _queue is not None:
+        row = _queue.pending_by_phone(storage.normalize_phone(phone))
+        if row:
+            return dict(row)
+    return await _run(_readers, storage.find_by_phone, phone)
+
+
+async def registered(kind: str, keys) -> Set[str]:
+    """storage.registered, plus keys of rows still waiting in the write queue."""
+    keys = list(keys)
+    taken = await _run(_readers, storage.registered, kind, keys)
+    if _queue is not None:
+        pending = _queue.pending_by_telegram_id if kind == "telegram_id" else _queue.pending_by_phone
+        taken |= {k for k in keys if pending(k)}
+    return taken
+
+
+async def list_last(limit: int = 20) -> List[Dict[str, str]]:
+    return await _run(_readers, storage.list_last, limit)
+
+
+async def page(before: Optional[int] = None, after: Optional[int] = None,
+               limit: int = 20, query: Optional[str] = None) -> List[Tuple[int, Dict[str, str]]]:
+    return await _run(_readers, storage.page, before=before, after=after, limit=limit, query=query)
+
+
+async def seq_after_date(day: str) -> Optional[int]:
+    return await _run(_readers, storage.seq_after_date, day)
+
+
+async def stats(days: int = 7) -> Dict:
+    return await _run(_readers, storage.stats, days)
+
+
+async def add_registration(telegram_id: int, full_name: str, phone: str, region: str) -> Dict[str, str]:
+    if _queue is not None:
+        return await _queue.submit(telegram_id, full_name, phone, region)
+    return await _run(
+        _writer,
+        storage.add_registration,
+        telegram_id=telegram_id,
+        full_name=full_name,
+        phone=phone,
+        region=region,
+    )
+
+
+async def add_registrations(rows: List[Dict[str, str]]) -> List[Optional[str]]:
+    """A batch (admin import); with the write queue on, checked against its pending sign-ups."""
+    if _queue is not None:
+        return await _queue.add_batch(rows)
+    return await commit_registrations(rows)
+
+
+async def commit_registrations(rows: List[Dict[str, str]]) -> List[Optional[str]]:
+    """Straight to the writer: the write queue's commit (everyone else: add_registrations)."""
+    return await _run(_writer, storage.add_registrations, rows)
+
+
+async def bind_telegram_id_by_phone(telegram_id: int, phone: str) -> bool:
+    return await _run(_writer, storage.bind_telegram_id_by_phone, telegram_id, phone)
+
+
+async def close():
+    """Flush queued registrations, then stop the executors."""
+    global _queue
+    if _warm is not None and not _warm.done():
+        await asyncio.wait([_warm])
+    if _queue is not None:
+        unsaved = await _queue.stop(WRITE_QUEUE_STOP_TIMEOUT_S)
+        _queue = None
+        if unsaved:
+            _spill(unsaved)
+    shutdown()
+
+
+def _spill(rows: List[Dict[str, str]], path: str = UNSAVED_REGISTRATIONS_PATH):
+    """Rows the queue never committed: kept in a side file, or at least in the log."""
+    try:
+        new = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=storage.FIELDNAMES)
+            if new:
+                w.writeheader()
+            w.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        logger.error("%d queued registration(s) were not committed, saved to %s", len(rows), path)
+    except OSError:
+        logger.exception("%d queued registration(s) were not committed and could not be saved", len(rows))
+        for row in rows:
+            logger.error("Unsaved registration: %s", row)
+
+
+def shutdown():
+    # let queued writes finish before the process exits
+    _writer.shutdown(wait=True)
+    _readers.shutdown(wait=True)
@@ -0,0 +1,130 @@
+"""
+Spam wave: a few users hammer the join button / resend their contact
+while normal users register. Compares the anti-flood guard off and on:
+storage calls, replies sent and how long the normal users wait.
+
+    python -m benchmarks.bench_flood --spammers 5 --presses 500 --users 100
+
+Each mode runs in its own process (async_storage pools are per process).
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from keyboards import CTA_JOIN_TEXT, REGIONS
+
+
+async def run(guard: bool, spammers: int, presses: int, users: int, latency_ms: float) -> dict:
+    from telegram import Update
+
+    import async_storage
+    import bot
+    import storage
+    from benchmarks.common import make_csv, percentile
+    from benchmarks.fake_telegram import FakeRequest, make_update, offline_bot
+
+    data_dir = tempfile.mkdtemp(prefix="growz-flood-")
+    offline_bot(data_dir, storage.RegistrationStore(make_csv(os.path.join(data_dir, "registrations.csv"), 10_000)))
+    bot.THROTTLE_ENABLED = guard
+
+    # count every call that reaches the store
+    calls: Counter = Counter()
+    for name in ("find_by_telegram_id", "find_by_phone", "add_registrations", "bind_telegram_id_by_phone"):
+        fn = getattr(storage._store, name)
+
+        def counted(*a, _fn=fn, _name=name, **kw):
+            calls[_name] += 1
+            return _fn(*a, **kw)
+        setattr(storage._store, name, counted)
+
+    fake = FakeRequest(latency_s=latency_ms / 1000, keep_calls=10 ** 7)
+    app = bot.build_application(request=fake)
+    await app.initialize()
+    await app.post_init(app)
+    await async_storage.wait_warm()  # steady state, not the background warm-up
+    await app.start()
+
+    spam = []
+    for s in range(spammers):
+        uid = 6_000_000 + s
+        spam.append(make_update(uid, text="/start"))
+        for k in range(presses):
+            spam.append(make_update(uid, text=CTA_JOIN_TEXT) if k % 2 == 0
+                        else make_update(uid, phone=f"+99893{s:07d}"))
+
+    done_at = {}
+    normal_ids = [7_500_000 + i for i in range(users)]
+    t0 = time.perf_counter()
+
+    async def normal_user(i: int, uid: int):
+        steps = [make_update(uid, text="/start"), make_update(uid, text=CTA_JOIN_TEXT),
+                 make_update(uid, text="Aliyev Sardor"), make_update(uid, phone=f"+99894{i:07d}"),
+                 make_update(uid, text=REGIONS[i % len(REGIONS)])]
+        for u in steps:
+            await app.update_queue.put(Update.de_json(u, app.bot))
+            await asyncio.sleep(0.05)  # a human, not a script
+
+    async def spammer():
+        for u in spam:
+            await app.update_queue.put(Update.de_json(u, app.bot))
+
+    await asyncio.gather(spammer(), *(normal_user(i, u) for i, u in enumerate(normal_ids)))
+    while len(done_at) < users and time.perf_counter() - t0 < 300:
+        for uid in normal_ids:
+            if uid not in done_at and any("Rahmat" in (p.get("text") or "") for p in fake.sent_to(uid)):
+                done_at[uid] = time.perf_counter() - t0
+        await asyncio.sleep(0.05)
+    wall = time.perf_counter() - t0
+
+    await app.stop()
+    await app.post_stop(app)
+    await app.shutdown()
+    await app.post_shutdown(app)
+
+    spam_ids = {6_000_000 + s for s in range(spammers)}
+    spam_replies = sum(len(fake.sent_to(uid)) for uid in spam_ids)
+    return {
+        "guard": guard, "spam_updates": len(spam), "wall_s": wall,
+        "storage_calls": sum(calls.values()), "replies_to_spammers": spam_replies,
+        "registered": len(done_at), "users": users,
+        "p50_done_s": percentile(list(done_at.values()), 50),
+        "p95_done_s": percentile(list(done_at.values()), 95),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--guard", choices=["off", "on"], default=None)
+    ap.add_argument("--spammers", type=int, default=5)
+    ap.add_argument("--presses", type=int, default=500)
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--latency-ms", type=float, default=30)
+    args = ap.parse_args()
+
+    if args.guard:
+        r = asyncio.run(run(args.guard == "on", args.spammers, args.presses, args.users, args.latency_ms))
+        print(json.dumps(r))
+        return
+
+    print(f"{'guard':>5} {'spam upd':>9} {'storage calls':>14} {'spam replies':>13} "
+          f"{'registered':>11} {'p50 s':>6} {'p95 s':>6}")
+    for mode in ("off", "on"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_flood", "--guard", mode,
+             "--spammers", str(args.spammers), "--presses", str(args.presses),
+             "--users", str(args.users), "--latency-ms", str(args.latency_ms)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:>5} {r['spam_updates']:>9} {r['storage_calls']:>14} {r['replies_to_spammers']:>13} "
+              f"{r['registered']:>7}/{r['users']} {r['p50_done_s']:>6.2f} {r['p95_done_s']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Admin bulk import (importer.py) vs. adding the same spreadsheet one
+storage.add_registration() at a time.
+
+The file has K rows in spreadsheet spelling ("+998 90 ...", lower-case
+regions, Farg'ona with a plain apostrophe); 10% repeat a registered
+phone, 5% repeat a row of the file, 5% have a one-word name.
+
+    python -m benchmarks.bench_import --sizes 100000 1000000 --rows 10000
+
+    read     pandas read_csv / read_excel
+    check    normalize + validate + hash lookups against the registry
+    commit   one add_registrations() batch
+    rowwise  per row: the bot's checks + add_registration (fsync each)
+"""
+import argparse
+import csv
+import importlib
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.common import make_csv, phone_for
+from keyboards import REGIONS
+
+
+def make_sheet(path: str, n_existing: int, k: int, fmt: str = "csv", seed: int = 2) -> str:
+    rnd = random.Random(seed)
+    rows = []
+    for j in range(k):
+        i = n_existing + 100_000 + j
+        roll = rnd.random()
+        if roll < 0.10:
+            i = rnd.randrange(n_existing)  # already registered
+        elif roll < 0.15 and rows:
+            rows.append(rnd.choice(rows))  # same person twice in the file
+            continue
+        name = "Aliyev" if roll > 0.95 else "Aliyev Sardor"
+        phone = phone_for(i)
+        region = rnd.choice(REGIONS).lower().replace("‘", "'")
+        rows.append([name, f"+{phone[:3]} {phone[3:5]} {phone[5:]}", region])
+    header = ["full_name", "phone", "region"]
+    if fmt == "xlsx":
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(header)
+        for r in rows:
+            ws.append(r)
+        wb.save(path)
+        return path
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        w = csv.writer(f)
+        w.writerow(header)
+        w.writerows(rows)
+    return path
+
+
+def bench_batch(path: str, sheet: str, fmt: str) -> dict:
+    import importer
+    import storage
+
+    storage._store = storage.RegistrationStore(path)
+    storage._store.warm()
+
+    t0 = time.perf_counter()
+    df = importer.read_table(sheet, fmt)
+    t1 = time.perf_counter()
+    rows, _, rejected = importer.check(df, storage.registered)
+    t2 = time.perf_counter()
+    errors = storage.add_registrations(rows)
+    t3 = time.perf_counter()
+    return {"read_s": t1 - t0, "check_s": t2 - t1, "commit_s": t3 - t2,
+            "accepted": errors.count(None), "rejected": len(rejected) + len(errors) - errors.count(None)}
+
+
+def bench_rowwise(path: str, sheet: str, limit: int) -> dict:
+    # what an admin script calling the single-row API would do
+    import bot
+    import storage
+
+    storage._store = storage.RegistrationStore(path)
+    storage._store.warm()
+    regions = {r.casefold().replace("‘", "'"): r for r in REGIONS}
+
+    with open(sheet, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))[1:limit + 1]
+    accepted = 0
+    t0 = time.perf_counter()
+    for name, phone, region in rows:
+        region = regions.get(region.strip().casefold())
+        if not bot._is_valid_full_name(name) or not region:
+            continue
+        try:
+            storage.add_registration(None, name, phone, region)
+            accepted += 1
+        except ValueError:
+            pass
+    return {"rowwise_s": time.perf_counter() - t0, "rowwise_rows": len(rows), "rowwise_accepted": accepted}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000], help="registry rows")
+    ap.add_argument("--rows", type=int, default=10_000, help="rows in the imported file")
+    ap.add_argument("--format", choices=["csv", "xlsx"], default="csv")
+    ap.add_argument("--rowwise-limit", type=int, default=2_000,
+                    help="rows timed one by one (scaled to --rows in the table)")
+    args = ap.parse_args()
+    # imports (bot, pandas: lazy in importer.py) are not part of the timings
+    for module in ("bot", "pandas"):
+        importlib.import_module(module)
+
+    print(f"{'registry':>9} {'file':>6} {'read s':>7} {'check s':>8} {'commit s':>9} {'batch s':>8} "
+          f"{'ok':>6} {'bad':>5} {'rowwise s':>10} {'speedup':>8}")
+    for n in args.sizes:
+        d = tempfile.mkdtemp(prefix="growz-import-")
+        try:
+            src = make_csv(os.path.join(d, "source.csv"), n)
+            sheet = make_sheet(os.path.join(d, "sheet." + args.format), n, args.rows, args.format)
+            path = os.path.join(d, "registrations.csv")
+
+            shutil.copy(src, path)
+            b = bench_batch(path, sheet, args.format)
+            batch_s = b["read_s"] + b["check_s"] + b["commit_s"]
+
+            rowwise_s = float("nan")
+            if args.format == "csv" and args.rowwise_limit:
+                shutil.copy(src, path)
+                r = bench_rowwise(path, sheet, args.rowwise_limit)
+                rowwise_s = r["rowwise_s"] * args.rows / max(r["rowwise_rows"], 1)
+            print(f"{n:>9} {args.rows:>6} {b['read_s']:>7.2f} {b['check_s']:>8.2f} {b['commit_s']:>9.2f} "
+                  f"{batch_s:>8.2f} {b['accepted']:>6} {b['rejected']:>5} {rowwise_s:>10.2f} "
+                  f"{rowwise_s / batch_s:>7.0f}x")
+        finally:
+            shutil.rmtree(d, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Cold start and lookups with the mmap index (STORAGE_MMAP_INDEX) vs. the
+registry loaded into memory:
+
+    memory   RegistrationStore.warm() reads every row
+    build    first start with the index on: builds registrations.csv.idx
+    index    later starts: maps the existing index, reads no rows
+
+    python -m benchmarks.bench_index --sizes 100000 1000000
+
+Each mode runs in its own process so start time and RSS are its own.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_csv, percentile, phone_for, tg_id_for
+from benchmarks.bench_memory import _rss_kb
+
+
+def _timed(fn, reps: int) -> float:
+    samples = []
+    for k in range(reps):
+        t0 = time.perf_counter()
+        fn(k)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return percentile(samples, 50)
+
+
+def child(mode: str, path: str, n: int) -> dict:
+    import storage
+
+    base = n + {"memory": 0, "build": 1000, "index": 2000}[mode]  # new sign-ups, unique per mode
+    rss0 = _rss_kb()
+    t0 = time.perf_counter()
+    store = storage.RegistrationStore(path, mmap_index=mode != "memory")
+    store.warm()
+    start_s = time.perf_counter() - t0
+    rss1 = _rss_kb()
+
+    out = {
+        "mode": mode, "rows": n, "start_s": start_s, "rss_mb": (rss1 - rss0) / 1024,
+        "find_phone_hit_us": _timed(lambda k: store.find_by_phone(phone_for(k * 7919 % n)), 2000),
+        "find_phone_miss_us": _timed(lambda k: store.find_by_phone(phone_for(n + 10_000 + k)), 2000),
+        "find_tg_hit_us": _timed(lambda k: store.find_by_telegram_id(tg_id_for(k * 7919 % n)), 2000),
+        "add_us": _timed(lambda k: store.add_registration(
+            tg_id_for(base + k), "Aliyev Sardor", phone_for(base + k), "Samarqand"), 200),
+        "rss_after_mb": (_rss_kb() - rss0) / 1024,
+    }
+    if mode != "memory":
+        t0 = time.perf_counter()
+        store._disk.compact()
+        out["compact_s"] = time.perf_counter() - t0
+        out["index_mb"] = os.path.getsize(store._disk.path) / 2 ** 20
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    ap.add_argument("--child", nargs=3, metavar=("MODE", "PATH", "N"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        mode, path, n = args.child
+        print(json.dumps(child(mode, path, int(n))))
+        return
+
+    print(f"{'mode':>7} {'rows':>9} {'start s':>8} {'RSS MB':>7} {'after':>6} {'phone hit':>10} "
+          f"{'miss':>6} {'tg hit':>7} {'add us':>7} {'compact s':>10}")
+    for n in args.sizes:
+        d = tempfile.mkdtemp(prefix="growz-idx-")
+        try:
+            src = make_csv(os.path.join(d, "source.csv"), n)
+            for mode in ("memory", "build", "index"):
+                if mode != "index":
+                    # fresh copy: adds from the previous mode must not leak in
+                    for name in os.listdir(d):
+                        if name.startswith("registrations.csv"):
+                            os.remove(os.path.join(d, name))
+                    shutil.copy(src, os.path.join(d, "registrations.csv"))
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_index", "--child", mode,
+                     os.path.join(d, "registrations.csv"), str(n)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                print(f"{r['mode']:>7} {r['rows']:>9} {r['start_s']:>8.2f} {r['rss_mb']:>7.1f} "
+                      f"{r['rss_after_mb']:>6.1f} {r['find_phone_hit_us']:>10.1f} {r['find_phone_miss_us']:>6.1f} "
+                      f"{r['find_tg_hit_us']:>7.1f} {r['add_us']:>7.0f} {r.get('compact_s', 0):>10.2f}")
+        finally:
+            shutil.rmtree(d, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Event-loop lag under a burst of concurrent /start lookups.
+
+    python -m benchmarks.bench_loop_lag --updates 500 --disk-ms 2
+
+"sync" calls storage.find_by_telegram_id inside the coroutine (old
+handlers), "async" goes through async_storage. --disk-ms adds a blocking
+sleep per storage call to emulate a slow disk. Lag = how late a 1 ms
+ticker wakes up while the burst is being served.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import time
+
+import async_storage
+import storage
+from benchmarks.common import tmp_csv, percentile, tg_id_for
+
+
+class SlowDisk:
+    def __init__(self, store, delay_s: float):
+        self._store = store
+        self._delay_s = delay_s
+
+    def __getattr__(self, name):
+        fn = getattr(self._store, name)
+
+        def wrapper(*args, **kwargs):
+            time.sleep(self._delay_s)
+            return fn(*args, **kwargs)
+        return wrapper
+
+
+async def _ticker(stop: asyncio.Event, lags: list):
+    interval = 0.001
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - t0 - interval) * 1000)
+
+
+async def _start_sync(tg_id: int):
+    storage.find_by_telegram_id(tg_id)
+    await asyncio.sleep(0)  # reply_text
+
+
+async def _start_async(tg_id: int):
+    await async_storage.find_by_telegram_id(tg_id)
+    await asyncio.sleep(0)
+
+
+async def burst(mode: str, updates: int, rows: int) -> dict:
+    handler = _start_sync if mode == "sync" else _start_async
+    stop = asyncio.Event()
+    lags: list = []
+    tick = asyncio.create_task(_ticker(stop, lags))
+    await asyncio.sleep(0.01)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(handler(tg_id_for(i % rows)) for i in range(updates)))
+    wall = time.perf_counter() - t0
+
+    stop.set()
+    await tick
+    return {
+        "mode": mode,
+        "wall_s": wall,
+        "lag_p50_ms": percentile(lags, 50),
+        "lag_p99_ms": percentile(lags, 99),
+        "lag_max_ms": max(lags) if lags else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--updates", type=int, default=500)
+    ap.add_argument("--disk-ms", type=float, default=2.0)
+    args = ap.parse_args()
+
+    path = tmp_csv(args.rows)
+    try:
+        store = storage.RegistrationStore(path)
+        store.find_by_telegram_id(0)  # warm load, not part of the burst
+        storage._store = SlowDisk(store, args.disk_ms / 1000) if args.disk_ms else store
+
+        print(f"{'mode':>6} {'wall s':>8} {'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+        for mode in ("sync", "async"):
+            r = asyncio.run(burst(mode, args.updates, args.rows))
+            print(f"{r['mode']:>6} {r['wall_s']:>8.2f} {r['lag_p50_ms']:>8.2f} "
+                  f"{r['lag_p99_ms']:>8.2f} {r['lag_max_ms']:>8.2f}")
+    finally:
+        async_storage.shutdown()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
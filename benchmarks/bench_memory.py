@@ -0,0 +1,130 @@
+"""
+Resident memory and load time of the in-memory registry: the old
+dict-of-five-strings per row vs. the compact Registration records
+RegistrationStore keeps now. Also times a full gc.collect() on the
+loaded registry, since that is the pause the bot sees.
+
+    python -m benchmarks.bench_memory --sizes 100000 1000000
+
+Each (layout, size) is loaded in its own process so RSS is not shared.
+"""
+import argparse
+import csv
+import gc
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_csv, phone_for
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _load_dicts(path: str):
+    # what RegistrationStore did before: DictReader + cleaned dict per row,
+    # the two indexes and the /stats counters
+    import storage
+
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        rows = [{
+            "telegram_id": str(r.get("telegram_id") or "").strip(),
+            "full_name": (r.get("full_name") or "").strip(),
+            "phone": storage.normalize_phone(r.get("phone") or ""),
+            "region": (r.get("region") or "").strip(),
+            "registered_at": (r.get("registered_at") or "").strip(),
+        } for r in csv.DictReader(f)]
+    by_tg, by_phone = {}, {}
+    stats = storage.RegistrationStats()
+    for r in rows:
+        if r["telegram_id"]:
+            by_tg.setdefault(r["telegram_id"], r)
+        if r["phone"]:
+            by_phone.setdefault(r["phone"], r)
+        if any(r.values()):
+            stats.add(r["region"], r["registered_at"], bool(r["telegram_id"]))
+
+    def find(i: int):
+        r = by_phone.get(storage.normalize_phone(phone_for(i)))
+        return dict(r) if r else None
+    return rows, by_tg, by_phone, stats, find
+
+
+def _load_records(path: str):
+    import storage
+
+    store = storage.RegistrationStore(path)
+    store.warm()
+
+    def find(i: int):
+        # same steps as above; store.find_by_phone also checks the file stamp
+        r = store._by_phone.get(storage._pack_id(storage.normalize_phone(phone_for(i))))
+        return r.to_dict() if r else None
+    return store, find
+
+
+def child(layout: str, path: str, n: int) -> dict:
+    importlib.import_module("storage")  # imports are not part of the registry
+
+    gc.collect()
+    rss0 = _rss_kb()
+    t0 = time.perf_counter()
+    loaded = _load_dicts(path) if layout == "dicts" else _load_records(path)
+    load_s = time.perf_counter() - t0
+    rss1 = _rss_kb()
+    if layout == "records":
+        gc.freeze()  # what bot._on_startup does once the warm-up is done
+
+    t0 = time.perf_counter()
+    gc.collect()
+    gc_ms = (time.perf_counter() - t0) * 1000
+
+    find = loaded[-1]
+    assert find(n // 2) is not None and find(n + 1) is None
+    reps = 100_000
+    t0 = time.perf_counter()
+    for k in range(reps):
+        find(k * 7919 % n)
+    lookup_us = (time.perf_counter() - t0) / reps * 1e6
+
+    return {"layout": layout, "rows": n, "load_s": load_s, "rss_mb": (rss1 - rss0) / 1024,
+            "bytes_per_row": (rss1 - rss0) * 1024 / n, "gc_ms": gc_ms, "lookup_us": lookup_us}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    ap.add_argument("--child", nargs=3, metavar=("LAYOUT", "PATH", "N"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        layout, path, n = args.child
+        print(json.dumps(child(layout, path, int(n))))
+        return
+
+    print(f"{'layout':>8} {'rows':>9} {'load s':>8} {'RSS MB':>8} {'B/row':>7} {'gc ms':>7} {'find us':>8}")
+    for n in args.sizes:
+        d = tempfile.mkdtemp(prefix="growz-mem-")
+        try:
+            path = make_csv(os.path.join(d, "registrations.csv"), n)
+            for layout in ("dicts", "records"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_memory", "--child", layout, path, str(n)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                print(f"{r['layout']:>8} {r['rows']:>9} {r['load_s']:>8.2f} {r['rss_mb']:>8.1f} "
+                      f"{r['bytes_per_row']:>7.0f} {r['gc_ms']:>7.1f} {r['lookup_us']:>8.2f}")
+        finally:
+            shutil.rmtree(d, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Cost of preparing one reply's parameters (markup build + PTB encoding).
+
+    python -m benchmarks.bench_reply_path
+
+"rebuild" constructs the ReplyKeyboardMarkup per reply (old keyboards.py),
+"cached" passes the keyboards.py markup, built and turned into a dict once
+at import. Both go through the same RequestParameter/RequestData encoding
+PTB does before sending (json.dumps of the dict stays per reply).
+"""
+import argparse
+import timeit
+
+from telegram import KeyboardButton, ReplyKeyboardMarkup
+from telegram.request._requestdata import RequestData
+from telegram.request._requestparameter import RequestParameter
+
+import bot
+from keyboards import REGIONS, kb_regions, kb_after_registered
+
+
+def _old_regions():
+    rows, row = [], []
+    for r in REGIONS:
+        row.append(KeyboardButton(r))
+        if len(row) == 2:
+            rows.append(row)
+            row = []
+    if row:
+        rows.append(row)
+    return ReplyKeyboardMarkup(rows, resize_keyboard=True, one_time_keyboard=True)
+
+
+def _old_after_registered():
+    return ReplyKeyboardMarkup([[KeyboardButton(bot.BTN_MY_INFO)], [KeyboardButton(bot.BTN_HELP)]],
+                               resize_keyboard=True)
+
+
+def _encode(text, markup):
+    data = {"chat_id": 1, "text": text, "reply_markup": markup}
+    return RequestData([RequestParameter.from_input(k, v) for k, v in data.items()]).json_parameters
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=20_000)
+    args = ap.parse_args()
+
+    cases = {
+        "regions rebuild": lambda: _encode(bot.WELCOME_TEXT, _old_regions()),
+        "regions cached": lambda: _encode(bot.WELCOME_TEXT, kb_regions()),
+        "confirm rebuild": lambda: _encode(bot.CONFIRM_TEXT, _old_after_registered()),
+        "confirm cached": lambda: _encode(bot.CONFIRM_TEXT, kb_after_registered()),
+    }
+    for name, fn in cases.items():
+        t = min(timeit.repeat(fn, number=args.n, repeat=3)) / args.n
+        print(f"{name:>16}: {t * 1e6:7.2f} us/reply")
+
+
+if __name__ == "__main__":
+    main()
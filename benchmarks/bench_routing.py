@@ -0,0 +1,78 @@
+"""
+Per-update routing cost for keyboard buttons as their number grows:
+
+    regex   one MessageHandler(filters.Regex("^...$")) per button, then the
+            catch-all (how bot.py routed buttons before)
+    dict    one catch-all MessageHandler + bot.button_router (dict lookup)
+
+Only the routing is timed: the group-0 handler loop Application.process_update
+runs (check_update until one matches) plus the dispatch, callbacks are no-ops.
+Texts: the first button, the last button and a text that is no button
+(falls through to unknown_message, the most common case).
+
+    python -m benchmarks.bench_routing --buttons 4 8 16 32 64
+"""
+import argparse
+import asyncio
+import re
+import time
+
+from telegram import Update
+from telegram.ext import MessageHandler, filters
+
+import bot
+from benchmarks.fake_telegram import make_update
+
+
+async def _noop(update, context):
+    return None
+
+
+def _chain(buttons):
+    handlers = [MessageHandler(filters.Regex(f"^{re.escape(b)}$"), _noop) for b in buttons]
+    handlers.append(MessageHandler(filters.ALL & ~filters.COMMAND, _noop))
+    return handlers
+
+
+def _dict(buttons):
+    route = bot.button_router({b: _noop for b in buttons}, default=_noop)
+    return [MessageHandler(filters.ALL & ~filters.COMMAND, route)]
+
+
+def _route_us(handlers, update: Update, reps: int) -> float:
+    loop = asyncio.new_event_loop()
+
+    async def run():
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            for h in handlers:
+                check = h.check_update(update)
+                if check is not None and check is not False:
+                    await h.callback(update, None)
+                    break
+        return (time.perf_counter() - t0) / reps * 1e6
+
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        loop.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--buttons", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    ap.add_argument("--reps", type=int, default=20_000)
+    args = ap.parse_args()
+
+    print(f"{'buttons':>8} {'text':>8} {'regex us':>9} {'dict us':>8} {'ratio':>6}")
+    for n in args.buttons:
+        buttons = [f"🔘 Tugma {i} (Admin)" for i in range(n)]
+        for label, text in (("first", buttons[0]), ("last", buttons[-1]), ("other", "salom")):
+            update = Update.de_json(make_update(1, text=text), None)
+            chain = _route_us(_chain(buttons), update, args.reps)
+            table = _route_us(_dict(buttons), update, args.reps)
+            print(f"{n:>8} {label:>8} {chain:>9.2f} {table:>8.2f} {chain / table:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
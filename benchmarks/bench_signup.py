@@ -0,0 +1,59 @@
+"""
+Sign-up latency vs. registry size.
+
+    python -m benchmarks.bench_signup
+    python -m benchmarks.bench_signup --sizes 1000 500000 --signups 500
+
+add_registration appends one row (write + fsync), so the median should stay
+flat from 1k to 500k rows; only the one-off load time grows with N.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import time
+
+from benchmarks.common import tmp_csv, percentile, tg_id_for, phone_for
+from storage import RegistrationStore
+
+
+def run(n: int, signups: int) -> dict:
+    path = tmp_csv(n)
+    try:
+        store = RegistrationStore(path)
+
+        t0 = time.perf_counter()
+        store.find_by_telegram_id(0)  # initial load
+        load_s = time.perf_counter() - t0
+
+        samples = []
+        for k in range(signups):
+            i = n + k
+            t0 = time.perf_counter()
+            store.add_registration(tg_id_for(i), "Aliyev Sardor", phone_for(i), "Samarqand")
+            samples.append((time.perf_counter() - t0) * 1000)
+
+        return {
+            "rows": n,
+            "load_s": load_s,
+            "median_ms": statistics.median(samples),
+            "p95_ms": percentile(samples, 95),
+        }
+    finally:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000])
+    ap.add_argument("--signups", type=int, default=200)
+    args = ap.parse_args()
+
+    print(f"{'rows':>10} {'load s':>8} {'median ms':>10} {'p95 ms':>8}")
+    for n in args.sizes:
+        r = run(n, args.signups)
+        print(f"{r['rows']:>10} {r['load_s']:>8.2f} {r['median_ms']:>10.3f} {r['p95_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
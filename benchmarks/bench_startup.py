@@ -0,0 +1,122 @@
+"""
+Restart-to-first-reply: a fresh process goes through main.py's startup
+(imports, build_application, initialize, post_init) against the fake Bot
+API, then the first two updates arrive at once: the help button (no
+storage) and /start from a registered user (a storage lookup).
+
+    foreground   post_init waits for the storage warm-up (the old startup)
+    background   the warm-up runs while the bot already takes updates
+
+    python -m benchmarks.bench_startup --sizes 100000 1000000
+    python -m benchmarks.bench_startup --sizes 1000000 --index   # STORAGE_MMAP_INDEX
+
+Times are from the OS starting the process, so interpreter start-up and
+imports count. Each run is its own process; --index first builds the
+index in a throwaway run so the measured starts only map it.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+def child(mode: str, path: str, n: int, index: bool) -> dict:
+    import asyncio
+    import time
+
+    from main import _process_age
+
+    t_start = time.perf_counter() - _process_age()
+    since = lambda: (time.perf_counter() - t_start) * 1000
+    out = {"mode": mode, "rows": n, "index": index}
+
+    from telegram import Update
+
+    import async_storage
+    import bot
+    import storage
+    from benchmarks.common import tg_id_for
+    from benchmarks.fake_telegram import FakeRequest, make_update, offline_bot
+    from keyboards import BTN_HELP
+
+    d = os.path.dirname(path)
+    offline_bot(d, storage.RegistrationStore(path, mmap_index=index))
+    out["imports_ms"] = since()
+
+    async def run():
+        app = bot.build_application(request=FakeRequest(keep_calls=0))
+        await app.initialize()
+        await app.post_init(app)
+        if mode == "foreground":
+            await async_storage.wait_warm()
+        out["ready_ms"] = since()
+
+        async def first(name: str, update_json: dict):
+            await app.process_update(Update.de_json(update_json, app.bot))
+            out[name + "_ms"] = since()
+
+        async def warm_done():
+            await async_storage.wait_warm()
+            out["warm_done_ms"] = since()
+
+        try:
+            await asyncio.gather(
+                first("help", make_update(9_000_001, text=BTN_HELP)),
+                first("start", make_update(tg_id_for(n // 2), text="/start")),
+                warm_done(),
+            )
+        finally:
+            await app.post_stop(app)
+            await app.shutdown()
+            await app.post_shutdown(app)
+
+    asyncio.run(run())
+    return out
+
+
+def _run_child(mode: str, path: str, n: int, index: bool) -> dict:
+    cmd = [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode, path, str(n)]
+    if index:
+        cmd.append("--index")
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    ap.add_argument("--index", action="store_true", help="STORAGE_MMAP_INDEX=1 store")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per mode, the fastest is shown")
+    ap.add_argument("--child", nargs=3, metavar=("MODE", "PATH", "N"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        mode, path, n = args.child
+        print(json.dumps(child(mode, path, int(n), args.index)))
+        return
+
+    from benchmarks.common import make_csv
+
+    print(f"{'mode':>10} {'rows':>9} {'index':>5} {'imports':>8} {'ready':>8} "
+          f"{'help':>8} {'/start':>8} {'warm':>8}   (ms from process start)")
+    for n in args.sizes:
+        d = tempfile.mkdtemp(prefix="growz-startup-")
+        try:
+            path = make_csv(os.path.join(d, "registrations.csv"), n)
+            if args.index:
+                _run_child("foreground", path, n, True)  # builds registrations.csv.idx
+            for mode in ("foreground", "background"):
+                runs = [_run_child(mode, path, n, args.index) for _ in range(args.repeat)]
+                r = min(runs, key=lambda x: x["help_ms"])
+                print(f"{mode:>10} {n:>9} {'yes' if args.index else 'no':>5} {r['imports_ms']:>8.0f} "
+                      f"{r['ready_ms']:>8.0f} {r['help_ms']:>8.0f} {r['start_ms']:>8.0f} "
+                      f"{r['warm_done_ms']:>8.0f}")
+        finally:
+            shutil.rmtree(d, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
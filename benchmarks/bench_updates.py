@@ -0,0 +1,108 @@
+"""
+Updates/s with N simulated users going through the whole registration
+conversation (/start, join, name, contact, region) at the same time.
+
+    python -m benchmarks.bench_updates --users 200 --latency-ms 30
+
+Each mode runs in its own process: "sequential" (PTB default) and
+"concurrent" (PerUserUpdateProcessor, MAX_CONCURRENT_UPDATES). At the end
+every user must be registered exactly once - that checks per-user
+ordering and storage correctness under concurrency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from keyboards import CTA_JOIN_TEXT, REGIONS
+
+
+def _conversation(user_id: int):
+    from benchmarks.fake_telegram import make_update
+    return [
+        make_update(user_id, text="/start"),
+        make_update(user_id, text=CTA_JOIN_TEXT),
+        make_update(user_id, text="Aliyev Sardor"),
+        make_update(user_id, phone=f"+99891{user_id % 10_000_000:07d}"),
+        make_update(user_id, text=REGIONS[user_id % len(REGIONS)]),
+    ]
+
+
+async def run(mode: str, users: int, rows: int, latency_ms: float, concurrency: int) -> dict:
+    from telegram import Update
+
+    import async_storage
+    import bot
+    import storage
+    from benchmarks.common import make_csv
+    from benchmarks.fake_telegram import FakeRequest, offline_bot
+
+    data_dir = tempfile.mkdtemp(prefix="growz-updates-")
+    offline_bot(data_dir, storage.RegistrationStore(make_csv(os.path.join(data_dir, "registrations.csv"), rows)))
+    bot.MAX_CONCURRENT_UPDATES = concurrency if mode == "concurrent" else 1
+
+    fake = FakeRequest(latency_s=latency_ms / 1000)
+    app = bot.build_application(request=fake)
+    await app.initialize()
+    await app.post_init(app)
+    await async_storage.wait_warm()  # steady state, not the background warm-up
+    await app.start()
+
+    user_ids = [7_000_000 + i for i in range(users)]
+    convs = [_conversation(u) for u in user_ids]
+    # interleave: step k of every user, then step k+1 ...
+    updates = [Update.de_json(c[k], app.bot) for k in range(5) for c in convs]
+    # start: photo + text, then one reply per step
+    expected_replies = users * 6
+
+    t0 = time.perf_counter()
+    for u in updates:
+        await app.update_queue.put(u)
+    while fake.counts["sendMessage"] + fake.counts["sendPhoto"] < expected_replies:
+        await asyncio.sleep(0.01)
+        if time.perf_counter() - t0 > 600:
+            break
+    wall = time.perf_counter() - t0
+
+    await app.stop()
+    await app.post_shutdown(app)
+    await app.shutdown()
+
+    registered = sum(1 for u in user_ids if storage.find_by_telegram_id(u))
+    return {"mode": mode, "users": users, "updates": len(updates), "wall_s": wall,
+            "updates_per_s": len(updates) / wall, "registered": registered}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=["sequential", "concurrent"], default=None)
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--latency-ms", type=float, default=30, help="fake Telegram API round trip")
+    ap.add_argument("--concurrency", type=int, default=64)
+    args = ap.parse_args()
+
+    if args.mode:
+        r = asyncio.run(run(args.mode, args.users, args.rows, args.latency_ms, args.concurrency))
+        print(json.dumps(r))
+        return
+
+    print(f"{'mode':>11} {'updates':>8} {'wall s':>8} {'upd/s':>8} {'registered':>11}")
+    for mode in ("sequential", "concurrent"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_updates", "--mode", mode,
+             "--users", str(args.users), "--rows", str(args.rows),
+             "--latency-ms", str(args.latency_ms), "--concurrency", str(args.concurrency)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{r['mode']:>11} {r['updates']:>8} {r['wall_s']:>8.2f} {r['updates_per_s']:>8.0f} "
+              f"{r['registered']:>7}/{r['users']}")
+
+
+if __name__ == "__main__":
+    main()
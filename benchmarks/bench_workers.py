@@ -0,0 +1,139 @@
+"""
+Multi-process mode: updates/s with 1, 2, 4 ... worker processes sharing
+one registrations.csv, and the uniqueness rules across workers.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --users 400
+
+Users 2k and 2k+1 share a phone number and are routed to different
+workers (user_id % workers), so every pair races for the same phone in
+two processes: exactly one of them may end up in the file, and every
+user told "registered" (CONFIRM_TEXT) must have a row. The run fails
+otherwise.
+Scaling needs free cores; the run prints how many there are.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+
+from keyboards import CTA_JOIN_TEXT, REGIONS
+
+BASE_ID = 7_000_000
+
+
+def _bench_worker(conn, data_dir: str, latency_ms: float, ready):
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import bot
+    import storage
+    from benchmarks.fake_telegram import FakeRequest, offline_bot
+    from config import WORKER_INDEX
+    from workers import serve_pipe
+
+    own = os.path.join(data_dir, f"worker-{WORKER_INDEX}")
+    offline_bot(own, storage.RegistrationStore(os.path.join(data_dir, "registrations.csv")))
+
+    confirmed = []
+
+    def watch(method, params):
+        if method == "sendMessage" and params.get("text") == bot.CONFIRM_TEXT:
+            confirmed.append(int(params["chat_id"]))
+        return None
+
+    app = bot.build_application(request=FakeRequest(latency_s=latency_ms / 1000, fail=watch))
+    asyncio.run(serve_pipe(app, conn, on_ready=ready.release))
+    with open(os.path.join(own, "confirmed.json"), "w") as f:
+        json.dump(confirmed, f)
+
+
+def _updates(users: int):
+    from benchmarks.fake_telegram import make_update
+    out = []
+    for k in range(5):
+        for i in range(users):
+            uid = BASE_ID + i
+            out.append([
+                make_update(uid, text="/start"),
+                make_update(uid, text=CTA_JOIN_TEXT),
+                make_update(uid, text="Aliyev Sardor"),
+                make_update(uid, phone=f"+99895{i // 2:07d}"),  # pairs share a phone
+                make_update(uid, text=REGIONS[i % len(REGIONS)]),
+            ][k])
+    return out
+
+
+async def run(workers: int, users: int, rows: int, latency_ms: float) -> dict:
+    import multiprocessing
+
+    from telegram import Bot, Update
+
+    from benchmarks.common import make_csv
+    from workers import Supervisor
+
+    data_dir = tempfile.mkdtemp(prefix="growz-workers-")
+    path = make_csv(os.path.join(data_dir, "registrations.csv"), rows)
+    ready = multiprocessing.get_context("spawn").Semaphore(0)
+    sup = Supervisor(workers, target=_bench_worker, args=(data_dir, latency_ms, ready))
+    sup.start()
+    for _ in range(workers):
+        await asyncio.get_running_loop().run_in_executor(None, ready.acquire)
+
+    bot = Bot("123456:offline")
+    updates = [Update.de_json(u, bot) for u in _updates(users)]
+
+    t0 = time.perf_counter()
+    for u in updates:
+        await sup.dispatch(u)
+    await asyncio.get_running_loop().run_in_executor(None, sup.stop)
+    wall = time.perf_counter() - t0
+
+    with open(path, newline="", encoding="utf-8") as f:
+        new = [r for r in csv.DictReader(f) if int(r["telegram_id"] or 0) >= BASE_ID]
+    confirmed = []
+    for i in range(workers):
+        with open(os.path.join(data_dir, f"worker-{i}", "confirmed.json")) as f:
+            confirmed += json.load(f)
+    shutil.rmtree(data_dir, ignore_errors=True)
+    rows = {int(r["telegram_id"]) for r in new}
+    phones = Counter(r["phone"] for r in new)
+    tgs = Counter(r["telegram_id"] for r in new)
+    return {
+        "workers": workers, "updates": len(updates), "wall_s": wall,
+        "updates_per_s": len(updates) / wall,
+        "registered": len(new), "expected": users // 2,
+        "dup_phones": sum(1 for c in phones.values() if c > 1),
+        "dup_tg": sum(1 for c in tgs.values() if c > 1),
+        # told "registered" but no row in the file
+        "lost": sum(1 for uid in confirmed if uid not in rows),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    ap.add_argument("--users", type=int, default=400)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--latency-ms", type=float, default=30)
+    args = ap.parse_args()
+
+    print(f"cpu cores: {os.cpu_count()}")
+    print(f"{'workers':>7} {'updates':>8} {'wall s':>7} {'upd/s':>7} {'registered':>11} {'dup phone':>10} "
+          f"{'dup tg':>7} {'lost':>5}")
+    failed = False
+    for n in args.workers:
+        r = asyncio.run(run(n, args.users, args.rows, args.latency_ms))
+        print(f"{r['workers']:>7} {r['updates']:>8} {r['wall_s']:>7.2f} {r['updates_per_s']:>7.0f} "
+              f"{r['registered']:>5}/{r['expected']:<5} {r['dup_phones']:>10} {r['dup_tg']:>7} {r['lost']:>5}")
+        failed = failed or r["dup_phones"] or r["dup_tg"] or r["lost"] or r["registered"] != r["expected"]
+    if failed:
+        raise SystemExit("FAIL: duplicate rows, or users told they are registered without a row")
+
+
+if __name__ == "__main__":
+    main()
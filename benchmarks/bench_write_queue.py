@@ -0,0 +1,76 @@
+"""
+Burst of concurrent sign-ups: one write + fsync per user vs. the
+write-behind queue's group commit.
+
+    python -m benchmarks.bench_write_queue --signups 5000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import time
+
+import async_storage
+import storage
+from benchmarks.common import tmp_csv, percentile, tg_id_for, phone_for
+from write_queue import RegistrationQueue
+
+
+async def _burst(add, rows: int, signups: int, offset: int) -> dict:
+    samples = []
+
+    async def one(i: int):
+        t0 = time.perf_counter()
+        await add(tg_id_for(i), "Aliyev Sardor", phone_for(i), "Samarqand")
+        samples.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(rows + offset + k) for k in range(signups)))
+    wall = time.perf_counter() - t0
+    return {"wall_s": wall, "per_s": signups / wall,
+            "p50_ms": percentile(samples, 50), "p99_ms": percentile(samples, 99)}
+
+
+async def run(rows: int, signups: int, max_batch: int, max_delay_ms: float):
+    direct = await _burst(async_storage.add_registration, rows, signups, 0)
+
+    queue = RegistrationQueue(
+        commit=async_storage.commit_registrations,
+        check=async_storage._check_committed,
+        max_batch=max_batch,
+        max_delay_s=max_delay_ms / 1000,
+    )
+    queue.start()
+    queued = await _burst(queue.submit, rows, signups, signups)
+    t0 = time.perf_counter()
+    await queue.stop()
+    queued["flush_s"] = time.perf_counter() - t0
+    return direct, queued, queue.stats()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--signups", type=int, default=5_000)
+    ap.add_argument("--max-batch", type=int, default=500)
+    ap.add_argument("--max-delay-ms", type=float, default=5)
+    args = ap.parse_args()
+
+    path = tmp_csv(args.rows)
+    try:
+        storage._store = storage.RegistrationStore(path)
+        storage._store.warm()
+        direct, queued, stats = asyncio.run(run(args.rows, args.signups, args.max_batch, args.max_delay_ms))
+
+        print(f"{'mode':>7} {'wall s':>8} {'signups/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, r in (("direct", direct), ("queued", queued)):
+            print(f"{name:>7} {r['wall_s']:>8.2f} {r['per_s']:>10.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+        print(f"queue: {stats['batches']} batches, avg commit {stats['commit_ms_avg']:.2f} ms, "
+              f"max {stats['commit_ms_max']:.2f} ms, flush on stop {queued['flush_s'] * 1000:.1f} ms")
+    finally:
+        async_storage.shutdown()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
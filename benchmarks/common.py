@@ -0,0 +1,53 @@
+import csv
+import os
+import random
+import tempfile
+from typing import List
+
+from keyboards import REGIONS
+from storage import FIELDNAMES, OLD_FIELDNAMES
+
+FIRST_NAMES = ["Sardor", "Zuhra", "Aziz", "Dilnoza", "Bekzod", "Malika", "Jasur", "Nodira"]
+LAST_NAMES = ["Aliyev", "Karimov", "Karshieva", "Toshmatov", "Rahimova", "Yusupov"]
+
+
+def make_csv(path: str, n: int, old_format: bool = False, seed: int = 1) -> str:
+    """
+    Synthetic registrations.csv with n rows.
+    telegram_id = 1_000_000 + i, phone = 99890 + i (7 digits), so callers
+    can compute existing / missing keys without reading the file.
+    """
+    rnd = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(OLD_FIELDNAMES if old_format else FIELDNAMES)
+        for i in range(n):
+            name = f"{rnd.choice(LAST_NAMES)} {rnd.choice(FIRST_NAMES)}"
+            region = rnd.choice(REGIONS)
+            ts = f"2026-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00"
+            if old_format:
+                w.writerow([name, f"+998 90 {i:07d}", region, ts])
+            else:
+                w.writerow([1_000_000 + i, name, phone_for(i), region, ts])
+    return path
+
+
+def phone_for(i: int) -> str:
+    return f"99890{i:07d}"
+
+
+def tg_id_for(i: int) -> int:
+    return 1_000_000 + i
+
+
+def tmp_csv(n: int, old_format: bool = False) -> str:
+    d = tempfile.mkdtemp(prefix="growz-bench-")
+    return make_csv(os.path.join(d, "registrations.csv"), n, old_format=old_format)
+
+
+def percentile(samples: List[float], p: float) -> float:
+    s = sorted(samples)
+    if not s:
+        return 0.0
+    k = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[k]
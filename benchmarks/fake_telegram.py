@@ -0,0 +1,158 @@
+"""
+Offline stand-in for the Telegram Bot API.
+
+FakeRequest plugs into PTB as the bot's request object
+(bot.build_application(request=FakeRequest())), answers every method
+with a plausible result and records the calls, so handlers and the
+whole Application run without network. `latency_s` emulates the round
+trip; `fail` can inject errors (429 RetryAfter, 403 blocked, ...).
+offline_bot() points bot.py's files at a scratch directory.
+"""
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from telegram.request import BaseRequest, RequestData
+
+BOT_USER = {"id": 100000001, "is_bot": True, "first_name": "Growz", "username": "growz_test_bot"}
+
+
+def offline_bot(data_dir: str, store=None, patch=setattr):
+    """
+    Point everything bot.py writes (registry, file_id cache, conversations,
+    broadcast checkpoint, export cursors) at data_dir instead of data/, and
+    give it a token if .env has none. store: a ready RegistrationStore,
+    default data_dir/registrations.csv. patch: how module globals are set;
+    tests pass monkeypatch.setattr so they are restored. Returns the bot module.
+    """
+    import bot
+    import export
+    import storage
+    from media_cache import FileIdCache
+
+    os.makedirs(data_dir, exist_ok=True)
+    if store is None:
+        store = storage.RegistrationStore(os.path.join(data_dir, "registrations.csv"))
+    patch(storage, "_store", store)
+    patch(bot, "WELCOME_FILE_IDS", FileIdCache(os.path.join(data_dir, "file_ids.json")))
+    patch(bot, "PERSISTENCE_PATH", os.path.join(data_dir, "conversations.db"))
+    patch(bot, "BROADCAST_CHECKPOINT_PATH", os.path.join(data_dir, "broadcast.json"))
+    patch(export, "EXPORT_CURSORS_PATH", os.path.join(data_dir, "export_cursors.json"))
+    patch(bot, "BOT_TOKEN", bot.BOT_TOKEN or "123456:offline")
+    return bot
+
+
+# (method, params) -> None or (http_status, error_json)
+FailFn = Callable[[str, Dict], Optional[Tuple[int, Dict]]]
+
+
+def retry_after(seconds: int) -> Tuple[int, Dict]:
+    return 429, {"ok": False, "error_code": 429,
+                 "description": f"Too Many Requests: retry after {seconds}",
+                 "parameters": {"retry_after": seconds}}
+
+
+def blocked() -> Tuple[int, Dict]:
+    return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+
+
+class FakeRequest(BaseRequest):
+    def __init__(self, latency_s: float = 0.0, fail: Optional[FailFn] = None, keep_calls: int = 1000):
+        self.latency_s = latency_s
+        self.fail = fail
+        self.counts: Counter = Counter()
+        self.calls: List[Tuple[float, str, Dict]] = []
+        self.keep_calls = keep_calls
+        self._message_ids = itertools.count(1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @property
+    def read_timeout(self):
+        return 5.0
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None,
+                         pool_timeout=None) -> Tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        self.counts[api_method] += 1
+        if len(self.calls) < self.keep_calls:
+            self.calls.append((time.monotonic(), api_method, params))
+
+        if api_method == "getUpdates":
+            # polling would spin otherwise
+            await asyncio.sleep(params.get("timeout") or 1)
+            return self._ok([])
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        if self.fail:
+            err = self.fail(api_method, params)
+            if err:
+                return err[0], json.dumps(err[1]).encode()
+        return self._ok(self._result(api_method, params))
+
+    def sent_to(self, chat_id) -> List[Dict]:
+        return [p for _, m, p in self.calls if m.startswith("send") and str(p.get("chat_id")) == str(chat_id)]
+
+    @staticmethod
+    def _ok(result) -> Tuple[int, bytes]:
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    def _result(self, api_method: str, params: Dict):
+        if api_method == "getMe":
+            return BOT_USER
+        if api_method in ("sendMessage", "sendPhoto", "sendDocument", "editMessageText"):
+            msg = {
+                "message_id": params.get("message_id") or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "from": BOT_USER,
+            }
+            if "text" in params:
+                msg["text"] = params["text"]
+            if api_method == "sendPhoto":
+                msg["photo"] = [{"file_id": "fake-photo-id", "file_unique_id": "fake-photo",
+                                 "width": 1280, "height": 720}]
+            if api_method == "sendDocument":
+                msg["document"] = {"file_id": "fake-doc-id", "file_unique_id": "fake-doc"}
+            return msg
+        # setWebhook, deleteWebhook, answerCallbackQuery, ...
+        return True
+
+
+_update_ids = itertools.count(1)
+
+
+def make_update(user_id: int, text: Optional[str] = None, phone: Optional[str] = None,
+                callback_data: Optional[str] = None, first_name: str = "Test") -> Dict:
+    """Update JSON as Telegram would POST it to the webhook."""
+    user = {"id": user_id, "is_bot": False, "first_name": first_name}
+    update_id = next(_update_ids)
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": first_name},
+        "from": user,
+    }
+    if callback_data is not None:
+        return {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "from": user, "chat_instance": str(user_id),
+            "data": callback_data, "message": dict(message, **{"from": BOT_USER}),
+        }}
+    if phone is not None:
+        message["contact"] = {"phone_number": phone, "first_name": first_name, "user_id": user_id}
+    else:
+        message["text"] = text or ""
+        if message["text"].startswith("/"):
+            cmd_len = len(message["text"].split()[0])
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": cmd_len}]
+    return {"update_id": update_id, "message": message}
@@ -0,0 +1,266 @@
+"""
+Reproducible benchmark suite: every storage function at several registry
+sizes, the old-format migration, and the bot handlers end-to-end against
+the fake Bot API. Results go to JSON so two runs can be compared.
+
+    python -m benchmarks.suite                                   # 1k/10k/100k/1M, csv
+    python -m benchmarks.suite --sizes 1000 10000 --backend sqlite --out base.json
+    python -m benchmarks.suite --out new.json --compare base.json
+
+Data is synthetic (benchmarks.common.make_csv, fixed seed) and lives in a
+temp dir. Each handler run is its own process because the async_storage
+thread pools cannot be restarted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.common import make_csv, percentile, phone_for, tg_id_for
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# compare: flag ops whose p50 got this much slower
+REGRESSION_RATIO = 1.25
+
+
+def _timeit(fn: Callable[[int], object], reps: int) -> Dict[str, float]:
+    samples = []
+    for k in range(reps):
+        t0 = time.perf_counter()
+        fn(k)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return {
+        "reps": reps,
+        "mean_us": sum(samples) / len(samples),
+        "p50_us": percentile(samples, 50),
+        "p95_us": percentile(samples, 95),
+        "min_us": min(samples),
+    }
+
+
+def _make_store(backend: str, csv_path: str):
+    import storage
+    if backend == "sqlite":
+        from storage_sqlite import SqliteRegistrationStore
+        return SqliteRegistrationStore(csv_path[:-4] + ".db", import_from=csv_path)
+    return storage.RegistrationStore(csv_path)
+
+
+def bench_storage(n: int, backend: str, reps: int) -> List[Dict]:
+    import storage
+
+    results = []
+
+    def record(op: str, fn: Callable[[int], object], r: int = reps):
+        res = _timeit(fn, r)
+        res.update(group="storage", op=op, rows=n, backend=backend)
+        results.append(res)
+
+    d = tempfile.mkdtemp(prefix="growz-suite-")
+    try:
+        path = make_csv(os.path.join(d, "registrations.csv"), n)
+        store = _make_store(backend, path)
+        record("warm", lambda k: store.warm(), 1)
+
+        record("find_by_telegram_id.hit", lambda k: store.find_by_telegram_id(tg_id_for(k * 7919 % n)))
+        record("find_by_telegram_id.miss", lambda k: store.find_by_telegram_id(tg_id_for(n + k)))
+        record("find_by_phone.hit", lambda k: store.find_by_phone(phone_for(k * 7919 % n)))
+        record("find_by_phone.miss", lambda k: store.find_by_phone(phone_for(n + k)))
+        record("list_last", lambda k: store.list_last(20))
+        record("page.newest", lambda k: store.page(limit=20))
+        record("page.middle", lambda k: store.page(before=n // 2, limit=20))
+        record("page.query", lambda k: store.page(limit=20, query="Karimov"), max(reps // 10, 5))
+        record("seq_after_date", lambda k: store.seq_after_date(f"2026-{1 + k % 12:02d}-15"))
+        record("stats", lambda k: store.stats(7))
+        record("iter_rows.full", lambda k: sum(1 for _ in store.iter_rows()), 3)
+
+        # writes last, they grow the file
+        signups = min(reps, 200)
+        record("add_registration",
+               lambda k: store.add_registration(tg_id_for(n + k), "Aliyev Sardor", phone_for(n + k), "Samarqand"),
+               signups)
+        base = n + signups
+
+        def batch(k: int):
+            i = base + k * 100
+            store.add_registrations([
+                storage.make_row(tg_id_for(j), "Aliyev Sardor", phone_for(j), "Samarqand")
+                for j in range(i, i + 100)
+            ])
+        record("add_registrations.x100", batch, 20)
+    finally:
+        shutil.rmtree(d, ignore_errors=True)
+    return results
+
+
+def bench_old_format(n: int, backend: str) -> List[Dict]:
+    """Old-format migration (migrate.migrate_csv), then binds (full rewrite on csv)."""
+    import migrate
+
+    results = []
+    d = tempfile.mkdtemp(prefix="growz-suite-old-")
+    try:
+        path = make_csv(os.path.join(d, "registrations.csv"), n, old_format=True)
+        res = _timeit(lambda k: migrate.migrate_csv(path), 1)
+        res.update(group="storage", op="migrate_old_csv", rows=n, backend="csv")
+        results.append(res)
+
+        store = _make_store(backend, path)
+        store.warm()
+        binds = 3 if n >= 100_000 else 20
+        res = _timeit(lambda k: store.bind_telegram_id_by_phone(tg_id_for(k), phone_for(k)), binds)
+        res.update(group="storage", op="bind_telegram_id_by_phone", rows=n, backend=backend)
+        results.append(res)
+    finally:
+        shutil.rmtree(d, ignore_errors=True)
+    return results
+
+
+async def _handlers(n: int, backend: str, users: int) -> List[Dict]:
+    """Drive bot.py with fake Updates through app.process_update, one step at a time."""
+    from telegram import Update
+
+    import async_storage
+    import bot
+    from benchmarks.fake_telegram import FakeRequest, make_update, offline_bot
+    from keyboards import BTN_HELP, BTN_MY_INFO, CTA_JOIN_TEXT, REGIONS
+
+    d = tempfile.mkdtemp(prefix="growz-suite-bot-")
+    offline_bot(d, _make_store(backend, make_csv(os.path.join(d, "registrations.csv"), n)))
+    bot.MAX_CONCURRENT_UPDATES = 1
+    bot.THROTTLE_BURST = 1000  # each user sends 8 updates back to back
+    admin_id = 42
+    bot.ADMIN_IDS.add(admin_id)
+
+    app = bot.build_application(request=FakeRequest(keep_calls=0))
+    await app.initialize()
+    await app.post_init(app)
+    await async_storage.wait_warm()  # steady state, not the background warm-up
+
+    samples: Dict[str, List[float]] = {}
+
+    async def step(name: str, update_json: dict):
+        u = Update.de_json(update_json, app.bot)
+        t0 = time.perf_counter()
+        await app.process_update(u)
+        samples.setdefault(name, []).append((time.perf_counter() - t0) * 1e6)
+
+    try:
+        for i in range(users):
+            uid = 8_000_000 + i
+            await step("start", make_update(uid, text="/start"))
+            await step("join", make_update(uid, text=CTA_JOIN_TEXT))
+            await step("handle_name", make_update(uid, text="Aliyev Sardor"))
+            await step("handle_phone", make_update(uid, phone=f"+99892{i:07d}"))
+            await step("handle_region", make_update(uid, text=REGIONS[i % len(REGIONS)]))
+            await step("my_info", make_update(uid, text=BTN_MY_INFO))
+            await step("help_msg", make_update(uid, text=BTN_HELP))
+            await step("unknown_message", make_update(uid, text="salom"))
+        for _ in range(max(users // 5, 3)):
+            await step("admin_list", make_update(admin_id, text="/list"))
+            await step("admin_list.query", make_update(admin_id, text="/list Karimov"))
+            await step("admin_stats", make_update(admin_id, text="/stats"))
+    finally:
+        await app.post_stop(app)
+        await app.shutdown()
+        await app.post_shutdown(app)
+        shutil.rmtree(d, ignore_errors=True)
+
+    out = []
+    for name, s in samples.items():
+        out.append({
+            "group": "handler", "op": name, "rows": n, "backend": backend, "reps": len(s),
+            "mean_us": sum(s) / len(s), "p50_us": percentile(s, 50),
+            "p95_us": percentile(s, 95), "min_us": min(s),
+        })
+    return out
+
+
+def bench_handlers(n: int, backend: str, users: int) -> List[Dict]:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--handlers-child", str(n),
+         "--backend", backend, "--users", str(users)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _meta(args) -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": args.sizes,
+        "backend": args.backend,
+        "reps": args.reps,
+        "users": args.users,
+    }
+
+
+def compare(current: List[Dict], baseline_path: str):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    key = lambda r: (r["group"], r["op"], r["rows"], r["backend"])
+    base = {key(r): r for r in baseline}
+
+    print(f"\n{'group':>8} {'op':<28} {'rows':>9} {'base p50':>10} {'now p50':>10} {'ratio':>6}")
+    for r in current:
+        b = base.get(key(r))
+        if not b or not b["p50_us"]:
+            continue
+        ratio = r["p50_us"] / b["p50_us"]
+        flag = "  <-- slower" if ratio >= REGRESSION_RATIO else ""
+        print(f"{r['group']:>8} {r['op']:<28} {r['rows']:>9} {b['p50_us']:>10.1f} "
+              f"{r['p50_us']:>10.1f} {ratio:>6.2f}{flag}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    ap.add_argument("--reps", type=int, default=1000, help="repetitions for cheap storage calls")
+    ap.add_argument("--users", type=int, default=50, help="simulated users for the handler runs")
+    ap.add_argument("--skip-handlers", action="store_true")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", metavar="BASELINE_JSON")
+    ap.add_argument("--handlers-child", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.handlers_child is not None:
+        print(json.dumps(asyncio.run(_handlers(args.handlers_child, args.backend, args.users))))
+        return
+
+    results: List[Dict] = []
+    print(f"{'group':>8} {'op':<28} {'rows':>9} {'reps':>5} {'p50 us':>10} {'p95 us':>10}")
+    for n in args.sizes:
+        batch = bench_storage(n, args.backend, args.reps) + bench_old_format(n, args.backend)
+        if not args.skip_handlers:
+            batch += bench_handlers(n, args.backend, args.users)
+        for r in batch:
+            print(f"{r['group']:>8} {r['op']:<28} {r['rows']:>9} {r['reps']:>5} "
+                  f"{r['p50_us']:>10.1f} {r['p95_us']:>10.1f}")
+        results += batch
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": _meta(args), "results": results}, f, indent=1)
+    print(f"\nsaved {len(results)} results to {args.out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Webhook load test without Telegram.
+
+    # start an offline bot (FakeRequest, temp data dir) and load it
+    python -m benchmarks.webhook_load --spawn --updates 5000 --concurrency 100
+
+    # or load an already running webhook endpoint
+    python -m benchmarks.webhook_load --url http://127.0.0.1:8443/telegram --secret s3cret
+
+Synthetic users send /start, so the whole path (HTTP -> update queue ->
+handlers -> storage lookup -> reply) is exercised. "serve" runs the
+offline bot itself; it exits gracefully on SIGTERM.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import percentile
+
+SECRET = "load-test-secret"
+
+
+def serve(port: int, rows: int, latency_ms: float):
+    import bot
+    import storage
+    from benchmarks.common import make_csv
+    from benchmarks.fake_telegram import FakeRequest, offline_bot
+
+    data_dir = tempfile.mkdtemp(prefix="growz-webhook-")
+    offline_bot(data_dir, storage.RegistrationStore(make_csv(os.path.join(data_dir, "registrations.csv"), rows)))
+
+    app = bot.build_application(request=FakeRequest(latency_s=latency_ms / 1000))
+    app.run_webhook(
+        listen="127.0.0.1",
+        port=port,
+        url_path="telegram",
+        webhook_url="https://example.invalid/telegram",
+        secret_token=SECRET,
+        close_loop=False,
+    )
+
+
+async def load(url: str, secret: str, updates: int, concurrency: int, users: int) -> dict:
+    from benchmarks.fake_telegram import make_update
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    samples = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def one(i: int):
+            nonlocal errors
+            payload = make_update(user_id=5_000_000 + i % users, text="/start")
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post(url, json=payload, headers=headers)
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                samples.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(updates)))
+        wall = time.perf_counter() - t0
+
+    return {"updates": updates, "errors": errors, "wall_s": wall, "per_s": updates / wall,
+            "p50_ms": percentile(samples, 50), "p99_ms": percentile(samples, 99)}
+
+
+def _wait_port(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"webhook server did not start on port {port}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("mode", nargs="?", choices=["load", "serve"], default="load")
+    ap.add_argument("--spawn", action="store_true", help="start an offline bot first")
+    ap.add_argument("--url", default=None)
+    ap.add_argument("--secret", default=SECRET)
+    ap.add_argument("--port", type=int, default=18443)
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--latency-ms", type=float, default=0, help="fake Telegram API round trip")
+    ap.add_argument("--updates", type=int, default=2_000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--users", type=int, default=1_000)
+    args = ap.parse_args()
+
+    if args.mode == "serve":
+        serve(args.port, args.rows, args.latency_ms)
+        return
+
+    url = args.url or f"http://127.0.0.1:{args.port}/telegram"
+    proc = None
+    if args.spawn:
+        proc = subprocess.Popen([sys.executable, "-m", "benchmarks.webhook_load", "serve",
+                                 "--port", str(args.port), "--rows", str(args.rows),
+                                 "--latency-ms", str(args.latency_ms)])
+        _wait_port(args.port)
+    try:
+        r = asyncio.run(load(url, args.secret, args.updates, args.concurrency, args.users))
+        print(f"{r['updates']} updates, {r['errors']} errors, {r['wall_s']:.2f} s, "
+              f"{r['per_s']:.0f} updates/s, p50 {r['p50_ms']:.1f} ms, p99 {r['p99_ms']:.1f} ms")
+    finally:
+        if proc is not None:
+            t0 = time.perf_counter()
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=60)
+            print(f"graceful shutdown (drain in-flight updates): {time.perf_counter() - t0:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
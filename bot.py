@@ -1,17 +1,50 @@
-import re
 import asyncio
+import gc
+import html
+import os
+import re
+import tempfile
+from typing import Optional
+
 from telegram import Update
 from telegram.constants import ParseMode
+from telegram.error import BadRequest
+from telegram.request import BaseRequest, HTTPXRequest
 from telegram.ext import (
     Application,
+    ApplicationHandlerStop,
     CommandHandler,
     MessageHandler,
+    CallbackQueryHandler,
     ConversationHandler,
     ContextTypes,
+    TypeHandler,
     filters,
 )
 
-from config import BOT_TOKEN, ADMIN_IDS, ASSETS_WELCOME_PATH, REG_CSV_PATH
+from config import (
+    BOT_TOKEN,
+    ADMIN_IDS,
+    ASSETS_WELCOME_PATH,
+    FILE_ID_CACHE_PATH,
+    MAX_CONCURRENT_UPDATES,
+    PERSISTENCE_PATH,
+    PERSISTENCE_UPDATE_INTERVAL,
+    CONVERSATION_TTL_SECONDS,
+    BROADCAST_CHECKPOINT_PATH,
+    BROADCAST_RATE_PER_SEC,
+    BROADCAST_PER_CHAT_INTERVAL,
+    BROADCAST_CONCURRENCY,
+    METRICS_LISTEN,
+    METRICS_PORT,
+    THROTTLE_ENABLED,
+    THROTTLE_RATE_PER_SEC,
+    THROTTLE_BURST,
+    THROTTLE_DUPLICATE_WINDOW_S,
+    THROTTLE_NOTIFY_INTERVAL_S,
+    THROTTLE_MAX_USERS,
+    WORKER_INDEX,
+)
 from keyboards import (
     CTA_JOIN_TEXT,
     BTN_MY_INFO,
@@ -24,9 +57,18 @@ from keyboards import (
     kb_contact_share,
     kb_regions,
     kb_remove,
+    kb_admin_pager,
     REGIONS,
 )
-import storage
+import async_storage
+import broadcast
+import export
+import importer
+import metrics
+from media_cache import FileIdCache
+from persistence import SqlitePersistence
+from throttle import FloodGuard, ThrottleHandler
+from update_processor import PerUserUpdateProcessor
 
 STATE_NAME, STATE_PHONE, STATE_REGION = range(3)
 
@@ -47,7 +89,17 @@ CONFIRM_TEXT = (
     "Yaqin kunlarda Growz tomonidan tashkil etiladigan tadbirlar bo‘yicha siz bilan bog‘lanamiz."
 )
 
-LOCK = asyncio.Lock()
+WELCOME_FILE_IDS = FileIdCache(FILE_ID_CACHE_PATH)
+WELCOME_UPLOAD_LOCK = asyncio.Lock()
+
+HELP_TEXT = (
+    "ℹ️ Yordam:\n"
+    "• Ro‘yxatdan o‘tish uchun /start yoki 👉 Ishtirok etmoqchiman tugmasi.\n"
+    "• Jarayonni bekor qilish: /cancel\n"
+    "• Ro‘yxatdan o‘tgan bo‘lsangiz, 📄 Ma’lumotlarim tugmasi orqali tekshiring."
+)
+
+_REGION_SET = frozenset(REGIONS)
 
 
 def _is_admin(user_id: int) -> bool:
@@ -55,37 +107,64 @@ def _is_admin(user_id: int) -> bool:
 
 
 def _kb_after_registered_for(user_id: int):
-    return kb_after_registered_admin() if _is_admin(user_id) else kb_after_registered()
+    # ADMIN_IDS - set, klaviaturalar tayyor: O(1), yangi obyekt yaratilmaydi
+    return kb_after_registered_admin() if user_id in ADMIN_IDS else kb_after_registered()
+
+
+NON_DIGITS_RE = re.compile(r"\D+")
+WHITESPACE_RE = re.compile(r"\s+")
 
 
 def _normalize_phone(phone: str) -> str:
     # faqat raqam qoldiradi
-    return re.sub(r"\D+", "", phone or "").strip()
+    return NON_DIGITS_RE.sub("", phone or "")
 
 
 def _is_valid_full_name(text: str) -> bool:
     if not text:
         return False
     t = text.strip()
-    parts = [p for p in re.split(r"\s+", t) if p]
+    parts = [p for p in WHITESPACE_RE.split(t) if p]
     return len(parts) >= 2 and len(t) >= 5
 
 
+async def _send_welcome_photo(update: Update):
+    # birinchi marta yuklanadi, keyin Telegram file_id qayta ishlatiladi
+    file_id = WELCOME_FILE_IDS.get(ASSETS_WELCOME_PATH)
+    if file_id:
+        try:
+            await update.message.reply_photo(photo=file_id)
+            return
+        except BadRequest:
+            WELCOME_FILE_IDS.drop(ASSETS_WELCOME_PATH)  # eskirgan file_id
+
+    async with WELCOME_UPLOAD_LOCK:
+        # kutayotganda boshqasi yuklab bo‘lgan bo‘lishi mumkin
+        file_id = WELCOME_FILE_IDS.get(ASSETS_WELCOME_PATH)
+        if file_id:
+            await update.message.reply_photo(photo=file_id)
+            return
+        with open(ASSETS_WELCOME_PATH, "rb") as f:
+            msg = await update.message.reply_photo(photo=f)
+        WELCOME_FILE_IDS.put(ASSETS_WELCOME_PATH, msg.photo[-1].file_id)
+
+
+def _forget_user_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # bo‘sh dict ham xotirada/bazada qolmasin: millionlab foydalanuvchi bo‘lishi mumkin
+    context.application.drop_user_data(update.effective_user.id)
+
+
 async def send_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        with open(ASSETS_WELCOME_PATH, "rb") as f:
-            await update.message.reply_photo(photo=f)
+        await _send_welcome_photo(update)
     except Exception:
         pass
     await update.message.reply_text(WELCOME_TEXT, reply_markup=kb_welcome())
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    storage.ensure_storage()
-    storage.migrate_old_csv_if_needed()
-
     tg_id = update.effective_user.id
-    existing = storage.find_by_telegram_id(tg_id)
+    existing = await async_storage.find_by_telegram_id(tg_id)
 
     if existing:
         await update.message.reply_text(
@@ -99,11 +178,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def join(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    storage.ensure_storage()
-    storage.migrate_old_csv_if_needed()
-
     tg_id = update.effective_user.id
-    existing = storage.find_by_telegram_id(tg_id)
+    existing = await async_storage.find_by_telegram_id(tg_id)
 
     if existing:
         await update.message.reply_text(
@@ -170,7 +246,7 @@ async def handle_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return STATE_PHONE
 
     # agar avval telefon bilan ro‘yxatdan o‘tgan bo‘lsa — tekshir
-    used = storage.find_by_phone(phone)
+    used = await async_storage.find_by_phone(phone)
     if used:
         # agar shu user bo‘lsa — info qaytar
         if str(used.get("telegram_id", "")).strip() == str(update.effective_user.id):
@@ -185,6 +261,7 @@ async def handle_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 "Agar bu xato bo‘lsa, admin bilan bog‘laning.",
                 reply_markup=_kb_after_registered_for(update.effective_user.id),
             )
+        _forget_user_data(update, context)
         return ConversationHandler.END
 
     context.user_data["phone"] = phone
@@ -199,7 +276,7 @@ async def handle_phone(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_region(update: Update, context: ContextTypes.DEFAULT_TYPE):
     region = (update.message.text or "").strip()
 
-    if region not in REGIONS:
+    if region not in _REGION_SET:
         await update.message.reply_text(
             "❌ Iltimos, viloyatni *faqat ro‘yxatdan* tanlang 👇",
             parse_mode=ParseMode.MARKDOWN,
@@ -211,24 +288,38 @@ async def handle_region(update: Update, context: ContextTypes.DEFAULT_TYPE):
     full_name = context.user_data.get("full_name", "").strip()
     phone = context.user_data.get("phone", "").strip()
 
-    async with LOCK:
-        storage.add_registration(
+    try:
+        # navbatga qo‘yiladi, diskka guruh bo‘lib yoziladi (write_queue)
+        await async_storage.add_registration(
             telegram_id=tg_id,
             full_name=full_name,
             phone=phone,
             region=region,
         )
+    except ValueError as e:
+        # parallel ro‘yxatdan o‘tish: tekshiruvdan keyin boshqasi band qilgan
+        _forget_user_data(update, context)
+        if str(e) == "phone_already_used":
+            text = (
+                "❌ Ushbu telefon raqam bilan avval ro‘yxatdan o‘tilgan.\n"
+                "Qayta ro‘yxatdan o‘tish mumkin emas.\n\n"
+                "Agar bu xato bo‘lsa, admin bilan bog‘laning."
+            )
+        else:
+            text = "✅ Siz allaqachon ro‘yxatdan o‘tgansiz.\n📄 Ma’lumotlarim tugmasini bosing."
+        await update.message.reply_text(text, reply_markup=_kb_after_registered_for(tg_id))
+        return ConversationHandler.END
 
     await update.message.reply_text(
         CONFIRM_TEXT,
         reply_markup=_kb_after_registered_for(tg_id),
     )
-    context.user_data.clear()
+    _forget_user_data(update, context)
     return ConversationHandler.END
 
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data.clear()
+    _forget_user_data(update, context)
     await update.message.reply_text(
         "✅ Bekor qilindi.\nQayta boshlash uchun /start bosing.",
         reply_markup=kb_welcome(),
@@ -236,12 +327,14 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ConversationHandler.END
 
 
-async def my_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    storage.ensure_storage()
-    storage.migrate_old_csv_if_needed()
+async def conversation_expired(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # CONVERSATION_TTL_SECONDS davomida javob bo‘lmadi - yarim ma’lumotni unutamiz
+    _forget_user_data(update, context)
 
+
+async def my_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tg_id = update.effective_user.id
-    existing = storage.find_by_telegram_id(tg_id)
+    existing = await async_storage.find_by_telegram_id(tg_id)
 
     if not existing:
         await update.message.reply_text(
@@ -267,10 +360,7 @@ async def my_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def help_msg(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
-        "ℹ️ Yordam:\n"
-        "• Ro‘yxatdan o‘tish uchun /start yoki 👉 Ishtirok etmoqchiman tugmasi.\n"
-        "• Jarayonni bekor qilish: /cancel\n"
-        "• Ro‘yxatdan o‘tgan bo‘lsangiz, 📄 Ma’lumotlarim tugmasi orqali tekshiring.",
+        HELP_TEXT,
         reply_markup=_kb_after_registered_for(update.effective_user.id),
     )
 
@@ -281,60 +371,244 @@ async def export_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Sizda admin huquqi yo‘q.")
         return
 
-    storage.ensure_storage()
-    storage.migrate_old_csv_if_needed()
+    req, err = export.parse_args(context.args, REGIONS)
+    if err:
+        await update.message.reply_text(
+            f"❌ {err}\n\n"
+            "Foydalanish: /export [csv|xlsx] [new] [from=YYYY-MM-DD] [to=YYYY-MM-DD] [viloyat]"
+        )
+        return
 
     try:
-        with open(REG_CSV_PATH, "rb") as f:
-            await update.message.reply_document(
-                document=f,
-                filename="registrations.csv",
-                caption="✅ Registrations CSV (Excel’da ham ochiladi).",
-            )
+        # fayl thread'da stream qilib yoziladi, event loop bloklanmaydi
+        result = await export.run_export(user_id, req)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Export xato: {e}")
+        return
+
+    try:
+        if req.only_new and not result.rows:
+            await update.message.reply_text("Oxirgi exportdan beri yangi ro‘yxatdan o‘tganlar yo‘q.")
+        else:
+            with open(result.path, "rb") as f:
+                await update.message.reply_document(
+                    document=f,
+                    filename=result.filename,
+                    caption=f"✅ Registrations {req.fmt.upper()}: {result.rows} ta (Excel’da ham ochiladi).",
+                )
+        if req.only_new:
+            export.save_cursor(user_id, req, result.last_seq)
     except Exception as e:
         await update.message.reply_text(f"❌ Export xato: {e}")
+    finally:
+        os.remove(result.path)
 
 
-async def admin_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    if not _is_admin(user_id):
+IMPORT_USAGE = (
+    "📥 Import: CSV yoki XLSX faylni /import izohi (caption) bilan yuboring.\n"
+    "Ustunlar: full_name, phone, region (ixtiyoriy: telegram_id).\n"
+    "/export fayli ham shundayligicha yuklanadi."
+)
+IMPORT_MAX_LISTED = 20
+
+
+def _import_text(result: importer.ImportResult) -> str:
+    text = (
+        "📥 Import\n\n"
+        f"Qatorlar: {result.total}\n"
+        f"✅ Qabul qilindi: {result.accepted}\n"
+        f"❌ Rad etildi: {len(result.rejected)}\n"
+    )
+    for code, n in result.reasons():
+        text += f"   • {importer.REASONS.get(code, code)}: {n}\n"
+    if result.rejected:
+        text += "\n"
+        for line, code in result.rejected[:IMPORT_MAX_LISTED]:
+            text += f"   {line}-qator: {importer.REASONS.get(code, code)}\n"
+        if len(result.rejected) > IMPORT_MAX_LISTED:
+            text += f"   ... yana {len(result.rejected) - IMPORT_MAX_LISTED} ta\n"
+    return text
+
+
+async def admin_import(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/import izohi bilan yuborilgan CSV/XLSX: bitta batch bo‘lib yoziladi"""
+    if not _is_admin(update.effective_user.id):
         await update.message.reply_text("❌ Sizda admin huquqi yo‘q.")
         return
 
-    storage.ensure_storage()
-    storage.migrate_old_csv_if_needed()
+    doc = update.message.document
+    fmt = importer.format_of(doc.file_name) if doc else None
+    if fmt is None:
+        await update.message.reply_text(IMPORT_USAGE)
+        return
+    if doc.file_size and doc.file_size > importer.MAX_FILE_BYTES:
+        await update.message.reply_text("❌ Fayl juda katta (20 MB gacha).")
+        return
 
-    rows = storage.list_last(limit=20)
-    if not rows:
-        await update.message.reply_text("Hozircha ro‘yxat bo‘sh.")
+    fd, path = tempfile.mkstemp(prefix="growz-import-", suffix="." + fmt)
+    os.close(fd)
+    try:
+        file = await doc.get_file()
+        await file.download_to_drive(path)
+        # pandas bilan thread'da tekshiriladi, keyin bitta group commit
+        result = await importer.run_import(path, fmt)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Import xato: {e}")
         return
+    finally:
+        os.remove(path)
+
+    # oddiy matn: sabablarda "telegram_id" bor, Markdown'da _ buziladi
+    await update.message.reply_text(_import_text(result))
+
+
+ADMIN_PAGE_SIZE = 20
+DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
 
-    text = "📋 *Oxirgi 20 ta ro‘yxatdan o‘tganlar:*\n\n"
-    for i, r in enumerate(rows, start=1):
+def _admin_page_text(page, query: str) -> str:
+    title = "📋 *Ro‘yxat* (yangilari birinchi)"
+    if query:
+        title += f"\n🔎 Qidiruv: `{query}`"
+    text = title + "\n\n"
+    for seq, r in page:
         text += (
-            f"{i}) *{r.get('full_name','-')}*\n"
+            f"#{seq}) *{r.get('full_name','-')}*\n"
             f"   📞 {r.get('phone','-')}\n"
             f"   📍 {r.get('region','-')}\n"
             f"   🕒 {r.get('registered_at','-')}\n\n"
         )
+    return text
+
+
+async def _admin_page(query: str, before=None, after=None):
+    """(sahifa, yangiroq kursor, eskiroq kursor); kursor None = tugma yo‘q."""
+    if after is not None:
+        page = await async_storage.page(after=after, limit=ADMIN_PAGE_SIZE, query=query)
+        # eskiroq sahifadan qaytdik, demak pastda yana bor
+        older = page[-1][0] if page else None
+    else:
+        page = await async_storage.page(before=before, limit=ADMIN_PAGE_SIZE + 1, query=query)
+        older = page[ADMIN_PAGE_SIZE - 1][0] if len(page) > ADMIN_PAGE_SIZE else None
+        page = page[:ADMIN_PAGE_SIZE]
+    if not page:
+        return page, None, None
+
+    newer = None
+    if before is not None or after is not None:
+        if await async_storage.page(after=page[0][0], limit=1, query=query):
+            newer = page[0][0]
+    return page, newer, older
+
+
+async def admin_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """📋 tugmasi yoki /list [ism|telefon|viloyat] yoki /list YYYY-MM-DD"""
+    user_id = update.effective_user.id
+    if not _is_admin(user_id):
+        await update.message.reply_text("❌ Sizda admin huquqi yo‘q.")
+        return
+
+    args = " ".join(context.args or []).strip()
+    before = None
+    query = ""
+    if DATE_RE.match(args):
+        before = await async_storage.seq_after_date(args)
+    else:
+        query = args
+    context.user_data["admin_list_query"] = query
+
+    page, newer, older = await _admin_page(query, before=before)
+    if not page:
+        await update.message.reply_text("Hozircha ro‘yxat bo‘sh." if not args else "Hech narsa topilmadi.")
+        return
 
     await update.message.reply_text(
-        text,
+        _admin_page_text(page, query),
         parse_mode=ParseMode.MARKDOWN,
-        reply_markup=_kb_after_registered_for(user_id),
+        reply_markup=kb_admin_pager(newer, older),
     )
 
 
+async def admin_list_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inline ⬅️/➡️: alist:n:<seq> (yangiroq), alist:o:<seq> (eskiroq)."""
+    cq = update.callback_query
+    if not _is_admin(update.effective_user.id):
+        await cq.answer("❌ Sizda admin huquqi yo‘q.")
+        return
+    await cq.answer()
+
+    _, direction, seq = cq.data.split(":")
+    query = context.user_data.get("admin_list_query", "")
+    if direction == "n":
+        page, newer, older = await _admin_page(query, after=int(seq))
+    else:
+        page, newer, older = await _admin_page(query, before=int(seq))
+    if not page:
+        return
+
+    await cq.edit_message_text(
+        _admin_page_text(page, query),
+        parse_mode=ParseMode.MARKDOWN,
+        reply_markup=kb_admin_pager(newer, older),
+    )
+
+
+STATS_MAX_DAYS = 90
+
+
+def _stats_text(st, days: int) -> str:
+    text = (
+        "📊 *Statistika*\n\n"
+        f"Jami: *{st['total']}*\n"
+        f"Telegram bog‘langan: {st['with_telegram']}\n\n"
+        f"*Oxirgi {days} kun:* {sum(n for _, n in st['days'])}\n"
+    )
+    for day, n in st["days"]:
+        text += f"   {day}: {n}\n"
+    if st["by_region_recent"]:
+        text += f"\n*Viloyatlar ({days} kun):*\n"
+        for region, n in st["by_region_recent"]:
+            text += f"   📍 {region or '-'}: {n}\n"
+    text += "\n*Viloyatlar (jami):*\n"
+    for region, n in st["by_region"]:
+        text += f"   📍 {region or '-'}: {n}\n"
+    return text
+
+
+async def admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/stats [kunlar] — hisoblagichlardan, faylni qayta o‘qimasdan"""
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Sizda admin huquqi yo‘q.")
+        return
+
+    days = 7
+    if context.args:
+        if not context.args[0].isdigit() or not 1 <= int(context.args[0]) <= STATS_MAX_DAYS:
+            await update.message.reply_text(f"Foydalanish: /stats [kunlar soni, 1-{STATS_MAX_DAYS}]")
+            return
+        days = int(context.args[0])
+
+    st = await async_storage.stats(days)
+    await update.message.reply_text(_stats_text(st, days), parse_mode=ParseMode.MARKDOWN)
+
+
 async def admin_export_btn(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await export_csv(update, context)
 
 
-async def unknown_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    storage.ensure_storage()
-    storage.migrate_old_csv_if_needed()
+async def flood_reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # storage'ga tegmaydi, faqat ogohlantirish
+    text = "⏳ Juda tez yuboryapsiz. Iltimos, biroz kutib qayta urinib ko‘ring."
+    if update.callback_query is not None:
+        await update.callback_query.answer(text)
+    elif update.effective_message is not None:
+        await update.effective_message.reply_text(text)
+    raise ApplicationHandlerStop
 
+
+async def unknown_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tg_id = update.effective_user.id
-    existing = storage.find_by_telegram_id(tg_id)
+    existing = await async_storage.find_by_telegram_id(tg_id)
 
     if existing:
         await update.message.reply_text(
@@ -349,40 +623,316 @@ async def unknown_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-def build_application():
+def button_router(routes, default):
+    """
+    Klaviatura tugmalari uchun bitta handler: matn dict'dan aniq topiladi
+    (O(1)), har tugmaga alohida Regex filtr zanjiri yo‘q. Topilmasa - default.
+    """
+    async def route_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        return await routes.get(update.effective_message.text, default)(update, context)
+
+    return route_buttons
+
+
+BROADCAST_USAGE = (
+    "Foydalanish: /broadcast matn\n"
+    "yoki: /broadcast Viloyat | matn\n\n"
+    "To‘xtatish: /broadcast_stop, davom ettirish: /broadcast_resume"
+)
+_broadcast_task: Optional[asyncio.Task] = None
+_broadcaster: Optional[broadcast.Broadcaster] = None
+
+
+def _broadcast_running() -> bool:
+    # shu jarayon ichida. WORKERS > 1: /broadcast* buyruqlari faqat
+    # 0-workerga yuboriladi (workers.route), boshqa worker xabar yubormaydi
+    return _broadcast_task is not None and not _broadcast_task.done()
+
+
+def _broadcast_status_text(state: broadcast.BroadcastState, rate: float, eta) -> str:
+    head = {
+        "running": "📣 Xabar yuborilmoqda...",
+        "done": "✅ Xabar yuborish tugadi.",
+        "stopped": "⏸ Xabar yuborish to‘xtatildi.",
+    }[state.status]
+    text = (
+        f"{head}\n"
+        f"📍 {state.region or 'Barcha viloyatlar'}\n"
+        f"✅ Yuborildi: {state.sent}\n"
+        f"🚫 Bloklagan: {state.blocked}\n"
+        f"⚠️ Xato: {state.failed}\n"
+        f"⚡ {rate:.1f} xabar/s"
+    )
+    if state.status == "running" and eta is not None:
+        text += f"\n⏳ Taxminan {int(eta // 60)} daq {int(eta % 60)} s qoldi"
+    return text
+
+
+def _start_broadcast(app: Application, state: broadcast.BroadcastState):
+    global _broadcast_task, _broadcaster
+    status_msg = None
+
+    async def on_progress(st, rate, eta):
+        # bitta xabarni tahrirlab boramiz, chatni to‘ldirmaslik uchun
+        nonlocal status_msg
+        text = _broadcast_status_text(st, rate, eta)
+        if status_msg is None:
+            status_msg = await app.bot.send_message(st.admin_chat_id, text)
+        else:
+            await status_msg.edit_text(text)
+
+    _broadcaster = broadcast.Broadcaster(
+        app.bot,
+        state,
+        BROADCAST_CHECKPOINT_PATH,
+        rate=BROADCAST_RATE_PER_SEC,
+        per_chat_interval=BROADCAST_PER_CHAT_INTERVAL,
+        concurrency=BROADCAST_CONCURRENCY,
+        on_progress=on_progress,
+    )
+    # app.create_task emas: to‘xtatishda application uni kutib qolmasin
+    _broadcast_task = asyncio.create_task(_broadcaster.run())
+
+
+async def broadcast_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Sizda admin huquqi yo‘q.")
+        return
+    if _broadcast_running():
+        await update.message.reply_text("⏳ Boshqa xabar yuborilmoqda. /broadcast_stop bilan to‘xtating.")
+        return
+
+    parts = (update.message.text or "").split(maxsplit=1)
+    body = parts[1].strip() if len(parts) > 1 else ""
+    region = None
+    if "|" in body:
+        head, rest = body.split("|", 1)
+        if head.strip() in _REGION_SET:
+            region, body = head.strip(), rest.strip()
+    if not body:
+        await update.message.reply_text(BROADCAST_USAGE)
+        return
+
+    state = broadcast.BroadcastState(text=body, region=region, admin_chat_id=update.effective_chat.id)
+    _start_broadcast(context.application, state)
+    await update.message.reply_text(
+        f"📣 Xabar yuborish boshlandi ({region or 'barcha viloyatlar'}).\n"
+        "To‘xtatish: /broadcast_stop"
+    )
+
+
+async def broadcast_stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Sizda admin huquqi yo‘q.")
+        return
+    if not _broadcast_running():
+        await update.message.reply_text("Hozir xabar yuborilmayapti.")
+        return
+    # cancel() emas: yo‘ldagi xabarlar tugab, checkpoint'ga yoziladi (qayta yuborilmaydi)
+    _broadcaster.stop()
+    await asyncio.gather(_broadcast_task, return_exceptions=True)
+    await update.message.reply_text("⏸ To‘xtatildi. Davom ettirish: /broadcast_resume")
+
+
+async def broadcast_resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Sizda admin huquqi yo‘q.")
+        return
+    if _broadcast_running():
+        await update.message.reply_text("⏳ Xabar allaqachon yuborilmoqda.")
+        return
+    state = broadcast.load_state(BROADCAST_CHECKPOINT_PATH)
+    if state is None or state.status == "done":
+        await update.message.reply_text("Davom ettiriladigan xabar yo‘q.")
+        return
+    state.status = "running"
+    state.admin_chat_id = update.effective_chat.id
+    _start_broadcast(context.application, state)
+    await update.message.reply_text(f"▶️ Davom ettirilmoqda: {state.sent} ta yuborilgan edi.")
+
+
+METRICS_TITLES = {
+    "bot_handler_seconds": "Handlerlar",
+    "bot_storage_seconds": "Storage",
+    "bot_telegram_api_seconds": "Telegram API",
+    "bot_event_loop_lag_seconds": "Event loop lag",
+}
+
+
+def _metrics_text() -> str:
+    lines = []
+    current = None
+    for name, label, count, p50, p95 in metrics.summary():
+        if name != current:
+            current = name
+            lines.append(f"\n{METRICS_TITLES.get(name, name)}:  n / p50 / p95 ms")
+        lines.append(f"  {label or '-':<22}{count:>7} {p50 * 1000:>8.1f} {p95 * 1000:>8.1f}")
+    scanned = {op: n for (name, op), n in metrics.counters().items()
+               if name == "bot_storage_rows_scanned_total"}
+    if scanned:
+        lines.append("\nO‘qilgan qatorlar:")
+        for op, n in sorted(scanned.items()):
+            lines.append(f"  {op:<22}{int(n):>10}")
+    return "\n".join(lines).strip() or "Hozircha ma’lumot yo‘q."
+
+
+async def admin_metrics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not _is_admin(update.effective_user.id):
+        await update.message.reply_text("❌ Sizda admin huquqi yo‘q.")
+        return
+    if not metrics.ENABLED:
+        await update.message.reply_text("Metrikalar o‘chirilgan (.env: METRICS_ENABLED=1).")
+        return
+    # Telegram xabari 4096 belgigacha
+    text = html.escape(_metrics_text())[:4000]
+    await update.message.reply_text(f"<pre>{text}</pre>", parse_mode=ParseMode.HTML)
+
+
+_startup_tasks = []
+
+
+async def _freeze_gc_after_warm_up():
+    # registry yozuvlarida sikl yo‘q: yuklangandan keyin GC ularni har to‘liq
+    # yig‘ishda aylanib chiqmasin. Bir marta, storage emas - bot jarayoni qiladi
+    try:
+        await async_storage.wait_warm()
+    except Exception:
+        return  # xato async_storage'da log qilingan
+    gc.freeze()
+
+
+async def _on_startup(app: Application):
+    await async_storage.init()
+    _startup_tasks.append(asyncio.create_task(_freeze_gc_after_warm_up()))
+    if metrics.ENABLED:
+        metrics.register_gauge("bot_write_queue", "stat", lambda: async_storage.queue_stats() or {})
+        _startup_tasks.append(asyncio.create_task(metrics.watch_loop_lag()))
+        if METRICS_PORT and not app.bot_data.get("profile_startup"):
+            # har bir worker o‘z portida: 9464, 9465, ...
+            app.bot_data["metrics_server"] = metrics.start_http_server(
+                METRICS_LISTEN, METRICS_PORT + WORKER_INDEX
+            )
+    if app.bot_data.get("profile_startup"):
+        return  # main.py --profile-startup: port ochilmaydi, hech kimga xabar ketmaydi
+    # bot to‘xtab qolgan paytda yuborilayotgan xabar bo‘lsa, davom ettiramiz
+    # (WORKERS > 1: faqat birinchi worker)
+    state = broadcast.load_state(BROADCAST_CHECKPOINT_PATH) if WORKER_INDEX == 0 else None
+    if state is not None and state.status == "running":
+        _start_broadcast(app, state)
+
+
+async def _on_stop(app: Application):
+    if _broadcast_running():
+        _broadcaster.stop()
+        await asyncio.gather(_broadcast_task, return_exceptions=True)
+        # admin to‘xtatmagan: keyingi ishga tushishda avtomatik davom etadi
+        _broadcaster.state.status = "running"
+        broadcast.save_state(BROADCAST_CHECKPOINT_PATH, _broadcaster.state)
+
+
+async def _on_shutdown(app: Application):
+    for task in _startup_tasks:
+        task.cancel()
+    server = app.bot_data.pop("metrics_server", None)
+    if server is not None:
+        server.shutdown()
+    await async_storage.close()
+
+
+def build_application(request: Optional[BaseRequest] = None):
+    """request: Telegram'ga ulanmasdan ishlatish uchun (benchmarks/fake_telegram.py)."""
     if not BOT_TOKEN:
         raise RuntimeError("BOT_TOKEN topilmadi. .env faylni tekshiring.")
 
-    app = Application.builder().token(BOT_TOKEN).build()
+    persistence = SqlitePersistence(
+        PERSISTENCE_PATH,
+        ttl_seconds=CONVERSATION_TTL_SECONDS,
+        update_interval=PERSISTENCE_UPDATE_INTERVAL,
+    )
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(_on_startup)
+        .post_stop(_on_stop)
+        .post_shutdown(_on_shutdown)
+        .persistence(persistence)
+    )
+    if MAX_CONCURRENT_UPDATES > 1:
+        # har xil foydalanuvchilar parallel, bitta foydalanuvchi - navbat bilan
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+    if request is not None:
+        builder = builder.get_updates_request(request)
+    if metrics.ENABLED:
+        # getUpdates uzoq kutadi (long polling) - faqat botning o‘z so‘rovlari o‘lchanadi
+        request = metrics.InstrumentedRequest(request or HTTPXRequest(connection_pool_size=256))
+    if request is not None:
+        builder = builder.request(request)
+    app = builder.build()
+
+    def drop_if_empty(user_id: int):
+        # PTB flush paytida bo‘sh dict'ni qayta yaratadi - xotirada qolmasin
+        if not app.user_data.get(user_id, True):
+            app.drop_user_data(user_id)
+
+    persistence.on_empty_user_data = drop_if_empty
+
+    timed = metrics.instrument  # METRICS_ENABLED o‘chiq bo‘lsa handler o‘zgarmaydi
 
     conv = ConversationHandler(
         entry_points=[
-            MessageHandler(filters.Regex(f"^{re.escape(CTA_JOIN_TEXT)}$"), join),
-            CommandHandler("start", start),
+            MessageHandler(filters.Text([CTA_JOIN_TEXT]), timed(join)),
+            CommandHandler("start", timed(start)),
         ],
         states={
-            STATE_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_name)],
+            STATE_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(handle_name))],
             STATE_PHONE: [
-                MessageHandler(filters.CONTACT, handle_phone),
-                MessageHandler(filters.ALL & ~filters.COMMAND, handle_phone),
+                MessageHandler(filters.CONTACT, timed(handle_phone)),
+                MessageHandler(filters.ALL & ~filters.COMMAND, timed(handle_phone)),
             ],
-            STATE_REGION: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_region)],
+            STATE_REGION: [MessageHandler(filters.TEXT & ~filters.COMMAND, timed(handle_region))],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, timed(conversation_expired))],
         },
-        fallbacks=[CommandHandler("cancel", cancel)],
+        fallbacks=[CommandHandler("cancel", timed(cancel))],
         allow_reentry=True,
+        name="registration",
+        persistent=True,
+        conversation_timeout=CONVERSATION_TTL_SECONDS,
     )
 
-    app.add_handler(conv)
-
-    app.add_handler(CommandHandler("cancel", cancel))
-    app.add_handler(CommandHandler("export", export_csv))
-
-    app.add_handler(MessageHandler(filters.Regex(f"^{re.escape(BTN_MY_INFO)}$"), my_info))
-    app.add_handler(MessageHandler(filters.Regex(f"^{re.escape(BTN_HELP)}$"), help_msg))
+    if THROTTLE_ENABLED:
+        # group -1: boshqa handlerlardan oldin, spam storage'gacha yetib bormaydi
+        guard = FloodGuard(
+            rate=THROTTLE_RATE_PER_SEC,
+            burst=THROTTLE_BURST,
+            duplicate_window=THROTTLE_DUPLICATE_WINDOW_S,
+            notify_interval=THROTTLE_NOTIFY_INTERVAL_S,
+            max_users=THROTTLE_MAX_USERS,
+        )
+        app.add_handler(ThrottleHandler(guard, flood_reply, exempt=ADMIN_IDS), group=-1)
 
-    app.add_handler(MessageHandler(filters.Regex(f"^{re.escape(BTN_ADMIN_LIST)}$"), admin_list))
-    app.add_handler(MessageHandler(filters.Regex(f"^{re.escape(BTN_ADMIN_EXPORT)}$"), admin_export_btn))
+    app.add_handler(conv)
 
-    app.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, unknown_message))
+    app.add_handler(CommandHandler("cancel", timed(cancel)))
+    app.add_handler(CommandHandler("export", timed(export_csv)))
+    app.add_handler(CommandHandler("import", timed(admin_import)))
+    # hujjat izohidagi /import: CommandHandler faqat matnni ko‘radi
+    app.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r"^/import(@\w+)?(\s|$)"), timed(admin_import)
+    ))
+    app.add_handler(CommandHandler("list", timed(admin_list)))
+    app.add_handler(CommandHandler("stats", timed(admin_stats)))
+    app.add_handler(CommandHandler("metrics", admin_metrics))
+    app.add_handler(CommandHandler("broadcast", timed(broadcast_cmd)))
+    app.add_handler(CommandHandler("broadcast_stop", timed(broadcast_stop)))
+    app.add_handler(CommandHandler("broadcast_resume", timed(broadcast_resume)))
+    app.add_handler(CallbackQueryHandler(timed(admin_list_page), pattern=r"^alist:[no]:\d+$"))
+
+    # tugmalar va qolgan hamma xabar: bitta handler, dict bo‘yicha
+    app.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, button_router({
+        BTN_MY_INFO: timed(my_info),
+        BTN_HELP: timed(help_msg),
+        BTN_ADMIN_LIST: timed(admin_list),
+        BTN_ADMIN_EXPORT: timed(admin_export_btn),
+    }, default=timed(unknown_message))))
 
     return app
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+Admin broadcast to registered users.
+
+Recipients are streamed from storage in chunks (never the whole registry
+in memory), optionally filtered by region. Sends go through a global
+token bucket plus a per-chat limiter, RetryAfter pauses everyone,
+blocked users are counted and skipped. After every chunk the position is
+checkpointed to BROADCAST_CHECKPOINT_PATH, so a stopped or crashed
+broadcast resumes where it left off instead of starting again.
+Broadcaster.stop() lets the sends already on the wire finish and records
+them before the checkpoint; cancelling run() instead can't tell whether
+those went out, so a resume may send them a second time.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from itertools import islice
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 50
+
+
+@dataclass
+class BroadcastState:
+    text: str
+    region: Optional[str]
+    admin_chat_id: int
+    status: str = "running"  # running | done | stopped
+    cursor: int = 0          # every seq <= cursor is handled
+    done: List[int] = field(default_factory=list)  # handled seqs > cursor (interrupted chunk)
+    last_seq: int = 0        # registry end when started, for the ETA
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.time)
+
+
+def load_state(path: str) -> Optional[BroadcastState]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return BroadcastState(**json.load(f))
+    except (FileNotFoundError, ValueError, TypeError):
+        return None
+
+
+def save_state(path: str, state: BroadcastState):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(state), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class TokenBucket:
+    """rate tokens per second, bursts up to capacity; pause() stops everyone (RetryAfter)."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PerChatLimiter:
+    """At most one message per chat per interval; remembers only chats seen within it."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._last: "OrderedDict[int, float]" = OrderedDict()
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        while self._last:
+            oldest_chat, oldest_at = next(iter(self._last.items()))
+            if now - oldest_at < self.interval:
+                break
+            del self._last[oldest_chat]
+
+        last = self._last.get(chat_id)
+        if last is not None:
+            await asyncio.sleep(self.interval - (now - last))
+        self._last[chat_id] = time.monotonic()
+        self._last.move_to_end(chat_id)
+
+
+ProgressFn = Callable[[BroadcastState, float, Optional[float]], Awaitable[None]]
+
+
+def _retry_seconds(e: RetryAfter) -> float:
+    ra = e.retry_after
+    return ra.total_seconds() if isinstance(ra, timedelta) else float(ra)
+
+
+def _next_chunk(after: int, region: Optional[str]) -> Tuple[List[Tuple[int, int]], int]:
+    """Blocking: ([(seq, chat_id)], last seq read). Runs in a thread."""
+    rows = list(islice(storage.iter_rows(after), CHUNK_SIZE))
+    out = []
+    for seq, r in rows:
+        if not r["telegram_id"].isdigit():
+            continue  # migrated rows without telegram_id
+        if region and r["region"] != region:
+            continue
+        out.append((seq, int(r["telegram_id"])))
+    return out, (rows[-1][0] if rows else after)
+
+
+class Broadcaster:
+    def __init__(self, bot, state: BroadcastState, checkpoint_path: str,
+                 rate: float = 25, per_chat_interval: float = 1.0, concurrency: int = 8,
+                 on_progress: Optional[ProgressFn] = None, progress_every: float = 5.0):
+        self.bot = bot
+        self.state = state
+        self.checkpoint_path = checkpoint_path
+        self.bucket = TokenBucket(rate)
+        self.per_chat = PerChatLimiter(per_chat_interval)
+        self.concurrency = concurrency
+        self.on_progress = on_progress
+        self.progress_every = progress_every
+        self._stopping = False
+        # deliveries still waiting for their turn: stop() cancels only these
+        self._waiting = set()
+
+    def stop(self):
+        """No new sends start; await run() for the ones in flight and the checkpoint."""
+        self._stopping = True
+        for task in list(self._waiting):
+            task.cancel()
+
+    async def _send(self, chat_id: int) -> str:
+        me = asyncio.current_task()
+        while True:
+            if self._stopping:
+                raise asyncio.CancelledError
+            self._waiting.add(me)
+            try:
+                await self.bucket.acquire()
+                await self.per_chat.wait(chat_id)
+            finally:
+                self._waiting.discard(me)
+            # from here on the message goes out: stop() waits for the answer
+            try:
+                await self.bot.send_message(chat_id, self.state.text)
+                return "sent"
+            except RetryAfter as e:
+                self.bucket.pause(_retry_seconds(e))
+            except Forbidden:
+                return "blocked"
+            except TelegramError as e:
+                logger.warning("Broadcast to %s failed: %s", chat_id, e)
+                return "failed"
+
+    def _count(self, outcome: str):
+        if outcome == "sent":
+            self.state.sent += 1
+        elif outcome == "blocked":
+            self.state.blocked += 1
+        else:
+            self.state.failed += 1
+
+    async def _progress(self, t0: float, seq0: int, final: bool = False):
+        if self.on_progress is None:
+            return
+        elapsed = time.monotonic() - t0
+        rate = (self.state.sent + self.state.blocked + self.state.failed) / elapsed if elapsed else 0.0
+        rows_per_s = (self.state.cursor - seq0) / elapsed if elapsed else 0.0
+        remaining = max(self.state.last_seq - self.state.cursor, 0)
+        eta = 0.0 if final else (remaining / rows_per_s if rows_per_s else None)
+        try:
+            await self.on_progress(self.state, rate, eta)
+        except TelegramError:
+            pass  # progress is best effort
+
+    async def run(self) -> BroadcastState:
+        loop = asyncio.get_running_loop()
+        state = self.state
+        if not state.last_seq:
+            state.last_seq = await loop.run_in_executor(None, storage.last_seq)
+        sem = asyncio.Semaphore(self.concurrency)
+        t0 = time.monotonic()
+        seq0 = state.cursor
+        last_report = t0
+
+        async def deliver(seq: int, chat_id: int):
+            async with sem:
+                try:
+                    outcome = await self._send(chat_id)
+                except asyncio.CancelledError:
+                    if not self._stopping:
+                        raise
+                    return  # stop(): never sent, stays for the resume
+                self._count(outcome)
+                state.done.append(seq)
+
+        try:
+            while True:
+                if self._stopping:
+                    state.status = "stopped"
+                    break
+                chunk, last_read = await loop.run_in_executor(None, _next_chunk, state.cursor, state.region)
+                if last_read == state.cursor:
+                    state.status = "done"
+                    break
+                skip = set(state.done)
+                await asyncio.gather(*(deliver(seq, cid) for seq, cid in chunk if seq not in skip))
+                if self._stopping:
+                    continue  # chunk not finished: `done` has what went out
+                state.cursor = last_read
+                state.done = []
+                await loop.run_in_executor(None, save_state, self.checkpoint_path, state)
+
+                if time.monotonic() - last_report >= self.progress_every:
+                    last_report = time.monotonic()
+                    await self._progress(t0, seq0)
+        except asyncio.CancelledError:
+            state.status = "stopped"
+            raise
+        finally:
+            # on stop/crash `done` keeps the part of the chunk already delivered
+            save_state(self.checkpoint_path, state)
+        if state.status == "done":
+            await self._progress(t0, seq0, final=True)
+        return state
@@ -14,3 +14,75 @@ else:
 ASSETS_WELCOME_PATH = os.path.join("assets", "welcome.png")
 DATA_DIR = "data"
 REG_CSV_PATH = os.path.join(DATA_DIR, "registrations.csv")
+REG_DB_PATH = os.path.join(DATA_DIR, "registrations.db")
+EXPORT_CURSORS_PATH = os.path.join(DATA_DIR, "export_cursors.json")
+FILE_ID_CACHE_PATH = os.path.join(DATA_DIR, "file_ids.json")
+PERSISTENCE_PATH = os.path.join(DATA_DIR, "conversations.db")
+BROADCAST_CHECKPOINT_PATH = os.path.join(DATA_DIR, "broadcast.json")
+# queued sign-ups the bot could not commit before it stopped (re-add them by hand)
+UNSAVED_REGISTRATIONS_PATH = os.path.join(DATA_DIR, "registrations.unsaved.csv")
+
+# "csv" (default) or "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv").strip().lower()
+
+# storage runs off the event loop: N reader threads + 1 writer thread
+STORAGE_READ_WORKERS = int(os.getenv("STORAGE_READ_WORKERS", "4"))
+# how often the CSV backend stat()s the file to notice external edits
+STORAGE_RECHECK_SECONDS = float(os.getenv("STORAGE_RECHECK_SECONDS", "1"))
+# CSV backend: answer lookups and sign-up checks from an mmap'd sorted
+# index (data/registrations.csv.idx) instead of loading every row at
+# startup; admin lists, /stats and export still load them on first use
+STORAGE_MMAP_INDEX = os.getenv("STORAGE_MMAP_INDEX", "0").strip() == "1"
+
+# write-behind registration queue (group commit). Off when WORKERS > 1:
+# a queue only knows its own process's pending rows, so two workers could
+# both confirm the same phone; there every sign-up is checked under the flock
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "1").strip() == "1"
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "500"))
+WRITE_QUEUE_MAX_DELAY_MS = float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "5"))
+WRITE_QUEUE_MAX_PENDING = int(os.getenv("WRITE_QUEUE_MAX_PENDING", "10000"))
+# on shutdown: how long to keep retrying failed commits before giving up
+WRITE_QUEUE_STOP_TIMEOUT_S = float(os.getenv("WRITE_QUEUE_STOP_TIMEOUT_S", "30"))
+
+# "polling" (default) or "webhook"
+RUN_MODE = os.getenv("RUN_MODE", "polling").strip().lower()
+# public https URL Telegram posts to, e.g. https://bot.example.uz
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").strip().rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram").strip().strip("/")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0").strip()
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "").strip()
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# updates processed in parallel (same user stays in order); 1 = sequential
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+
+# conversation state + user_data survive restarts (SQLite, batched writes)
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "5"))
+# idle half-finished registrations expire after this many seconds
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", "21600"))
+
+# broadcast: Telegram allows ~30 msg/s overall and ~1 msg/s per chat
+BROADCAST_RATE_PER_SEC = float(os.getenv("BROADCAST_RATE_PER_SEC", "25"))
+BROADCAST_PER_CHAT_INTERVAL = float(os.getenv("BROADCAST_PER_CHAT_INTERVAL", "1"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "8"))
+
+# latency/storage/API instrumentation; off = handlers are not wrapped at all
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0").strip() == "1"
+# local Prometheus-style endpoint, http://127.0.0.1:9464/metrics; 0 = /metrics command only
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1").strip()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+# anti-flood: per-user token bucket + dropping identical repeated messages
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "1").strip() == "1"
+THROTTLE_RATE_PER_SEC = float(os.getenv("THROTTLE_RATE_PER_SEC", "1"))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "5"))
+THROTTLE_DUPLICATE_WINDOW_S = float(os.getenv("THROTTLE_DUPLICATE_WINDOW_S", "3"))
+THROTTLE_NOTIFY_INTERVAL_S = float(os.getenv("THROTTLE_NOTIFY_INTERVAL_S", "10"))
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "100000"))
+
+# WORKERS > 1: main.py fetches updates once and routes each user to one of
+# N worker processes (python main.py, RUN_MODE as usual)
+WORKERS = int(os.getenv("WORKERS", "1"))
+# set by the supervisor for each worker process
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
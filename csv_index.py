@@ -0,0 +1,361 @@
+"""
+On-disk index next to registrations.csv, so find_by_phone /
+find_by_telegram_id (and the uniqueness checks before an insert) work
+without loading the whole registry:
+
+    <path>.idx        main segment: header + sorted (key, byte offset)
+                      pairs for phones, then for telegram_ids
+    <path>.idx.delta  rows appended since the main segment was written
+
+The main segment is mmap'd and binary-searched, so a lookup touches a
+few pages, then reads the one CSV row at the offset. Keys are 64-bit:
+the number itself for digit strings, a hash for anything else. Every
+hit is checked against the row it points to (see RegistrationStore),
+so collisions and leading zeros only cost an extra read.
+
+Appends go to the delta file (and an in-memory dict); once it holds
+enough entries it is merged into a new main segment. The index knows
+which CSV bytes it covers (inode, size, mtime): rows appended without it
+(another worker with the registry in memory, a crash before the delta
+write) are picked up from the tail, a rewrite means a rebuild.
+
+All methods expect the caller to hold the store's lock and file lock.
+"""
+import csv
+import heapq
+import mmap
+import os
+import struct
+from array import array
+from collections import deque
+from hashlib import blake2b
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from storage import FIELDNAMES, normalize_phone
+
+# what can be looked up: the Registration field names
+PHONE = "phone"
+TELEGRAM_ID = "telegram_id"
+_CODES = {PHONE: b"p", TELEGRAM_ID: b"t"}
+_KINDS = {code: kind for kind, code in _CODES.items()}
+_END = b"e"  # delta batch trailer: CSV size and mtime after the batch
+
+MAGIC = b"GRZIDX1\n"
+# magic, csv inode, csv size, csv mtime_ns, phone entries, telegram_id entries
+_HEADER = struct.Struct("=8sQQQQQ")
+_DELTA = struct.Struct("=cQQ")  # kind, key, offset (or size, mtime_ns for _END)
+
+# merge the delta into the main segment at this many entries, or at 1/8
+# of the main segment if that is bigger (amortized O(1) per append)
+COMPACT_MIN = 10_000
+
+_KEY_MASK = (1 << 64) - 1
+
+
+def key_of(text: str) -> int:
+    if text.isdigit() and text.isascii() and len(text) <= 19:
+        return int(text)
+    return int.from_bytes(blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def record_keys(rec: List[str]) -> Tuple[str, str]:
+    """(telegram_id, normalized phone) of a CSV record, cleaned like Registration.from_text."""
+    rec = rec + [""] * (3 - len(rec))
+    return rec[0].strip(), normalize_phone(rec[2].strip())
+
+
+def records(f: BinaryIO, start: int) -> Iterator[Tuple[int, List[str]]]:
+    """(byte offset, fields) of every CSV record from `start` on."""
+    f.seek(start)
+    offsets: deque = deque()
+
+    def lines():
+        pos, quoted = start, False
+        for raw in f:
+            if not quoted:
+                offsets.append(pos)
+            pos += len(raw)
+            if raw.count(b'"') % 2:
+                quoted = not quoted
+            yield raw.decode("utf-8")
+
+    for rec in csv.reader(lines()):
+        yield offsets.popleft(), rec
+
+
+def read_record(f: BinaryIO, offset: int) -> Optional[List[str]]:
+    f.seek(offset)
+    data = f.readline()
+    while data.count(b'"') % 2:  # quoted newline: the record goes on
+        line = f.readline()
+        if not line:
+            break
+        data += line
+    try:
+        return next(csv.reader([data.decode("utf-8")]), None)
+    except (UnicodeDecodeError, csv.Error):
+        return None  # offset from before a rewrite we haven't noticed yet
+
+
+class CsvIndex:
+    def __init__(self, csv_path: str, compact_min: int = COMPACT_MIN):
+        self.csv_path = csv_path
+        self.path = csv_path + ".idx"
+        self.delta_path = self.path + ".delta"
+        self.compact_min = compact_min
+
+        self._csv: Optional[BinaryIO] = None  # kept open for row reads
+        self._mm: Optional[mmap.mmap] = None
+        self._ino: Optional[int] = None  # of the .idx file we mapped
+        self._sections: Dict[str, Tuple[memoryview, int]] = {}
+        self._covered: Tuple[int, int, int] = (0, 0, 0)
+        self._delta: Dict[str, Dict[int, List[int]]] = {PHONE: {}, TELEGRAM_ID: {}}
+        self._delta_entries = 0
+        self._delta_size = 0  # bytes of .delta applied
+        # rows found by a tail scan, written to .delta by the next append()
+        self._unsaved: List[Tuple[str, int, int]] = []
+
+    # ---- reading
+
+    def rows(self, kind: str, text: str) -> Iterator[List[str]]:
+        """CSV records that may have this phone / telegram_id, oldest first (check them)."""
+        offsets = self.offsets(kind, text)
+        if not offsets:
+            return
+        if self._csv is None:
+            self._csv = open(self.csv_path, "rb")
+        for offset in offsets:
+            rec = read_record(self._csv, offset)
+            if rec:
+                yield rec
+
+    def offsets(self, kind: str, text: str) -> List[int]:
+        """Offsets of the rows that may have this phone / telegram_id, oldest first."""
+        key = key_of(text)
+        out = []
+        mv, n = self._sections[kind]
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if mv[2 * mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        while lo < n and mv[2 * lo] == key:
+            out.append(mv[2 * lo + 1])
+            lo += 1
+        out.extend(self._delta[kind].get(key, ()))
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "phones": self._sections[PHONE][1] if self._sections else 0,
+            "telegram_ids": self._sections[TELEGRAM_ID][1] if self._sections else 0,
+            "delta_entries": self._delta_entries,
+            "covered_bytes": self._covered[1],
+        }
+
+    # ---- keeping up with the files
+
+    def sync(self) -> bool:
+        """
+        Catch up with the index files and the CSV. False = the index is
+        missing, broken or the CSV was rewritten: call rebuild().
+        """
+        try:
+            ino = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return False
+        # rows we picked up from the tail may have been saved by another
+        # writer meanwhile: start over rather than index them twice
+        if (ino != self._ino or self._unsaved and self._delta_grew()) and not self._open_main():
+            return False
+        if not self._read_delta():
+            return False
+
+        try:
+            st = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return False
+        csv_ino, size, mtime_ns = self._covered
+        if self._csv is not None and os.fstat(self._csv.fileno()).st_ino != st.st_ino:
+            self._csv.close()  # replaced: read rows from the new file
+            self._csv = None
+        if st.st_ino != csv_ino or st.st_size < size:
+            return False
+        if st.st_size == size:
+            return st.st_mtime_ns == mtime_ns
+
+        # grew: rows appended by someone who didn't update the index
+        with open(self.csv_path, "rb") as f:
+            for offset, rec in records(f, size):
+                self._add_record(offset, rec, self._unsaved)
+            st = os.fstat(f.fileno())
+        self._covered = (csv_ino, st.st_size, st.st_mtime_ns)
+        return True
+
+    def _open_main(self) -> bool:
+        self.close()
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_size < _HEADER.size:
+                    return False
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return False
+        magic, csv_ino, size, mtime_ns, n_phone, n_tg = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or len(mm) != _HEADER.size + 16 * (n_phone + n_tg):
+            mm.close()
+            return False
+
+        entries = memoryview(mm)[_HEADER.size:].cast("Q")
+        self._mm, self._ino = mm, st.st_ino
+        self._sections = {
+            PHONE: (entries[:2 * n_phone], n_phone),
+            TELEGRAM_ID: (entries[2 * n_phone:], n_tg),
+        }
+        self._covered = (csv_ino, size, mtime_ns)
+        self._delta = {PHONE: {}, TELEGRAM_ID: {}}
+        self._delta_entries = self._delta_size = 0
+        self._unsaved = []
+        return True
+
+    def _delta_grew(self) -> bool:
+        try:
+            return os.path.getsize(self.delta_path) > self._delta_size
+        except FileNotFoundError:
+            return False
+
+    def _read_delta(self) -> bool:
+        try:
+            with open(self.delta_path, "rb") as f:
+                f.seek(self._delta_size)
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        if not data:
+            return True
+
+        batch = []
+        applied = 0
+        for pos in range(0, len(data) - _DELTA.size + 1, _DELTA.size):
+            code, a, b = _DELTA.unpack_from(data, pos)
+            if code == _END:
+                for k, key, offset in batch:
+                    self._delta[k].setdefault(key, []).append(offset)
+                self._delta_entries += len(batch)
+                batch = []
+                self._covered = (self._covered[0], a, b)
+                applied = pos + _DELTA.size
+            elif code in _KINDS:
+                batch.append((_KINDS[code], a, b))
+            else:
+                return False  # torn write: rebuild
+        # an unfinished batch is left for the tail scan
+        self._delta_size += applied
+        return True
+
+    def _add_record(self, offset: int, rec: List[str], out: List[Tuple[str, int, int]]):
+        if not any(rec):
+            return
+        tid, phone = record_keys(rec)
+        for kind, text in ((TELEGRAM_ID, tid), (PHONE, phone)):
+            if text:
+                key = key_of(text)
+                self._delta[kind].setdefault(key, []).append(offset)
+                self._delta_entries += 1
+                out.append((kind, key, offset))
+
+    # ---- writing (caller holds the exclusive file lock)
+
+    def append(self, entries: List[Tuple[int, List[str]]], size: int, mtime_ns: int):
+        """Rows just appended to the CSV as (offset, fields); size/mtime_ns of the CSV after."""
+        new: List[Tuple[str, int, int]] = []
+        for offset, rec in entries:
+            self._add_record(offset, rec, new)
+        data = b"".join(_DELTA.pack(_CODES[kind], key, offset) for kind, key, offset in self._unsaved + new)
+        data += _DELTA.pack(_END, size, mtime_ns)
+        with open(self.delta_path, "ab") as f:
+            f.seek(self._delta_size)
+            f.truncate()  # drop an unfinished batch left by a crash
+            f.write(data)
+        self._delta_size += len(data)
+        self._unsaved = []
+        self._covered = (self._covered[0], size, mtime_ns)
+
+        main = self._sections[PHONE][1] + self._sections[TELEGRAM_ID][1]
+        if self._delta_entries >= max(self.compact_min, main // 8):
+            self.compact()
+
+    def compact(self):
+        """Merge the delta into a new main segment."""
+        sections = {}
+        for kind in (PHONE, TELEGRAM_ID):
+            mv, _ = self._sections[kind]
+            delta = sorted((key, offset) for key, offs in self._delta[kind].items() for offset in offs)
+            out = array("Q")
+            for key, offset in heapq.merge(zip(mv[0::2], mv[1::2]), delta):
+                out.append(key)
+                out.append(offset)
+            sections[kind] = out
+        self._write_main(sections, self._covered)
+
+    def rebuild(self):
+        """Index the whole CSV (new format only) from scratch."""
+        packed: Dict[str, List[int]] = {PHONE: [], TELEGRAM_ID: []}
+        with open(self.csv_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            rows = records(f, 0)
+            header = next(rows, (0, []))[1]
+            if [h.strip() for h in header] != FIELDNAMES:
+                raise ValueError(f"{self.csv_path}: unexpected header {header}")
+            for offset, rec in rows:
+                if not any(rec):
+                    continue
+                tid, phone = record_keys(rec)
+                # one int per entry sorts in far less memory than tuples
+                if tid:
+                    packed[TELEGRAM_ID].append(key_of(tid) << 64 | offset)
+                if phone:
+                    packed[PHONE].append(key_of(phone) << 64 | offset)
+            covered = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+        sections = {}
+        for kind, values in packed.items():
+            values.sort()
+            out = array("Q")
+            for v in values:
+                out.append(v >> 64)
+                out.append(v & _KEY_MASK)
+            sections[kind] = out
+            values.clear()
+        self._write_main(sections, covered)
+
+    def _write_main(self, sections: Dict[str, array], covered: Tuple[int, int, int]):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, *covered,
+                                 len(sections[PHONE]) // 2, len(sections[TELEGRAM_ID]) // 2))
+            sections[PHONE].tofile(f)
+            sections[TELEGRAM_ID].tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # empty the delta before the swap: a crash in between leaves the
+        # old main segment, and the tail scan redoes what the delta had
+        open(self.delta_path, "wb").close()
+        os.replace(tmp_path, self.path)
+        if not self._open_main():
+            raise RuntimeError(f"{self.path}: index written but unreadable")
+
+    def close(self):
+        if self._csv is not None:
+            self._csv.close()
+            self._csv = None
+        for mv, _ in self._sections.values():
+            mv.release()
+        self._sections = {}
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._ino = None
@@ -0,0 +1,179 @@
+"""
+Streaming admin export: storage.iter_rows() -> filters -> CSV / XLSX file.
+
+Rows are never collected into a list, XLSX uses openpyxl's write-only
+mode, so memory stays flat however big the registry is. Cursors (last
+exported seq) per admin and filter make "only new" exports read just the
+tail: rows the filter skipped stay new for every other filter.
+"""
+import asyncio
+import csv
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+import storage
+from config import EXPORT_CURSORS_PATH
+from storage import FIELDNAMES
+
+FORMATS = ("csv", "xlsx")
+
+
+@dataclass
+class ExportRequest:
+    fmt: str = "csv"
+    region: Optional[str] = None
+    date_from: Optional[str] = None  # YYYY-MM-DD, inclusive
+    date_to: Optional[str] = None    # YYYY-MM-DD, inclusive
+    only_new: bool = False
+
+
+@dataclass
+class ExportResult:
+    path: str
+    filename: str
+    rows: int
+    last_seq: int
+
+
+def _load_cursors() -> Dict[str, int]:
+    try:
+        with open(EXPORT_CURSORS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def cursor_key(admin_id: int, req: ExportRequest) -> str:
+    """"<admin_id>" without filters, else "<admin_id>:<region>:<from>:<to>"."""
+    filters = (req.region, req.date_from, req.date_to)
+    if not any(filters):
+        return str(admin_id)
+    return ":".join([str(admin_id), *(f or "" for f in filters)])
+
+
+def get_cursor(admin_id: int, req: ExportRequest) -> int:
+    return int(_load_cursors().get(cursor_key(admin_id, req), 0))
+
+
+def save_cursor(admin_id: int, req: ExportRequest, seq: int):
+    cursors = _load_cursors()
+    cursors[cursor_key(admin_id, req)] = seq
+    tmp_path = EXPORT_CURSORS_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cursors, f)
+    os.replace(tmp_path, EXPORT_CURSORS_PATH)
+
+
+def _matches(req: ExportRequest, r: Dict[str, str]) -> bool:
+    if req.region and r["region"] != req.region:
+        return False
+    # "YYYY-MM-DD HH:MM:SS": a plain string compare on the date part works
+    day = r["registered_at"][:10]
+    if req.date_from and day < req.date_from:
+        return False
+    if req.date_to and day > req.date_to:
+        return False
+    return True
+
+
+def _write_csv(path: str, rows: Iterator[Dict[str, str]]) -> int:
+    n = 0
+    # utf-8-sig: Excel opens o‘/g‘ letters correctly
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+            n += 1
+    return n
+
+
+def _write_xlsx(path: str, rows: Iterator[Dict[str, str]]) -> int:
+    from openpyxl import Workbook  # only admins exporting pay for the import
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("registrations")
+    ws.append(FIELDNAMES)
+    n = 0
+    for r in rows:
+        ws.append([r[k] for k in FIELDNAMES])
+        n += 1
+    wb.save(path)
+    return n
+
+
+def build_export(req: ExportRequest, after: int = 0) -> ExportResult:
+    """Blocking: run it in a thread (see run_export)."""
+    if req.fmt not in FORMATS:
+        raise ValueError(f"unknown format: {req.fmt}")
+
+    last_seq = after
+
+    def rows() -> Iterator[Dict[str, str]]:
+        nonlocal last_seq
+        for seq, r in storage.iter_rows(after):
+            last_seq = seq
+            if _matches(req, r):
+                yield r
+
+    fd, path = tempfile.mkstemp(prefix="growz-export-", suffix="." + req.fmt)
+    os.close(fd)
+    try:
+        writer = _write_xlsx if req.fmt == "xlsx" else _write_csv
+        n = writer(path, rows())
+    except Exception:
+        os.remove(path)
+        raise
+    return ExportResult(path=path, filename="registrations." + req.fmt, rows=n, last_seq=last_seq)
+
+
+async def run_export(admin_id: int, req: ExportRequest) -> ExportResult:
+    """Build the file off the event loop. Call save_cursor() once it's delivered."""
+    after = get_cursor(admin_id, req) if req.only_new else 0
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, build_export, req, after)
+
+
+def parse_args(args, regions) -> Tuple[Optional[ExportRequest], Optional[str]]:
+    """
+    /export [csv|xlsx] [new] [from=YYYY-MM-DD] [to=YYYY-MM-DD] [viloyat]
+    Returns (request, None) or (None, error).
+    """
+    req = ExportRequest()
+    rest = []
+    for a in args or []:
+        low = a.lower()
+        if low in FORMATS:
+            req.fmt = low
+        elif low in ("new", "yangi"):
+            req.only_new = True
+        elif low.startswith("from="):
+            req.date_from = a[5:]
+        elif low.startswith("to="):
+            req.date_to = a[3:]
+        else:
+            rest.append(a)
+
+    for d in (req.date_from, req.date_to):
+        if d is not None and not _is_date(d):
+            return None, f"Sana noto‘g‘ri: {d} (YYYY-MM-DD)"
+
+    if rest:
+        name = " ".join(rest).casefold()
+        match = [r for r in regions if r.casefold() == name]
+        if not match:
+            return None, f"Viloyat topilmadi: {' '.join(rest)}"
+        req.region = match[0]
+    return req, None
+
+
+def _is_date(s: str) -> bool:
+    try:
+        datetime.strptime(s, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,182 @@
+"""
+Admin bulk import: an uploaded CSV/XLSX -> checks -> one
+storage.add_registrations() batch.
+
+Field teams collect sign-ups offline in spreadsheets. The file is checked
+column-wise with pandas (phones, names, regions, duplicates in the file
+and against the registry), never row by row against storage, and the
+accepted rows go to disk as a single group commit. pandas (openpyxl for
+.xlsx) is imported on the first import, not at bot start.
+
+Columns (header row, any order, case-insensitive): full_name, phone,
+region, optionally telegram_id. A registrations file from /export loads
+as is. registered_at is set to the import time: rows stay in time order.
+"""
+import asyncio
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import async_storage
+import storage
+from keyboards import REGIONS
+
+FORMATS = ("csv", "xlsx")
+REQUIRED = ("full_name", "phone", "region")
+# Bot API getFile: larger documents can't be downloaded by bots
+MAX_FILE_BYTES = 20 * 1024 * 1024
+
+REASONS = {
+    "bad_name": "ism-familiya kamida 2 so‘z bo‘lishi kerak",
+    "no_phone": "telefon raqam yo‘q",
+    "bad_region": "viloyat ro‘yxatda yo‘q",
+    "bad_telegram_id": "telegram_id faqat raqam bo‘lishi kerak",
+    "duplicate_in_file": "faylda takrorlangan (telefon yoki telegram_id)",
+    "already_registered_by_tg": "telegram_id bilan avval ro‘yxatdan o‘tilgan",
+    "phone_already_used": "telefon bilan avval ro‘yxatdan o‘tilgan",
+}
+
+# (kind, normalized keys) -> the keys already registered
+RegisteredFn = Callable[[str, Iterable[str]], Set[str]]
+
+# Farg‘ona / Farg'ona / FARG`ONA -> one key
+_APOSTROPHES = r"[ʻʼ’'`‘]"
+
+
+@dataclass
+class ImportResult:
+    total: int = 0  # non-blank data rows in the file
+    accepted: int = 0
+    rejected: List[Tuple[int, str]] = field(default_factory=list)  # (file line, REASONS key)
+
+    def reasons(self) -> List[Tuple[str, int]]:
+        return Counter(code for _, code in self.rejected).most_common()
+
+
+def format_of(filename: Optional[str]) -> Optional[str]:
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return ext if ext in FORMATS else None
+
+
+def read_table(path: str, fmt: str):
+    """The file as a DataFrame of stripped str columns (REQUIRED + telegram_id)."""
+    import pandas as pd  # only admins importing pay for the import
+
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format: {fmt}")
+    if fmt == "xlsx":
+        df = pd.read_excel(path, dtype=str, keep_default_na=False, engine="openpyxl")
+    else:
+        # utf-8-sig: files saved by Excel (and /export) start with a BOM
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    missing = [c for c in REQUIRED if c not in df.columns]
+    if missing:
+        raise ValueError(f"ustun(lar) topilmadi: {', '.join(missing)}")
+    if "telegram_id" not in df.columns:
+        df["telegram_id"] = ""
+    df = df[["telegram_id", *REQUIRED]].apply(lambda s: s.str.strip())
+    df.index = df.index + 2  # line in the file: 1 is the header
+    return df[(df != "").any(axis=1)]
+
+
+def normalize_phones(phones):
+    """storage.normalize_phone (digits only) for a whole column, vectorized."""
+    # a number cell read as text can come back as "998901234567.0"
+    return phones.str.replace(r"\.0+$", "", regex=True).str.replace(r"\D+", "", regex=True)
+
+
+def valid_names(names):
+    """bot._is_valid_full_name for a whole (stripped) column."""
+    return (names.str.len() >= 5) & (names.str.count(r"\S+") >= 2)
+
+
+def canonical_regions(regions):
+    """REGIONS spelling for each value, NaN where it isn't one of them."""
+    import pandas as pd
+
+    key = lambda s: s.str.replace(_APOSTROPHES, "‘", regex=True).str.split().str.join(" ").str.casefold()
+    known = pd.Series(REGIONS)
+    return key(regions).map(dict(zip(key(known), known)))
+
+
+def _repeated(s):
+    # the 2nd, 3rd... occurrence; NaN = not taking part
+    return s.duplicated() & s.notna()
+
+
+def check(df, registered: RegisteredFn) -> Tuple[List[Dict[str, str]], List[int], List[Tuple[int, str]]]:
+    """
+    Blocking: (rows to store, their file lines, rejected (line, reason)).
+    Checks run in order, a row gets the first one it fails. registered:
+    storage.registered's signature (see run_import for the bot's one).
+    """
+    import pandas as pd
+
+    phone = normalize_phones(df["phone"])
+    region = canonical_regions(df["region"])
+    tg = df["telegram_id"].str.replace(r"\.0+$", "", regex=True)
+    has_tg = tg != ""
+    reason = pd.Series("", index=df.index)
+
+    def reject(mask, code: str):
+        reason[(reason == "") & mask] = code
+
+    reject(~valid_names(df["full_name"]), "bad_name")
+    reject(phone == "", "no_phone")
+    reject(region.isna(), "bad_region")
+    reject(has_tg & ~tg.str.fullmatch(r"[0-9]+"), "bad_telegram_id")
+    # keep the first valid row of each phone / telegram_id
+    ok = reason == ""
+    reject(_repeated(phone.where(ok)) | _repeated(tg.where(ok & has_tg)), "duplicate_in_file")
+    # against the registry: the file's keys probe the store's hash
+    # indexes (telegram_id, phone), the registry itself isn't scanned
+    ok = reason == ""
+    taken_tg = registered("telegram_id", tg[ok & has_tg].unique())
+    reject(has_tg & tg.isin(taken_tg), "already_registered_by_tg")
+    ok = reason == ""
+    taken_phone = registered("phone", phone[ok].unique())
+    reject(phone.isin(taken_phone), "phone_already_used")
+
+    ok = reason == ""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [
+        storage.make_row(t, n, p, r, registered_at=now)
+        for t, n, p, r in zip(tg[ok], df["full_name"][ok], phone[ok], region[ok])
+    ]
+    bad = reason[~ok]
+    return rows, df.index[ok].tolist(), list(zip(bad.index.tolist(), bad.tolist()))
+
+
+def prepare(path: str, fmt: str, registered: RegisteredFn):
+    """Blocking: run it in a thread (see run_import)."""
+    df = read_table(path, fmt)
+    return len(df), check(df, registered)
+
+
+async def run_import(path: str, fmt: str) -> ImportResult:
+    """Parse and check off the event loop, then commit the batch on the storage writer."""
+    loop = asyncio.get_running_loop()
+
+    def registered(kind: str, keys) -> Set[str]:
+        # called from the parsing thread: the lookup itself runs on the loop
+        # through async_storage (its readers, and rows still in the write queue)
+        return asyncio.run_coroutine_threadsafe(async_storage.registered(kind, keys), loop).result()
+
+    total, (rows, lines, rejected) = await loop.run_in_executor(None, prepare, path, fmt, registered)
+    result = ImportResult(total=total, rejected=rejected)
+    if rows:
+        # add_registrations checks again under the write lock and against the
+        # write queue: sign-ups that came in while the file was being checked
+        # are not overwritten, and none is acked while this batch commits
+        errors = await async_storage.add_registrations(rows)
+        for line, err in zip(lines, errors):
+            if err is None:
+                result.accepted += 1
+            else:
+                result.rejected.append((line, err))
+        result.rejected.sort()
+    return result
@@ -1,4 +1,10 @@
-from telegram import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from telegram import (
+    ReplyKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardRemove,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+)
 
 CTA_JOIN_TEXT = "👉 Ishtirok etmoqchiman"
 BTN_MY_INFO = "📄 Ma’lumotlarim"
@@ -11,41 +17,30 @@ BTN_ADMIN_EXPORT = "📤 CSV Export (Admin)"
 
 
 
-def kb_welcome():
-    return ReplyKeyboardMarkup(
-        [[KeyboardButton(CTA_JOIN_TEXT)]],
-        resize_keyboard=True
-    )
+def _serialized(cls):
+    """
+    cls, lekin to_dict() konstruktorda bir marta hisoblanadi: PTB har javobda
+    klaviatura obyektlarini aylanib chiqib dict yasamaydi (faqat json.dumps).
+    Qaytgan dict'ni o‘zgartirmang - u har javobda bitta.
+    """
+    class Serialized(cls):
+        __slots__ = ("_as_dict",)
 
-def kb_after_registered():
-    return ReplyKeyboardMarkup(
-        [
-            [KeyboardButton(BTN_MY_INFO)],
-            [KeyboardButton(BTN_HELP)]
-        ],
-        resize_keyboard=True
-    )
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            with self._unfrozen():
+                self._as_dict = super().to_dict()
 
+        def to_dict(self, recursive: bool = True):
+            return self._as_dict
 
-def kb_after_registered_admin():
-    return ReplyKeyboardMarkup(
-        [
-            [KeyboardButton(BTN_MY_INFO)],
-            [KeyboardButton(BTN_HELP)],
-            [KeyboardButton(BTN_ADMIN_LIST)],
-            [KeyboardButton(BTN_ADMIN_EXPORT)],
-        ],
-        resize_keyboard=True
-    )
+    Serialized.__name__ = Serialized.__qualname__ = f"Serialized{cls.__name__}"
+    return Serialized
 
 
+_ReplyKeyboard = _serialized(ReplyKeyboardMarkup)
+_KeyboardRemove = _serialized(ReplyKeyboardRemove)
 
-def kb_contact_share():
-    return ReplyKeyboardMarkup(
-        [[KeyboardButton("📞 Telefon raqamimni yuborish", request_contact=True)]],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
 
 REGIONS = [
     "Toshkent viloyati",
@@ -64,7 +59,8 @@ REGIONS = [
     "Qoraqalpog‘iston Respublikasi",
 ]
 
-def kb_regions():
+
+def _build_regions():
     rows = []
     row = []
     for r in REGIONS:
@@ -75,7 +71,75 @@ def kb_regions():
     if row:
         rows.append(row)
 
-    return ReplyKeyboardMarkup(rows, resize_keyboard=True, one_time_keyboard=True)
+    return _ReplyKeyboard(rows, resize_keyboard=True, one_time_keyboard=True)
+
+
+# Statik klaviaturalar import paytida bir marta quriladi va dict qilinadi,
+# kb_*() har safar o‘sha obyektni qaytaradi (PTB obyektlari o‘zgarmas -
+# bo‘lishish xavfsiz)
+_KB_WELCOME = _ReplyKeyboard(
+    [[KeyboardButton(CTA_JOIN_TEXT)]],
+    resize_keyboard=True
+)
+
+_KB_AFTER_REGISTERED = _ReplyKeyboard(
+    [
+        [KeyboardButton(BTN_MY_INFO)],
+        [KeyboardButton(BTN_HELP)]
+    ],
+    resize_keyboard=True
+)
+
+_KB_AFTER_REGISTERED_ADMIN = _ReplyKeyboard(
+    [
+        [KeyboardButton(BTN_MY_INFO)],
+        [KeyboardButton(BTN_HELP)],
+        [KeyboardButton(BTN_ADMIN_LIST)],
+        [KeyboardButton(BTN_ADMIN_EXPORT)],
+    ],
+    resize_keyboard=True
+)
+
+_KB_CONTACT_SHARE = _ReplyKeyboard(
+    [[KeyboardButton("📞 Telefon raqamimni yuborish", request_contact=True)]],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+
+_KB_REGIONS = _build_regions()
+
+_KB_REMOVE = _KeyboardRemove()
+
+
+def kb_welcome():
+    return _KB_WELCOME
+
+
+def kb_after_registered():
+    return _KB_AFTER_REGISTERED
+
+
+def kb_after_registered_admin():
+    return _KB_AFTER_REGISTERED_ADMIN
+
+
+def kb_contact_share():
+    return _KB_CONTACT_SHARE
+
+
+def kb_regions():
+    return _KB_REGIONS
+
 
 def kb_remove():
-    return ReplyKeyboardRemove()
+    return _KB_REMOVE
+
+
+def kb_admin_pager(newer_seq=None, older_seq=None):
+    # None bo‘lsa tugma chiqmaydi
+    row = []
+    if newer_seq is not None:
+        row.append(InlineKeyboardButton("⬅️ Yangiroq", callback_data=f"alist:n:{newer_seq}"))
+    if older_seq is not None:
+        row.append(InlineKeyboardButton("Eskiroq ➡️", callback_data=f"alist:o:{older_seq}"))
+    return InlineKeyboardMarkup([row]) if row else None
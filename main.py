@@ -1,7 +1,155 @@
-from bot import build_application
+import argparse
+import asyncio
+import importlib
+import os
+import time
+
+# config/bot are imported inside the functions: the supervisor
+# (WORKERS > 1) never loads bot.py, and --profile-startup times each import
+
+
+def run_webhook(app):
+    from config import (
+        WEBHOOK_URL,
+        WEBHOOK_PATH,
+        WEBHOOK_LISTEN,
+        WEBHOOK_PORT,
+        WEBHOOK_SECRET,
+        WEBHOOK_MAX_CONNECTIONS,
+    )
+
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL topilmadi. .env faylni tekshiring.")
+    print(f"Bot ishga tushdi (webhook {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH})...")
+    # SIGTERM/SIGINT: server yopiladi, navbatdagi update'lar oxirigacha ishlanadi
+    app.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=f"{WEBHOOK_URL}/{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET or None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        close_loop=False,
+    )
+
+
+def run_workers():
+    from config import (
+        BOT_TOKEN,
+        RUN_MODE,
+        WORKERS,
+        WEBHOOK_URL,
+        WEBHOOK_PATH,
+        WEBHOOK_LISTEN,
+        WEBHOOK_PORT,
+        WEBHOOK_SECRET,
+        WEBHOOK_MAX_CONNECTIONS,
+    )
+    from workers import supervise
+
+    if not BOT_TOKEN:
+        raise RuntimeError("BOT_TOKEN topilmadi. .env faylni tekshiring.")
+    webhook = None
+    if RUN_MODE == "webhook":
+        if not WEBHOOK_URL:
+            raise RuntimeError("WEBHOOK_URL topilmadi. .env faylni tekshiring.")
+        webhook = dict(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+    print(f"Bot ishga tushdi ({WORKERS} worker, {RUN_MODE})...")
+    asyncio.run(supervise(BOT_TOKEN, WORKERS, webhook=webhook))
+
+
+def _process_age() -> float:
+    """Seconds since the OS started this process (Linux), 0 if unknown."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return 0.0
+    return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+def profile_startup(request=None):
+    """
+    python main.py --profile-startup: go through startup like run_polling
+    does, up to "ready for updates", time every phase (plus the storage
+    warm-up that continues in the background), print them and exit.
+    Per-module import times: python -X importtime main.py --profile-startup
+    request: see bot.build_application (benchmarks run it offline).
+    No side effects: post_init runs without the metrics HTTP server and
+    without resuming a checkpointed broadcast (bot_data["profile_startup"]).
+    """
+    phases = [("python ishga tushishi", _process_age())]
+    t = time.perf_counter()
+
+    def lap(name: str):
+        nonlocal t
+        now = time.perf_counter()
+        phases.append((name, now - t))
+        t = now
+
+    importlib.import_module("config")  # .env is read here
+    lap("import config (.env)")
+    importlib.import_module("telegram.ext")
+    lap("import telegram.ext")
+    import bot
+    lap("import bot")
+    app = bot.build_application(request=request)
+    app.bot_data["profile_startup"] = True
+    lap("build_application")
+
+    async def run():
+        import async_storage
+
+        await app.initialize()
+        lap("initialize (getMe, persistence)")
+        await app.post_init(app)
+        lap("post_init")
+        phases.append(("= update qabul qilishga tayyor", sum(s for _, s in phases)))
+        try:
+            await async_storage.wait_warm()
+        finally:
+            lap("storage warm-up (fonda)")
+            await app.post_stop(app)
+            await app.shutdown()
+            await app.post_shutdown(app)
+
+    asyncio.run(run())
+
+    print("Ishga tushish profili:")
+    for name, seconds in phases:
+        print(f"  {name:<34} {seconds * 1000:>9.1f} ms")
+    return phases
+
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profile-startup", action="store_true",
+                    help="ishga tushish bosqichlari vaqtini ko‘rsatib, chiqib ketadi")
+    args = ap.parse_args()
+    if args.profile_startup:
+        profile_startup()
+        return
+
+    from config import RUN_MODE, WORKERS
+
+    if WORKERS > 1:
+        run_workers()
+        return
+    from bot import build_application
+
     app = build_application()
+    if RUN_MODE == "webhook":
+        run_webhook(app)
+        return
     print("Bot ishga tushdi...")
     app.run_polling(close_loop=False)
 
@@ -0,0 +1,66 @@
+"""
+Telegram file_id cache for static assets (welcome.png).
+
+Telegram keeps every uploaded file and hands back a file_id that can be
+re-sent for free. The id is stored per sha256 of the file content in a
+small JSON file, so it survives restarts and goes stale by itself when
+the asset is replaced.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+
+class FileIdCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._ids: Optional[Dict[str, str]] = None
+        # asset path -> ((mtime_ns, size), sha256), so we hash only on change
+        self._digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+    def _load(self) -> Dict[str, str]:
+        if self._ids is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._ids = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._ids = {}
+        return self._ids
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._ids, f)
+        os.replace(tmp_path, self.path)
+
+    def digest(self, asset_path: str) -> str:
+        st = os.stat(asset_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._digests.get(asset_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        h = hashlib.sha256()
+        with open(asset_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._digests[asset_path] = (stamp, digest)
+        return digest
+
+    def get(self, asset_path: str) -> Optional[str]:
+        return self._load().get(self.digest(asset_path))
+
+    def put(self, asset_path: str, file_id: str):
+        ids = self._load()
+        digest = self.digest(asset_path)
+        if ids.get(digest) != file_id:
+            ids[digest] = file_id
+            self._save()
+
+    def drop(self, asset_path: str):
+        ids = self._load()
+        if ids.pop(self.digest(asset_path), None) is not None:
+            self._save()
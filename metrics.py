@@ -0,0 +1,227 @@
+"""
+In-process metrics: latency histograms and counters, exported in the
+Prometheus text format on a local HTTP port and summarized by /metrics.
+
+Off by default (METRICS_ENABLED). When off, instrument() returns the
+handler unchanged and the storage hooks are a single bool check, so the
+cost is effectively zero.
+
+Recorded:
+  bot_handler_seconds{handler}        handler latency (+ _errors_total)
+  bot_storage_seconds{op}             storage call, incl. thread pool wait
+  bot_storage_rows_scanned_total{op}  rows the CSV store walked
+  bot_event_loop_lag_seconds          how late a periodic wake-up fires
+  bot_telegram_api_seconds{method}    outbound Bot API round trip
+"""
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+from telegram.request import BaseRequest
+
+from config import METRICS_ENABLED
+
+ENABLED = METRICS_ENABLED
+
+# seconds; Prometheus-style cumulative buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LOOP_LAG_INTERVAL_S = 0.5
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets (linear inside a bucket), like histogram_quantile()."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c:
+                lo = BUCKETS[i - 1] if i > 0 else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return BUCKETS[-1]
+
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, str, str], Histogram] = {}
+_counters: Dict[Tuple[str, str, str], float] = {}
+# name -> fn returning {label value: number}, read at scrape time
+_gauges: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+
+
+def observe(name: str, label: str, value: str, seconds: float):
+    key = (name, label, value)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = Histogram()
+        h.observe(seconds)
+
+
+def inc(name: str, label: str, value: str, n: float = 1):
+    key = (name, label, value)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def rows_scanned(op: str, n: int):
+    # callers check ENABLED first, this sits on storage hot paths
+    inc("bot_storage_rows_scanned_total", "op", op, n)
+
+
+def register_gauge(name: str, label: str, fn: Callable[[], Dict[str, float]]):
+    _gauges[name] = (label, fn)
+
+
+def instrument(handler):
+    """Wrap an async PTB callback with a latency histogram; identity when disabled."""
+    if not ENABLED:
+        return handler
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        t0 = time.perf_counter()
+        try:
+            return await handler(update, context)
+        except Exception:
+            inc("bot_handler_errors_total", "handler", name)
+            raise
+        finally:
+            observe("bot_handler_seconds", "handler", name, time.perf_counter() - t0)
+
+    return wrapper
+
+
+class InstrumentedRequest(BaseRequest):
+    """Times every Bot API call of the wrapped request, labelled by method."""
+
+    def __init__(self, inner: BaseRequest):
+        self.inner = inner
+
+    async def initialize(self):
+        await self.inner.initialize()
+
+    async def shutdown(self):
+        await self.inner.shutdown()
+
+    @property
+    def read_timeout(self):
+        return self.inner.read_timeout
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        t0 = time.perf_counter()
+        try:
+            return await self.inner.do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout,
+                write_timeout=write_timeout, connect_timeout=connect_timeout,
+                pool_timeout=pool_timeout,
+            )
+        finally:
+            observe("bot_telegram_api_seconds", "method", url.rsplit("/", 1)[-1],
+                    time.perf_counter() - t0)
+
+
+async def watch_loop_lag(interval: float = LOOP_LAG_INTERVAL_S):
+    """Sleep `interval` forever; anything beyond it is time the loop was blocked."""
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        observe("bot_event_loop_lag_seconds", "", "", max(loop.time() - t0 - interval, 0.0))
+
+
+def _fmt_labels(label: str, value: str, extra: str = "") -> str:
+    parts = [f'{label}="{value}"'] if label else []
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render() -> str:
+    """Prometheus text exposition format."""
+    with _lock:
+        hists = [(k, list(h.counts), h.sum, h.count) for k, h in sorted(_histograms.items())]
+        counters = sorted(_counters.items())
+
+    out: List[str] = []
+    typed = set()
+    for (name, label, value), counts, total, count in hists:
+        if name not in typed:
+            out.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, c in zip(BUCKETS + (float("inf"),), counts):
+            cumulative += c
+            le = 'le="%s"' % ("+Inf" if bound == float("inf") else repr(bound))
+            out.append(f"{name}_bucket{_fmt_labels(label, value, le)} {cumulative}")
+        out.append(f"{name}_sum{_fmt_labels(label, value)} {total}")
+        out.append(f"{name}_count{_fmt_labels(label, value)} {count}")
+    for (name, label, value), n in counters:
+        if name not in typed:
+            out.append(f"# TYPE {name} counter")
+            typed.add(name)
+        out.append(f"{name}{_fmt_labels(label, value)} {n}")
+    for name, (label, fn) in sorted(_gauges.items()):
+        out.append(f"# TYPE {name} gauge")
+        for value, n in sorted((fn() or {}).items()):
+            out.append(f"{name}{_fmt_labels(label, value)} {n}")
+    return "\n".join(out) + "\n"
+
+
+def summary() -> List[Tuple[str, str, int, float, float]]:
+    """[(metric, label value, count, p50 s, p95 s)] for the /metrics command."""
+    with _lock:
+        return [
+            (name, value, h.count, h.quantile(0.5), h.quantile(0.95))
+            for (name, _, value), h in sorted(_histograms.items())
+        ]
+
+
+def counters() -> Dict[Tuple[str, str], float]:
+    with _lock:
+        return {(name, value): n for (name, _, value), n in _counters.items()}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the console
+
+
+def start_http_server(listen: str, port: int) -> ThreadingHTTPServer:
+    """Own thread, so a scrape still answers while the event loop is stuck."""
+    server = ThreadingHTTPServer((listen, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
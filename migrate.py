@@ -0,0 +1,265 @@
+"""
+Streaming migration of the old registrations.csv format
+
+    fullname,phone,region,created_at   ->   telegram_id,full_name,phone,region,registered_at
+
+    python migrate.py [data/registrations.csv] [--chunk-rows 50000]
+
+The source is read in chunks of whole CSV records, converted and
+appended to <path>.migrating. After every chunk the output is fsynced
+and the position (source byte offset, output size) is saved to
+<path>.migrate.json, so a killed run resumes from the last chunk instead
+of starting over. Phones are deduplicated in one pass with a hash set:
+the first row keeps the phone, later rows with the same phone go to
+<path>.duplicates.csv, so nothing is lost. At the end the original is
+kept as a backup and the new file replaces it with os.replace. The
+backup is <path>.bak, or <path>.<YYYYmmdd-HHMMSS>.bak if a .bak from an
+earlier migration is already there; the name is chosen when the run
+starts and kept in the checkpoint, so a resumed run uses the same one.
+
+storage.migrate_old_csv_if_needed() calls migrate_csv(), so the bot
+does the same at startup (init_storage) if the file is still old.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import asdict, dataclass
+from itertools import islice
+from typing import Callable, Optional, Set
+
+from config import REG_CSV_PATH
+from storage import FIELDNAMES, OLD_FIELDNAMES, _read_header, normalize_phone
+
+CHUNK_ROWS = 50_000
+
+
+@dataclass
+class Checkpoint:
+    src_size: int
+    src_mtime_ns: int
+    src_offset: int = 0   # bytes of the source already converted
+    out_size: int = 0     # bytes of <path>.migrating that belong to those rows
+    dup_size: int = 0     # same for <path>.duplicates.csv
+    rows_in: int = 0
+    rows_out: int = 0
+    duplicates: int = 0
+    blank: int = 0
+    backup: str = ""      # where this run keeps the original
+
+
+@dataclass
+class MigrationResult:
+    rows_in: int
+    rows_out: int
+    duplicates: int
+    blank: int
+    seconds: float
+    rows_per_s: float
+    resumed: bool
+    backup: str
+
+
+ProgressFn = Callable[[Checkpoint, float], None]
+
+
+def _paths(path: str):
+    return path + ".migrating", path + ".migrate.json", path + ".duplicates.csv", path + ".bak"
+
+
+def _new_backup_path(bak_path: str) -> str:
+    # never reuse a .bak left by an earlier migration: it holds other rows
+    if not os.path.exists(bak_path):
+        return bak_path
+    base = bak_path[:-len(".bak")] + time.strftime(".%Y%m%d-%H%M%S")
+    candidate, n = base + ".bak", 1
+    while os.path.exists(candidate):
+        candidate, n = f"{base}-{n}.bak", n + 1
+    return candidate
+
+
+def _load_checkpoint(cp_path: str, src: str) -> Optional[Checkpoint]:
+    try:
+        with open(cp_path, "r", encoding="utf-8") as f:
+            cp = Checkpoint(**json.load(f))
+    except (FileNotFoundError, ValueError, TypeError):
+        return None
+    st = os.stat(src)
+    if (cp.src_size, cp.src_mtime_ns) != (st.st_size, st.st_mtime_ns):
+        return None  # source changed since, start over
+    return cp
+
+
+def _save_checkpoint(cp_path: str, cp: Checkpoint):
+    tmp_path = cp_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(cp), f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, cp_path)
+
+
+def _open_at(path: str, size: int):
+    """Open for appending, dropping whatever was written after the checkpoint."""
+    f = open(path, "a+b")
+    f.truncate(size)
+    f.seek(size)
+    return f
+
+
+def _read_chunk(src, max_rows: int) -> bytes:
+    """Up to max_rows lines, extended until the quotes balance (no record cut in half)."""
+    lines = list(islice(src, max_rows))
+    if not lines:
+        return b""
+    data = b"".join(lines)
+    quotes = data.count(b'"')
+    while quotes % 2:
+        line = src.readline()
+        if not line:
+            break
+        data += line
+        quotes += line.count(b'"')
+    return data
+
+
+def _seen_phones(out_path: str, size: int) -> Set[str]:
+    """Rebuild the dedupe set from output written before a resume."""
+    seen: Set[str] = set()
+    if not size:
+        return seen
+    with open(out_path, "rb") as f:
+        data = f.read(size).decode("utf-8")
+    for row in islice(csv.reader(io.StringIO(data)), 1, None):
+        if len(row) > 2 and row[2]:
+            seen.add(row[2])
+    return seen
+
+
+def migrate_csv(path: str = REG_CSV_PATH, chunk_rows: int = CHUNK_ROWS,
+                progress: Optional[ProgressFn] = None) -> Optional[MigrationResult]:
+    """
+    Convert an old-format file in place. None if there is nothing to do
+    (missing file, already new format, or a header we don't know).
+    """
+    if not os.path.exists(path) or _read_header(path) != OLD_FIELDNAMES:
+        return None
+
+    out_path, cp_path, dup_path, bak_path = _paths(path)
+    cp = _load_checkpoint(cp_path, path)
+    resumed = cp is not None
+    if cp is None:
+        st = os.stat(path)
+        cp = Checkpoint(src_size=st.st_size, src_mtime_ns=st.st_mtime_ns)
+    if not cp.backup:
+        cp.backup = _new_backup_path(bak_path)
+        _save_checkpoint(cp_path, cp)
+
+    seen = _seen_phones(out_path, cp.out_size)
+    t0 = time.perf_counter()
+    rows_at_start = cp.rows_in
+
+    with open(path, "rb") as src, _open_at(out_path, cp.out_size) as out, \
+            _open_at(dup_path, cp.dup_size) as dup:
+        if cp.src_offset == 0:
+            src.readline()  # old header
+            buf = io.StringIO()
+            csv.writer(buf).writerow(FIELDNAMES)
+            out.write(buf.getvalue().encode("utf-8"))
+            if dup.tell() == 0:
+                dup.write(buf.getvalue().encode("utf-8"))
+        else:
+            src.seek(cp.src_offset)
+
+        while True:
+            data = _read_chunk(src, chunk_rows)
+            if not data:
+                break
+            rows_buf, dup_buf = io.StringIO(), io.StringIO()
+            w, wd = csv.writer(rows_buf), csv.writer(dup_buf)
+            for rec in csv.reader(io.StringIO(data.decode("utf-8"))):
+                cp.rows_in += 1
+                rec += [""] * (4 - len(rec))
+                full_name, phone, region, created_at = (v.strip() for v in rec[:4])
+                phone = normalize_phone(phone)
+                if not (full_name or phone or region or created_at):
+                    cp.blank += 1
+                    continue
+                row = ("", full_name, phone, region, created_at)
+                if phone and phone in seen:
+                    cp.duplicates += 1
+                    wd.writerow(row)
+                    continue
+                if phone:
+                    seen.add(phone)
+                w.writerow(row)
+                cp.rows_out += 1
+
+            out.write(rows_buf.getvalue().encode("utf-8"))
+            dup.write(dup_buf.getvalue().encode("utf-8"))
+            for f in (out, dup):
+                f.flush()
+                os.fsync(f.fileno())
+            cp.src_offset = src.tell()
+            cp.out_size, cp.dup_size = out.tell(), dup.tell()
+            _save_checkpoint(cp_path, cp)
+
+            if progress is not None:
+                elapsed = time.perf_counter() - t0
+                progress(cp, (cp.rows_in - rows_at_start) / elapsed if elapsed else 0.0)
+
+    # keep the original, then swap the new file in atomically. The backup
+    # only exists already if this run was killed right after making it
+    if not os.path.exists(cp.backup):
+        try:
+            os.link(path, cp.backup)
+        except OSError:
+            shutil.copy2(path, cp.backup)
+    os.replace(out_path, path)
+    os.remove(cp_path)
+    if not cp.duplicates:
+        os.remove(dup_path)
+
+    seconds = time.perf_counter() - t0
+    return MigrationResult(
+        rows_in=cp.rows_in,
+        rows_out=cp.rows_out,
+        duplicates=cp.duplicates,
+        blank=cp.blank,
+        seconds=seconds,
+        rows_per_s=(cp.rows_in - rows_at_start) / seconds if seconds else 0.0,
+        resumed=resumed,
+        backup=cp.backup,
+    )
+
+
+def print_progress(cp: Checkpoint, rows_per_s: float):
+    pct = 100.0 * cp.src_offset / cp.src_size if cp.src_size else 100.0
+    print(f"Migratsiya: {cp.rows_in} qator ({pct:.0f}%), {rows_per_s:,.0f} qator/s", flush=True)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Convert the old registrations.csv format")
+    ap.add_argument("path", nargs="?", default=REG_CSV_PATH)
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = ap.parse_args(argv)
+
+    res = migrate_csv(args.path, chunk_rows=args.chunk_rows, progress=print_progress)
+    if res is None:
+        print(f"{args.path}: migratsiya kerak emas (eski format emas).")
+        return 0
+    print(
+        f"Tayyor: {res.rows_out} qator yozildi, {res.duplicates} takroriy telefon "
+        f"({args.path}.duplicates.csv), {res.blank} bo‘sh qator, asli: {res.backup}; "
+        f"{res.seconds:.1f} s, {res.rows_per_s:,.0f} qator/s"
+        + (" (davom ettirildi)" if res.resumed else "")
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+SQLite persistence for the registration conversation.
+
+Only ConversationHandler states and user_data (full_name, phone while a
+registration is half-done) are stored - no bot/chat data. PTB hands us
+changes every update_interval seconds; they are buffered and written in
+one transaction on a background thread, not per update. Empty user_data
+is deleted instead of stored, and anything idle longer than ttl_seconds
+is neither loaded on start nor kept in the file.
+
+PTB re-creates application.user_data[user_id] (a defaultdict) for every
+user it flushes, even one whose data the bot just dropped. Set
+on_empty_user_data (bot.build_application does) to take those empty
+entries out of memory again, otherwise every user who ever wrote stays.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id    INTEGER PRIMARY KEY,
+    data       TEXT NOT NULL,
+    updated_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    name       TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    state      TEXT NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (name, key)
+);
+CREATE INDEX IF NOT EXISTS idx_user_data_updated_at ON user_data(updated_at);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at);
+"""
+
+# how often expired rows are purged from the file
+PURGE_INTERVAL_S = 60
+
+
+class SqlitePersistence(BasePersistence):
+    def __init__(self, db_path: str, ttl_seconds: float, update_interval: float = 5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        # None = delete the row
+        self._pending_users: Dict[int, Optional[str]] = {}
+        self._pending_convs: Dict[Tuple[str, str], Optional[str]] = {}
+        self._commit_task: Optional[asyncio.Task] = None
+        self._purged_at = 0.0
+        # one thread owns the connection
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persistence")
+        self._conn: Optional[sqlite3.Connection] = None
+        # called with the user_id when PTB flushes an empty user_data
+        self.on_empty_user_data: Optional[Callable[[int], None]] = None
+
+    # --- sqlite side (executor thread) ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _fresh_after(self) -> int:
+        return int(time.time() - self.ttl_seconds)
+
+    def _load_user_data(self) -> Dict[int, dict]:
+        rows = self._db().execute(
+            "SELECT user_id, data FROM user_data WHERE updated_at >= ?", (self._fresh_after(),)
+        ).fetchall()
+        return {uid: json.loads(data) for uid, data in rows}
+
+    def _load_conversations(self, name: str) -> Dict[tuple, object]:
+        rows = self._db().execute(
+            "SELECT key, state FROM conversations WHERE name = ? AND updated_at >= ?",
+            (name, self._fresh_after()),
+        ).fetchall()
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    def _write(self, users: Dict[int, Optional[str]], convs: Dict[Tuple[str, str], Optional[str]]):
+        now = int(time.time())
+        db = self._db()
+        with db:  # one transaction per batch
+            db.executemany(
+                "INSERT INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                [(uid, data, now) for uid, data in users.items() if data is not None],
+            )
+            db.executemany(
+                "DELETE FROM user_data WHERE user_id = ?",
+                [(uid,) for uid, data in users.items() if data is None],
+            )
+            db.executemany(
+                "INSERT INTO conversations (name, key, state, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name, key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+                [(name, key, state, now) for (name, key), state in convs.items() if state is not None],
+            )
+            db.executemany(
+                "DELETE FROM conversations WHERE name = ? AND key = ?",
+                [(name, key) for (name, key), state in convs.items() if state is None],
+            )
+            if now - self._purged_at >= PURGE_INTERVAL_S:
+                self._purged_at = now
+                cutoff = self._fresh_after()
+                db.execute("DELETE FROM user_data WHERE updated_at < ?", (cutoff,))
+                db.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,))
+
+    # --- asyncio side ---
+
+    async def _in_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _schedule_commit(self):
+        # PTB gathers all update_* calls of one update_persistence() run;
+        # the task runs after them, so the whole run becomes one transaction
+        if self._commit_task is None or self._commit_task.done():
+            self._commit_task = asyncio.get_running_loop().create_task(self._commit())
+
+    async def _commit(self):
+        await asyncio.sleep(0)
+        # changes that arrive while a write is running go into the next round
+        while self._pending_users or self._pending_convs:
+            users, self._pending_users = self._pending_users, {}
+            convs, self._pending_convs = self._pending_convs, {}
+            await self._in_thread(self._write, users, convs)
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        return await self._in_thread(self._load_user_data)
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str):
+        return await self._in_thread(self._load_conversations, name)
+
+    async def update_conversation(self, name: str, key, new_state: Optional[object]) -> None:
+        self._pending_convs[(name, json.dumps(list(key)))] = (
+            json.dumps(new_state) if new_state is not None else None
+        )
+        self._schedule_commit()
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        # empty dict = nothing to remember, don't keep a row for it
+        self._pending_users[user_id] = json.dumps(data, ensure_ascii=False) if data else None
+        self._schedule_commit()
+        if not data and self.on_empty_user_data is not None:
+            self.on_empty_user_data(user_id)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._pending_users[user_id] = None
+        self._schedule_commit()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Called by Application.stop(): write what's left and close."""
+        if self._commit_task is not None:
+            await self._commit_task
+        await self._commit()
+        if self._conn is not None:
+            await self._in_thread(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=True)
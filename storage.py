@@ -1,10 +1,27 @@
 import os
+import io
 import csv
+import logging
 import re
-from datetime import datetime
-from typing import Optional, Dict, List
-
-from config import REG_CSV_PATH, DATA_DIR
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Iterable, Iterator, List, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only
+    fcntl = None
+
+import metrics
+from config import (
+    REG_CSV_PATH, REG_DB_PATH, STORAGE_BACKEND, STORAGE_MMAP_INDEX, STORAGE_RECHECK_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
 
 # New format
 FIELDNAMES = ["telegram_id", "full_name", "phone", "region", "registered_at"]
@@ -12,171 +29,821 @@ FIELDNAMES = ["telegram_id", "full_name", "phone", "region", "registered_at"]
 OLD_FIELDNAMES = ["fullname", "phone", "region", "created_at"]
 
 
-def ensure_storage():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    if not os.path.exists(REG_CSV_PATH):
-        with open(REG_CSV_PATH, "w", newline="", encoding="utf-8") as f:
+def ensure_storage(path: str = REG_CSV_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if not os.path.exists(path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
             w = csv.DictWriter(f, fieldnames=FIELDNAMES)
             w.writeheader()
 
 
-def _read_header() -> List[str]:
-    if not os.path.exists(REG_CSV_PATH):
+def _read_header(path: str = REG_CSV_PATH) -> List[str]:
+    if not os.path.exists(path):
         return []
-    with open(REG_CSV_PATH, "r", encoding="utf-8", newline="") as f:
+    with open(path, "r", encoding="utf-8", newline="") as f:
         reader = csv.reader(f)
         header = next(reader, None)
         return [h.strip() for h in header] if header else []
 
 
+_NON_DIGITS = re.compile(r"\D+")
+
+
 def normalize_phone(phone: str) -> str:
     # only digits: +998 93... -> 99893...
-    return re.sub(r"\D+", "", phone or "").strip()
+    return _NON_DIGITS.sub("", phone or "")
 
 
-def migrate_old_csv_if_needed():
+def migrate_old_csv_if_needed(path: str = REG_CSV_PATH):
     """
     If registrations.csv is old format:
       fullname,phone,region,created_at
-    convert to new format and keep .bak
+    convert to new format and keep .bak (see migrate.py: streaming,
+    resumable, duplicate phones moved to .duplicates.csv)
     """
-    if not os.path.exists(REG_CSV_PATH):
-        return
+    if _read_header(path) != OLD_FIELDNAMES:
+        return  # missing, already new or unknown format: do nothing
 
-    header = _read_header()
-    if header == FIELDNAMES:
-        return  # already new
-
-    if header != OLD_FIELDNAMES:
-        return  # unknown format, do nothing
-
-    old_path = REG_CSV_PATH + ".bak"
-    os.replace(REG_CSV_PATH, old_path)
-
-    with open(old_path, "r", encoding="utf-8", newline="") as src, \
-         open(REG_CSV_PATH, "w", encoding="utf-8", newline="") as dst:
-        r = csv.DictReader(src)
-        w = csv.DictWriter(dst, fieldnames=FIELDNAMES)
-        w.writeheader()
-
-        for row in r:
-            w.writerow({
-                "telegram_id": "",  # old file has no tg_id
-                "full_name": (row.get("fullname") or "").strip(),
-                "phone": normalize_phone(row.get("phone") or ""),
-                "region": (row.get("region") or "").strip(),
-                "registered_at": (row.get("created_at") or "").strip(),
-            })
-
-
-def _read_all() -> List[Dict[str, str]]:
-    ensure_storage()
-    migrate_old_csv_if_needed()
-    with open(REG_CSV_PATH, "r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        return list(reader)
-
-
-def _write_all(rows: List[Dict[str, str]]):
-    ensure_storage()
-    with open(REG_CSV_PATH, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=FIELDNAMES)
-        w.writeheader()
-        for r in rows:
-            w.writerow({
-                "telegram_id": str(r.get("telegram_id", "")).strip(),
-                "full_name": (r.get("full_name") or "").strip(),
-                "phone": normalize_phone(r.get("phone") or ""),
-                "region": (r.get("region") or "").strip(),
-                "registered_at": (r.get("registered_at") or "").strip(),
-            })
+    from migrate import migrate_csv
 
+    def progress(cp, rows_per_s: float):
+        pct = 100.0 * cp.src_offset / cp.src_size if cp.src_size else 100.0
+        logger.info("Migrating %s: %d rows (%.0f%%), %.0f rows/s", path, cp.rows_in, pct, rows_per_s)
 
-def find_by_telegram_id(telegram_id: int) -> Optional[Dict[str, str]]:
-    tid = str(telegram_id).strip()
-    for r in _read_all():
-        if tid == str(r.get("telegram_id", "")).strip():
-            return r
-    return None
+    res = migrate_csv(path, progress=progress)
+    if res is not None:
+        logger.info("Migrated %s: %d rows, %d duplicates moved aside, original kept as %s",
+                    path, res.rows_out, res.duplicates, res.backup)
 
 
-def find_by_phone(phone: str) -> Optional[Dict[str, str]]:
-    p = normalize_phone(phone)
-    if not p:
+def make_row(telegram_id, full_name: str, phone: str, region: str,
+             registered_at: Optional[str] = None) -> Dict[str, str]:
+    return {
+        "telegram_id": str(telegram_id if telegram_id is not None else "").strip(),
+        "full_name": (full_name or "").strip(),
+        "phone": normalize_phone(phone),
+        "region": (region or "").strip(),
+        "registered_at": registered_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_TWO_DIGITS = [f"{i:02d}" for i in range(60)]
+_SIXTY = {text: i for i, text in enumerate(_TWO_DIGITS)}
+_MM_SS = [f"{m}:{s}" for m in _TWO_DIGITS for s in _TWO_DIGITS]  # by seconds into the hour
+# "YYYY-MM-DD HH" <-> seconds since 1970 at the start of that hour, both
+# ways; a registry spans a few thousand hours, so these stay small
+_hour_start: Dict[str, int] = {}
+_hour_text: Dict[int, str] = {}
+
+
+def _pack_id(value: str):
+    """
+    telegram_id / normalized phone -> int, "" -> None. Text that would
+    not come back the same from str(int) (a leading 0, not digits) is
+    kept as is.
+    """
+    if not value:
         return None
-    for r in _read_all():
-        if p == normalize_phone(r.get("phone", "") or ""):
-            return r
-    return None
+    if value.isdigit() and value.isascii() and value[0] != "0":
+        return int(value)
+    return value
 
 
-def add_registration(telegram_id: int, full_name: str, phone: str, region: str) -> Dict[str, str]:
+def _unpack_id(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _parse_hour(hour: str) -> Optional[int]:
+    # "YYYY-MM-DD HH" -> seconds since 1970, None if it isn't one
+    h = _SIXTY.get(hour[11:])
+    if len(hour) != 13 or hour[10] != " " or h is None or h > 23:
+        return None
+    try:
+        d = date.fromisoformat(hour[:10])
+    except ValueError:
+        return None
+    if d.isoformat() != hour[:10]:
+        return None
+    start = _hour_start[hour] = (d.toordinal() - _EPOCH_ORDINAL) * 86400 + h * 3600
+    _hour_text[start // 3600] = hour
+    return start
+
+
+def _pack_time(value: str):
+    """
+    "YYYY-MM-DD HH:MM:SS" -> seconds since 1970 (wall clock, no timezone,
+    so it round-trips exactly). Anything else, e.g. dates carried over
+    from the old format, is kept as text.
     """
-    Rules:
-    - 1 telegram_id = 1 registration
-    - 1 phone = 1 registration
+    start = _hour_start.get(value[:13])
+    m = _SIXTY.get(value[14:16])
+    s = _SIXTY.get(value[17:19])
+    if m is None or s is None or len(value) != 19 or value[13] != ":" or value[16] != ":":
+        return value
+    if start is None:
+        start = _parse_hour(value[:13])
+        if start is None:
+            return value
+    return start + m * 60 + s
+
+
+def _hour_of(value: int) -> str:
+    hours = value // 3600
+    hour = _hour_text.get(hours)
+    if hour is None:
+        d = date.fromordinal(hours // 24 + _EPOCH_ORDINAL)
+        hour = _hour_text[hours] = f"{d.isoformat()} {_TWO_DIGITS[hours % 24]}"
+    return hour
+
+
+def _unpack_time(value) -> str:
+    if value.__class__ is not int:
+        return value
+    hour = _hour_text.get(value // 3600) or _hour_of(value)
+    return f"{hour}:{_MM_SS[value % 3600]}"
+
+
+def _day_of(value) -> str:
+    """YYYY-MM-DD of a packed registered_at ("" for a blank one)."""
+    if value.__class__ is int:
+        return _hour_of(value)[:10]
+    return value[:10]
+
+
+class Registration:
+    """
+    One row of registrations.csv, kept small for million-row registries:
+    no per-row dict, ids and phones as ints, registered_at as epoch
+    seconds, region interned (there are only 14). Callers outside the
+    store still get plain row dicts from to_dict().
     """
-    ensure_storage()
-    migrate_old_csv_if_needed()
 
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    tid = str(telegram_id).strip()
-    phone_norm = normalize_phone(phone)
+    __slots__ = ("telegram_id", "full_name", "phone", "region", "registered_at")
+
+    def __init__(self, telegram_id, full_name: str, phone, region: str, registered_at):
+        self.telegram_id = telegram_id
+        self.full_name = full_name
+        self.phone = phone
+        self.region = region
+        self.registered_at = registered_at
+
+    @classmethod
+    def from_text(cls, telegram_id: str = "", full_name: str = "", phone: str = "",
+                  region: str = "", registered_at: str = "", *_extra) -> "Registration":
+        # same cleanup the old dict rows got: strip, normalized phone
+        phone = phone.strip()
+        if not phone.isdigit():
+            phone = normalize_phone(phone)
+        return cls(
+            _pack_id(telegram_id.strip()),
+            full_name.strip(),
+            _pack_id(phone),
+            sys.intern(region.strip()),
+            _pack_time(registered_at.strip()),
+        )
+
+    @classmethod
+    def from_row(cls, r: Dict[str, str]) -> "Registration":
+        return cls.from_text(*(str(r.get(k) or "") for k in FIELDNAMES))
+
+    def to_tuple(self) -> Tuple[str, str, str, str, str]:
+        return (
+            _unpack_id(self.telegram_id),
+            self.full_name,
+            _unpack_id(self.phone),
+            self.region,
+            _unpack_time(self.registered_at),
+        )
+
+    def to_dict(self) -> Dict[str, str]:
+        tid, phone = self.telegram_id, self.phone
+        return {
+            "telegram_id": "" if tid is None else str(tid),
+            "full_name": self.full_name,
+            "phone": "" if phone is None else str(phone),
+            "region": self.region,
+            "registered_at": _unpack_time(self.registered_at),
+        }
+
+    def blank(self) -> bool:
+        # ",,,," lines are kept so seq numbers match the file
+        return (
+            self.telegram_id is None and self.phone is None
+            and not self.full_name and not self.region and self.registered_at == ""
+        )
+
+
+def _read_records(reader, header: List[str]) -> List[Registration]:
+    """csv.reader rows -> records, by column name like csv.DictReader."""
+    if header == FIELDNAMES:
+        return [Registration.from_text(*rec) for rec in reader if rec]
+    return [Registration.from_row(dict(zip(header, rec))) for rec in reader if rec]
 
-    rows = _read_all()
 
-    for r in rows:
-        if tid == str(r.get("telegram_id", "")).strip():
-            raise ValueError("already_registered_by_tg")
-        if phone_norm and phone_norm == normalize_phone(r.get("phone", "") or ""):
-            raise ValueError("phone_already_used")
+def _row_matches(r: Registration, q: str, digits: str) -> bool:
+    # q is casefolded; digits = q with non-digits stripped (phone search)
+    return (
+        q in r.full_name.casefold()
+        or q in r.region.casefold()
+        or bool(digits) and digits in _unpack_id(r.phone)
+    )
 
-    row = {
-        "telegram_id": tid,
-        "full_name": (full_name or "").strip(),
-        "phone": phone_norm,
-        "region": (region or "").strip(),
-        "registered_at": now,
-    }
 
-    # append and save
-    rows.append(row)
-    _write_all(rows)
-    return row
+class RegistrationStats:
+    """
+    Running counts for /stats: total, per region, per day and per
+    (region, day). Built once when the store loads, then bumped by every
+    insert and bind, so a summary costs the same at 1k or 1M rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.with_telegram = 0
+        self.by_region: Counter = Counter()
+        self.by_day: Counter = Counter()
+        self.by_region_day: Counter = Counter()
+
+    def add(self, region: str, registered_at: str, has_telegram: bool, n: int = 1):
+        day = registered_at[:10]
+        with self._lock:
+            self.total += n
+            if has_telegram:
+                self.with_telegram += n
+            self.by_region[region] += n
+            self.by_day[day] += n
+            self.by_region_day[region, day] += n
+
+    def add_row(self, r: Registration):
+        if not r.blank():
+            self.add(r.region, _day_of(r.registered_at), r.telegram_id is not None)
+
+    def bind(self):
+        with self._lock:
+            self.with_telegram += 1
+
+    def summary(self, days: int = 7, today: Optional[date] = None) -> Dict:
+        """
+        Totals plus the last `days` days (newest first). Touches
+        regions x days counters, never the rows.
+        """
+        today = today or date.today()
+        recent = [(today - timedelta(days=k)).isoformat() for k in range(days)]
+        with self._lock:
+            return {
+                "total": self.total,
+                "with_telegram": self.with_telegram,
+                "by_region": self.by_region.most_common(),
+                "days": [(d, self.by_day[d]) for d in recent],
+                "by_region_recent": sorted(
+                    ((reg, n) for reg in self.by_region
+                     if (n := sum(self.by_region_day[reg, d] for d in recent))),
+                    key=lambda x: -x[1],
+                ),
+            }
+
+
+class RegistrationStore:
+    """
+    registrations.csv loaded once into memory as compact Registration
+    records, with dict indexes by telegram_id and by normalized phone.
+    The file is re-read only when it changes on disk, and that is
+    checked at most once per recheck_s, so a warm lookup is a dict read
+    with no syscalls. If it only grew (another worker appended), just
+    the new tail is read; a rewrite (new inode) or hand edit reloads it.
+    Safe to share between threads: lookups are plain dict reads,
+    reloads and mutations hold self._lock.
+    Safe to share between processes (WORKERS > 1): writers hold an
+    exclusive flock on <path>.lock and catch up with the file before
+    checking uniqueness, so two workers can't register the same phone.
+    With mmap_index (STORAGE_MMAP_INDEX) nothing is loaded at startup:
+    lookups and the checks before an insert go through csv_index.CsvIndex
+    until something needs every row (admin lists, /stats, export, bind),
+    which loads the registry as above and uses it from then on.
+    """
 
+    def __init__(self, path: str = REG_CSV_PATH, recheck_s: float = STORAGE_RECHECK_SECONDS,
+                 mmap_index: bool = STORAGE_MMAP_INDEX):
+        self.path = path
+        self.recheck_s = recheck_s
+        self._checked_at = float("-inf")
+        self._rows: List[Registration] = []
+        # keys are packed like the records (_pack_id): int, or str if odd
+        self._by_tg: Dict[object, Registration] = {}
+        self._by_phone: Dict[object, Registration] = {}
+        self._stats = RegistrationStats()
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.RLock()
+        self._lock_fd: Optional[int] = None
+        self._lock_mode = 0  # flock currently held on _lock_fd, 0 = none
+        self._disk = None
+        self._disk_checked_at = float("-inf")
+        if mmap_index:
+            from csv_index import CsvIndex
+            self._disk = CsvIndex(path)
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """
+        flock on <path>.lock (the data file itself is replaced by rewrites).
+        Callers hold self._lock, so only one thread uses the fd at a time;
+        nesting is allowed, a shared hold is upgraded for the inner block.
+        """
+        if fcntl is None:
+            yield
+            return
+        if self._lock_fd is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+
+        outer = self._lock_mode
+        if outer == fcntl.LOCK_EX or (outer == fcntl.LOCK_SH and not exclusive):
+            yield
+            return
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        fcntl.flock(self._lock_fd, mode)
+        self._lock_mode = mode
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, outer or fcntl.LOCK_UN)
+            self._lock_mode = outer
+
+    def _index(self, r: Registration):
+        # first row wins, same as the old linear scans
+        if r.telegram_id is not None:
+            self._by_tg.setdefault(r.telegram_id, r)
+        if r.phone is not None:
+            self._by_phone.setdefault(r.phone, r)
+
+    def warm(self):
+        if self._disk is not None:
+            # cold start without reading the rows: open (or build) the index
+            with self._lock:
+                self._sync_disk_index(force=True)
+            if self._disk is not None:
+                return
+        # _load() creates the file and migrates the old format
+        self._refresh(force=True)
+
+    def _on_disk(self) -> bool:
+        # the registry isn't in memory: answer from the index
+        return self._disk is not None and self._stamp is None
+
+    def _sync_disk_index(self, force: bool = False):
+        """Catch the index up with the files. Caller holds self._lock."""
+        now = time.monotonic()
+        if not force and now - self._disk_checked_at < self.recheck_s:
+            return
+        self._disk_checked_at = now
+        with self._file_lock(exclusive=False):
+            if self._disk.sync():
+                return
+            with self._file_lock(exclusive=True):
+                if self._disk.sync():
+                    return  # another worker rebuilt it meanwhile
+                ensure_storage(self.path)
+                migrate_old_csv_if_needed(self.path)
+                try:
+                    self._disk.rebuild()
+                except ValueError as e:
+                    logger.warning("mmap index disabled: %s", e)
+                    self._disk.close()
+                    self._disk = None
+
+    def _lookup_on_disk(self, kind: str, key) -> Optional[Registration]:
+        # kind = "phone" / "telegram_id", key packed like the records;
+        # index hits are only candidates, the row itself must match
+        for rec in self._disk.rows(kind, _unpack_id(key)):
+            r = Registration.from_text(*rec)
+            if getattr(r, kind) == key:
+                return r
+        return None
 
-def bind_telegram_id_by_phone(telegram_id: int, phone: str) -> bool:
+    def _lookup(self, kind: str, key) -> Optional[Registration]:
+        if key is None:
+            return None
+        if self._on_disk():
+            with self._lock:
+                self._sync_disk_index()
+                if self._on_disk():
+                    return self._lookup_on_disk(kind, key)
+        self._refresh()
+        return (self._by_tg if kind == "telegram_id" else self._by_phone).get(key)
+
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        # nothing loaded yet (warm() still running in the background):
+        # always go on to the lock and wait for it
+        if not force and self._stamp is not None and now - self._checked_at < self.recheck_s:
+            return
+        self._checked_at = now
+        stamp = self._file_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return
+        with self._lock, self._file_lock(exclusive=False):
+            self._catch_up()
+
+    def _catch_up(self):
+        """Bring memory in line with the file. Caller holds self._lock and a file lock."""
+        stamp = self._file_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return  # another thread reloaded meanwhile
+        if stamp is not None and self._stamp is not None \
+                and stamp[0] == self._stamp[0] and stamp[2] > self._stamp[2]:
+            self._load_tail()
+        else:
+            self._load()
+
+    def _load_tail(self):
+        # same inode, bigger: rows appended by another process
+        with open(self.path, "rb") as f:
+            f.seek(self._stamp[2])
+            data = f.read()
+            stamp = (self._stamp[0], os.fstat(f.fileno()).st_mtime_ns, self._stamp[2] + len(data))
+        rows = _read_records(csv.reader(io.StringIO(data.decode("utf-8"))), FIELDNAMES)
+        for r in rows:
+            self._rows.append(r)
+            self._index(r)
+            self._stats.add_row(r)
+        self._stamp = stamp
+        if metrics.ENABLED:
+            metrics.rows_scanned("load_tail", len(rows))
+
+    def _load(self):
+        with self._file_lock(exclusive=True):
+            # several workers may start at once: migrate only once
+            ensure_storage(self.path)
+            migrate_old_csv_if_needed(self.path)
+
+            with open(self.path, "r", newline="", encoding="utf-8") as f:
+                st = os.fstat(f.fileno())
+                reader = csv.reader(f)
+                header = [h.strip() for h in next(reader, [])]
+                rows = _read_records(reader, header)
+
+        by_tg: Dict[object, Registration] = {}
+        by_phone: Dict[object, Registration] = {}
+        stats = RegistrationStats()
+        for r in rows:
+            if r.telegram_id is not None:
+                by_tg.setdefault(r.telegram_id, r)
+            if r.phone is not None:
+                by_phone.setdefault(r.phone, r)
+            stats.add_row(r)
+
+        # swap in one go so concurrent readers never see half an index
+        self._rows, self._by_tg, self._by_phone, self._stats = rows, by_tg, by_phone, stats
+        self._stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if metrics.ENABLED:
+            metrics.rows_scanned("load", len(rows))
+
+    def _write_all(self):
+        """
+        Full rewrite, only for real edits (bind_telegram_id_by_phone).
+        Written to a temp file and swapped in with os.replace,
+        so a crash never leaves a truncated registrations.csv.
+        """
+        ensure_storage(self.path)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(FIELDNAMES)
+            w.writerows(r.to_tuple() for r in self._rows)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _append(self, rows: List[Dict[str, str]]) -> Tuple[List[int], Tuple[int, int, int]]:
+        """
+        New rows only: one buffered write + fsync, O(1) in file size.
+        Returns each row's byte offset and the file's new stamp.
+        """
+        buf = io.StringIO()
+        w = csv.DictWriter(buf, fieldnames=FIELDNAMES)
+        lines = []
+        for row in rows:
+            w.writerow(row)
+            lines.append(buf.getvalue().encode("utf-8"))
+            buf.seek(0)
+            buf.truncate()
+
+        ensure_storage(self.path)
+        with open(self.path, "a+b") as f:
+            start = f.tell()
+            prefix = b""
+            if start > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) not in (b"\n", b"\r"):
+                    prefix = b"\r\n"
+            f.write(prefix + b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+
+        offsets = []
+        pos = start + len(prefix)
+        for line in lines:
+            offsets.append(pos)
+            pos += len(line)
+        return offsets, (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def find_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, str]]:
+        r = self._lookup("telegram_id", _pack_id(str(telegram_id).strip()))
+        return r.to_dict() if r else None
+
+    def find_by_phone(self, phone: str) -> Optional[Dict[str, str]]:
+        r = self._lookup("phone", _pack_id(normalize_phone(phone)))
+        return r.to_dict() if r else None
+
+    def registered(self, kind: str, keys: Iterable[str]) -> Set[str]:
+        """
+        The `keys` (kind = "telegram_id" / "phone", normalized) that are
+        taken: one probe of the index per key, rows aren't scanned.
+        """
+        if self._on_disk():
+            with self._lock:
+                self._sync_disk_index()
+                if self._on_disk():
+                    return {k for k in keys if self._lookup_on_disk(kind, _pack_id(k)) is not None}
+        self._refresh()
+        index = self._by_tg if kind == "telegram_id" else self._by_phone
+        return {k for k in keys if _pack_id(k) in index}
+
+    def add_registration(self, telegram_id: int, full_name: str, phone: str, region: str) -> Dict[str, str]:
+        """
+        Rules:
+        - 1 telegram_id = 1 registration
+        - 1 phone = 1 registration
+        """
+        row = make_row(telegram_id, full_name, phone, region)
+        err = self.add_registrations([row])[0]
+        if err:
+            raise ValueError(err)
+        return dict(row)
+
+    def add_registrations(self, rows: List[Dict[str, str]]) -> List[Optional[str]]:
+        """
+        Group commit: check every row against the indexes (and the rows
+        before it in the batch), append the accepted ones with a single
+        write + fsync. Returns one error per row, None = stored.
+        """
+        errors: List[Optional[str]] = []
+        with self._lock, self._file_lock(exclusive=True):
+            # rows other workers added since our last look
+            if self._on_disk():
+                self._sync_disk_index(force=True)
+            on_disk = self._on_disk()
+            if not on_disk:
+                self._catch_up()
+
+            def taken(kind: str, key) -> bool:
+                if on_disk:
+                    return self._lookup_on_disk(kind, key) is not None
+                return key in (self._by_tg if kind == "telegram_id" else self._by_phone)
+
+            accepted = []
+            seen_tg = set()
+            seen_phone = set()
+            for row in rows:
+                rec = Registration.from_row(row)
+                tid, phone_key = rec.telegram_id, rec.phone
+                if tid is not None and (tid in seen_tg or taken("telegram_id", tid)):
+                    errors.append("already_registered_by_tg")
+                elif phone_key is not None and (phone_key in seen_phone or taken("phone", phone_key)):
+                    errors.append("phone_already_used")
+                else:
+                    errors.append(None)
+                    accepted.append((row, rec))
+                    seen_tg.add(tid)
+                    seen_phone.add(phone_key)
+
+            if accepted:
+                # append only, no full rewrite
+                offsets, stamp = self._append([row for row, _ in accepted])
+                if on_disk:
+                    self._disk.append(
+                        [(offset, [row[k] for k in FIELDNAMES]) for offset, (row, _) in zip(offsets, accepted)],
+                        size=stamp[2], mtime_ns=stamp[1],
+                    )
+                    return errors
+                self._stamp = stamp
+                for _, rec in accepted:
+                    self._rows.append(rec)
+                    self._index(rec)
+                    self._stats.add_row(rec)
+        return errors
+
+    def bind_telegram_id_by_phone(self, telegram_id: int, phone: str) -> bool:
+        """
+        After migration telegram_id can be empty.
+        If user sends phone and that phone exists in CSV,
+        bind telegram_id into that row (only if empty).
+        """
+        tid = str(telegram_id).strip()
+        phone_norm = normalize_phone(phone)
+        if not phone_norm:
+            return False
+
+        with self._lock, self._file_lock(exclusive=True):
+            # a rewrite needs every row: with the mmap index this is
+            # where the registry gets loaded
+            self._catch_up()
+
+            r = self._by_phone.get(_pack_id(phone_norm))
+            if r is None or r.telegram_id is not None:
+                return False
+
+            r.telegram_id = _pack_id(tid)
+            try:
+                self._write_all()
+            except Exception:
+                r.telegram_id = None
+                raise
+            self._index(r)
+            self._stats.bind()
+        return True
+
+    def list_last(self, limit: int = 20) -> List[Dict[str, str]]:
+        self._refresh()
+        out = []
+        scanned = 0
+        for scanned, r in enumerate(reversed(self._rows), 1):
+            if not r.blank():
+                out.append(r.to_dict())
+                if len(out) >= limit:
+                    break
+        if metrics.ENABLED:
+            metrics.rows_scanned("list_last", scanned)
+        out.reverse()
+        return out
+
+    def iter_rows(self, after: int = 0) -> Iterator[Tuple[int, Dict[str, str]]]:
+        """
+        Stream (seq, row) in file order, skipping blank rows.
+        seq is the 1-based data row number and only grows,
+        so it works as a cursor for "new since last time".
+        """
+        self._refresh()
+        rows = self._rows  # a reload swaps the list, this one stays valid
+        start = i = max(after, 0)
+        try:
+            for i in range(start, len(rows)):
+                r = rows[i]
+                if not r.blank():
+                    yield i + 1, r.to_dict()
+            i = len(rows)
+        finally:
+            if metrics.ENABLED:
+                metrics.rows_scanned("iter_rows", max(i - start, 0))
+
+    def last_seq(self) -> int:
+        self._refresh()
+        return len(self._rows)
+
+    def stats(self, days: int = 7) -> Dict:
+        self._refresh()
+        return self._stats.summary(days)
+
+    def page(self, before: Optional[int] = None, after: Optional[int] = None,
+             limit: int = 20, query: Optional[str] = None) -> List[Tuple[int, Dict[str, str]]]:
+        """
+        Newest-first page of (seq, row).
+          before=seq -> rows older than seq (next page)
+          after=seq  -> rows newer than seq (previous page)
+          neither    -> the newest rows
+        Without a query only ~limit rows are touched, whatever the total.
+        """
+        self._refresh()
+        rows = self._rows
+        q = (query or "").strip().casefold()
+        digits = normalize_phone(q)
+
+        if after is not None:
+            idx = range(max(after, 0), len(rows))
+        else:
+            end = len(rows) if before is None else min(max(before - 1, 0), len(rows))
+            idx = range(end - 1, -1, -1)
+
+        out = []
+        scanned = 0
+        for scanned, i in enumerate(idx, 1):
+            r = rows[i]
+            if not r.blank() and (not q or _row_matches(r, q, digits)):
+                out.append((i + 1, r.to_dict()))
+                if len(out) >= limit:
+                    break
+        if metrics.ENABLED:
+            metrics.rows_scanned("page", scanned)
+        if after is not None:
+            out.reverse()
+        return out
+
+    def seq_after_date(self, day: str) -> Optional[int]:
+        """
+        Cursor for "jump to date" (day = YYYY-MM-DD): seq of the first row
+        registered after that day, so page(before=...) starts with the
+        day's newest rows. None = nothing later, use the newest page.
+        Binary search: rows are appended in time order.
+        """
+        self._refresh()
+        rows = self._rows
+
+        def day_at(i: int) -> str:
+            # blank rows (",,,,") take the date of the row before them
+            while i >= 0 and rows[i].registered_at == "":
+                i -= 1
+            return _day_of(rows[i].registered_at) if i >= 0 else ""
+
+        lo, hi = 0, len(rows)
+        probes = 0
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probes += 1
+            if day_at(mid) <= day:
+                lo = mid + 1
+            else:
+                hi = mid
+        if metrics.ENABLED:
+            metrics.rows_scanned("seq_after_date", probes)
+        return lo + 1 if lo < len(rows) else None
+
+
+def _make_store():
+    if STORAGE_BACKEND == "sqlite":
+        from storage_sqlite import SqliteRegistrationStore
+        return SqliteRegistrationStore(REG_DB_PATH, import_from=REG_CSV_PATH)
+    if STORAGE_BACKEND != "csv":
+        raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return RegistrationStore(REG_CSV_PATH)
+
+
+_store = _make_store()
+
+
+def init_storage():
     """
-    After migration telegram_id can be empty.
-    If user sends phone and that phone exists in CSV,
-    bind telegram_id into that row (only if empty).
+    Run once at startup (async_storage.init, in the background): create
+    data/, migrate the old CSV format and load the store. Handlers don't
+    repeat these checks; calls made before it finishes wait for it.
     """
-    ensure_storage()
-    migrate_old_csv_if_needed()
+    _store.warm()
+
+
+def find_by_telegram_id(telegram_id: int) -> Optional[Dict[str, str]]:
+    return _store.find_by_telegram_id(telegram_id)
+
+
+def find_by_phone(phone: str) -> Optional[Dict[str, str]]:
+    return _store.find_by_phone(phone)
 
-    tid = str(telegram_id).strip()
-    phone_norm = normalize_phone(phone)
-    if not phone_norm:
-        return False
 
-    rows = _read_all()
-    changed = False
+def registered(kind: str, keys: Iterable[str]) -> Set[str]:
+    return _store.registered(kind, keys)
 
-    for r in rows:
-        if phone_norm == normalize_phone(r.get("phone", "") or ""):
-            if not str(r.get("telegram_id", "")).strip():
-                r["telegram_id"] = tid
-                changed = True
-            break
 
-    if not changed:
-        return False
+def add_registration(telegram_id: int, full_name: str, phone: str, region: str) -> Dict[str, str]:
+    return _store.add_registration(telegram_id, full_name, phone, region)
+
+
+def add_registrations(rows: List[Dict[str, str]]) -> List[Optional[str]]:
+    return _store.add_registrations(rows)
+
 
-    _write_all(rows)
-    return True
+def bind_telegram_id_by_phone(telegram_id: int, phone: str) -> bool:
+    return _store.bind_telegram_id_by_phone(telegram_id, phone)
 
 
 def list_last(limit: int = 20) -> List[Dict[str, str]]:
-    rows = _read_all()
-    rows = [r for r in rows if any((v or "").strip() for v in r.values())]
-    return rows[-limit:]
\ No newline at end of file
+    return _store.list_last(limit)
+
+
+def page(before: Optional[int] = None, after: Optional[int] = None,
+         limit: int = 20, query: Optional[str] = None) -> List[Tuple[int, Dict[str, str]]]:
+    return _store.page(before=before, after=after, limit=limit, query=query)
+
+
+def seq_after_date(day: str) -> Optional[int]:
+    return _store.seq_after_date(day)
+
+
+def iter_rows(after: int = 0) -> Iterator[Tuple[int, Dict[str, str]]]:
+    return _store.iter_rows(after)
+
+
+def last_seq() -> int:
+    return _store.last_seq()
+
+
+def stats(days: int = 7) -> Dict:
+    return _store.stats(days)
@@ -0,0 +1,332 @@
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from typing import Optional, Dict, Iterable, Iterator, List, Set, Tuple
+
+from config import REG_CSV_PATH, REG_DB_PATH
+from storage import FIELDNAMES, OLD_FIELDNAMES, RegistrationStats, normalize_phone, make_row, _read_header
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registrations (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    telegram_id   TEXT UNIQUE,          -- NULL for rows migrated from the old CSV
+    full_name     TEXT NOT NULL DEFAULT '',
+    phone         TEXT UNIQUE,          -- normalized digits, NULL if unknown
+    region        TEXT NOT NULL DEFAULT '',
+    registered_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_registrations_registered_at ON registrations(registered_at);
+"""
+
+_COLUMNS = ", ".join(FIELDNAMES)
+
+
+def _row_to_dict(row: Tuple) -> Dict[str, str]:
+    return {k: (v or "") for k, v in zip(FIELDNAMES, row)}
+
+
+def _integrity_reason(e: sqlite3.IntegrityError) -> str:
+    msg = str(e)
+    if "telegram_id" in msg:
+        return "already_registered_by_tg"
+    if "phone" in msg:
+        return "phone_already_used"
+    return "integrity_error"
+
+
+class SqliteRegistrationStore:
+    """
+    Same API as storage.RegistrationStore, backed by SQLite in WAL mode.
+    UNIQUE(telegram_id) and UNIQUE(phone) enforce the registration rules
+    atomically, so concurrent writers cannot slip duplicates in.
+    """
+
+    def __init__(self, db_path: str = REG_DB_PATH, import_from: Optional[str] = REG_CSV_PATH):
+        self.db_path = db_path
+        self.import_from = import_from
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._stats: Optional[RegistrationStats] = None
+        self._stats_max_id = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        with self._init_lock:
+            if not self._initialized:
+                is_new = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type='table' AND name='registrations'"
+                ).fetchone() is None
+                conn.executescript(SCHEMA)
+                # first start on sqlite: carry over what the CSV backend had
+                if is_new and self.import_from and os.path.exists(self.import_from):
+                    import_csv(self.import_from, conn=conn)
+                self._initialized = True
+        return conn
+
+    def warm(self):
+        self._conn()
+        self._load_stats()
+
+    def _load_stats(self) -> RegistrationStats:
+        """
+        Built with one grouped scan at startup, then only rows with a
+        larger id are folded in, so inserts by other workers (WORKERS > 1)
+        are counted too. Binds are counted by the process that made them.
+        """
+        conn = self._conn()
+        with self._init_lock:
+            if self._stats is None:
+                stats = RegistrationStats()
+                max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM registrations").fetchone()[0]
+                for region, day, has_tg, n in conn.execute(
+                    "SELECT region, substr(registered_at, 1, 10), "
+                    "COALESCE(telegram_id, '') <> '', COUNT(*) "
+                    "FROM registrations WHERE id <= ? GROUP BY 1, 2, 3", (max_id,)
+                ):
+                    stats.add(region, day, bool(has_tg), n)
+                self._stats, self._stats_max_id = stats, max_id
+            else:
+                for row_id, region, registered_at, has_tg in conn.execute(
+                    "SELECT id, region, registered_at, COALESCE(telegram_id, '') <> '' "
+                    "FROM registrations WHERE id > ? ORDER BY id", (self._stats_max_id,)
+                ):
+                    self._stats.add(region, registered_at, bool(has_tg))
+                    self._stats_max_id = row_id
+        return self._stats
+
+    def find_by_telegram_id(self, telegram_id: int) -> Optional[Dict[str, str]]:
+        row = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM registrations WHERE telegram_id = ?",
+            (str(telegram_id).strip(),),
+        ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def find_by_phone(self, phone: str) -> Optional[Dict[str, str]]:
+        p = normalize_phone(phone)
+        if not p:
+            return None
+        row = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM registrations WHERE phone = ?", (p,)
+        ).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def registered(self, kind: str, keys: Iterable[str]) -> Set[str]:
+        """Which of `keys` are taken, see RegistrationStore.registered (UNIQUE indexes)."""
+        if kind not in ("telegram_id", "phone"):
+            raise ValueError(f"unknown key: {kind}")
+        keys = list(keys)
+        out: Set[str] = set()
+        conn = self._conn()
+        # SQLite limits the number of ? in one statement
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ", ".join("?" * len(chunk))
+            out.update(k for (k,) in conn.execute(
+                f"SELECT {kind} FROM registrations WHERE {kind} IN ({marks})", chunk
+            ))
+        return out
+
+    def add_registration(self, telegram_id: int, full_name: str, phone: str, region: str) -> Dict[str, str]:
+        """
+        Rules (enforced by UNIQUE constraints):
+        - 1 telegram_id = 1 registration
+        - 1 phone = 1 registration
+        """
+        row = make_row(telegram_id, full_name, phone, region)
+        err = self.add_registrations([row])[0]
+        if err:
+            raise ValueError(err)
+        return row
+
+    def add_registrations(self, rows: List[Dict[str, str]]) -> List[Optional[str]]:
+        """
+        Insert a batch in one transaction (one WAL commit).
+        A constraint violation only skips that row.
+        Returns one error per row, None = stored.
+        """
+        errors: List[Optional[str]] = []
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                try:
+                    conn.execute(
+                        f"INSERT INTO registrations ({_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                        (row["telegram_id"] or None, row["full_name"], row["phone"] or None,
+                         row["region"], row["registered_at"]),
+                    )
+                    errors.append(None)
+                except sqlite3.IntegrityError as e:
+                    errors.append(_integrity_reason(e))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return errors
+
+    def bind_telegram_id_by_phone(self, telegram_id: int, phone: str) -> bool:
+        """
+        Bind telegram_id to a migrated row that has this phone
+        and no telegram_id yet.
+        """
+        phone_norm = normalize_phone(phone)
+        if not phone_norm:
+            return False
+        try:
+            cur = self._conn().execute(
+                "UPDATE registrations SET telegram_id = ? "
+                "WHERE phone = ? AND (telegram_id IS NULL OR telegram_id = '')",
+                (str(telegram_id).strip(), phone_norm),
+            )
+        except sqlite3.IntegrityError:
+            return False  # this telegram_id is already bound to another row
+        if cur.rowcount > 0:
+            self._load_stats().bind()
+            return True
+        return False
+
+    def list_last(self, limit: int = 20) -> List[Dict[str, str]]:
+        rows = self._conn().execute(
+            f"SELECT {_COLUMNS} FROM registrations ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [_row_to_dict(r) for r in reversed(rows)]
+
+    def page(self, before: Optional[int] = None, after: Optional[int] = None,
+             limit: int = 20, query: Optional[str] = None) -> List[Tuple[int, Dict[str, str]]]:
+        """Newest-first page of (seq, row), see RegistrationStore.page."""
+        where, params = [], []
+        if after is not None:
+            where.append("id > ?")
+            params.append(after)
+        elif before is not None:
+            where.append("id < ?")
+            params.append(before)
+
+        q = (query or "").strip()
+        if q:
+            digits = normalize_phone(q)
+            like = f"%{q}%"
+            cond = "full_name LIKE ? OR region LIKE ?"
+            params += [like, like]
+            if digits:
+                cond += " OR phone LIKE ?"
+                params.append(f"%{digits}%")
+            where.append(f"({cond})")
+
+        order = "ASC" if after is not None else "DESC"
+        sql = f"SELECT id, {_COLUMNS} FROM registrations"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY id {order} LIMIT ?"
+        params.append(limit)
+
+        out = [(row[0], _row_to_dict(row[1:])) for row in self._conn().execute(sql, params)]
+        if after is not None:
+            out.reverse()
+        return out
+
+    def seq_after_date(self, day: str) -> Optional[int]:
+        # "~" sorts after "YYYY-MM-DD HH:MM:SS", uses the registered_at index
+        row = self._conn().execute(
+            "SELECT id FROM registrations WHERE registered_at > ? ORDER BY registered_at, id LIMIT 1",
+            (day + "~",),
+        ).fetchone()
+        return row[0] if row else None
+
+    def iter_rows(self, after: int = 0) -> Iterator[Tuple[int, Dict[str, str]]]:
+        # seq = rowid (AUTOINCREMENT, never reused); cursor streams, no fetchall
+        cur = self._conn().execute(
+            f"SELECT id, {_COLUMNS} FROM registrations WHERE id > ? ORDER BY id", (after,)
+        )
+        for row in cur:
+            yield row[0], _row_to_dict(row[1:])
+
+    def stats(self, days: int = 7) -> Dict:
+        return self._load_stats().summary(days)
+
+    def last_seq(self) -> int:
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM registrations").fetchone()[0]
+
+
+def import_csv(csv_path: str = REG_CSV_PATH, db_path: str = REG_DB_PATH,
+               conn: Optional[sqlite3.Connection] = None) -> Tuple[int, int]:
+    """
+    One-shot import of registrations.csv into SQLite.
+    Understands both the current format and the old
+      fullname,phone,region,created_at
+    one (what migrate_old_csv_if_needed converts). Blank rows are dropped,
+    rows whose telegram_id/phone is already present are skipped.
+    Returns (imported, skipped).
+    """
+    header = _read_header(csv_path)
+    if header == FIELDNAMES:
+        mapping = {k: k for k in FIELDNAMES}
+    elif header == OLD_FIELDNAMES:
+        mapping = {"telegram_id": None, "full_name": "fullname", "phone": "phone",
+                   "region": "region", "registered_at": "created_at"}
+    else:
+        raise ValueError(f"unknown CSV header: {header}")
+
+    own_conn = conn is None
+    if own_conn:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    imported = skipped = 0
+    try:
+        conn.execute("BEGIN")
+        with open(csv_path, "r", encoding="utf-8", newline="") as f:
+            for src in csv.DictReader(f):
+                def get(key):
+                    col = mapping[key]
+                    return (src.get(col) or "").strip() if col else ""
+
+                values = (
+                    get("telegram_id") or None,
+                    get("full_name"),
+                    normalize_phone(get("phone")) or None,
+                    get("region"),
+                    get("registered_at"),
+                )
+                if not any(values):
+                    continue
+                cur = conn.execute(
+                    f"INSERT OR IGNORE INTO registrations ({_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                    values,
+                )
+                if cur.rowcount:
+                    imported += 1
+                else:
+                    skipped += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+    return imported, skipped
+
+
+if __name__ == "__main__":
+    # python storage_sqlite.py [registrations.csv] [registrations.db]
+    src = sys.argv[1] if len(sys.argv) > 1 else REG_CSV_PATH
+    dst = sys.argv[2] if len(sys.argv) > 2 else REG_DB_PATH
+    done, dup = import_csv(src, dst)
+    print(f"Imported {done} rows into {dst} ({dup} duplicates skipped)")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the bot is a flat set of modules in the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
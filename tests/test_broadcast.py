@@ -0,0 +1,36 @@
+import asyncio
+from collections import Counter
+
+from telegram import Bot
+
+import broadcast
+import storage
+from benchmarks.common import make_csv
+from benchmarks.fake_telegram import FakeRequest
+
+
+def test_stop_and_resume_sends_each_message_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_store", storage.RegistrationStore(make_csv(str(tmp_path / "r.csv"), 300)))
+    checkpoint = str(tmp_path / "broadcast.json")
+
+    async def run():
+        request = FakeRequest(latency_s=0.02, keep_calls=10 ** 6)
+        bot = Bot("123:fake", request=request)
+        await bot.initialize()
+        state = broadcast.BroadcastState(text="Yangilik!", region=None, admin_chat_id=1)
+        first = broadcast.Broadcaster(bot, state, checkpoint, rate=1000, concurrency=32)
+        task = asyncio.create_task(first.run())
+        await asyncio.sleep(0.1)
+        first.stop()
+        stopped = await task
+
+        state = broadcast.load_state(checkpoint)
+        state.status = "running"
+        final = await broadcast.Broadcaster(bot, state, checkpoint, rate=1000, concurrency=32).run()
+        await bot.shutdown()
+        return stopped, final, Counter(p["chat_id"] for _, m, p in request.calls if m == "sendMessage")
+
+    stopped, final, per_chat = asyncio.run(run())
+    assert stopped.status == "stopped" and 0 < stopped.sent < 300
+    assert final.status == "done" and final.sent == 300
+    assert len(per_chat) == 300 and set(per_chat.values()) == {1}
@@ -0,0 +1,32 @@
+import os
+
+import export
+import storage
+
+
+def _registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_store", storage.RegistrationStore(str(tmp_path / "registrations.csv")))
+    monkeypatch.setattr(export, "EXPORT_CURSORS_PATH", str(tmp_path / "export_cursors.json"))
+    rows = [
+        storage.make_row(str(i), "Aliyev Sardor", f"99890{i:07d}", "Samarqand" if i == 0 else "Buxoro")
+        for i in range(30)
+    ]
+    assert storage.add_registrations(rows) == [None] * 30
+
+
+def _new(admin_id, req):
+    result = export.build_export(req, export.get_cursor(admin_id, req))
+    os.remove(result.path)
+    export.save_cursor(admin_id, req, result.last_seq)
+    return result.rows
+
+
+def test_filtered_new_export_keeps_other_rows_new(tmp_path, monkeypatch):
+    _registry(tmp_path, monkeypatch)
+
+    assert _new(1, export.ExportRequest(region="Samarqand", only_new=True)) == 1
+    assert _new(1, export.ExportRequest(region="Samarqand", only_new=True)) == 0
+    assert _new(1, export.ExportRequest(region="Buxoro", only_new=True)) == 29
+    assert _new(1, export.ExportRequest(only_new=True)) == 30
+    assert _new(1, export.ExportRequest(only_new=True)) == 0
+    assert _new(2, export.ExportRequest(only_new=True)) == 30
@@ -0,0 +1,44 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import async_storage
+import importer
+import storage
+from write_queue import RegistrationQueue
+
+
+def test_import_sees_registry_and_write_queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_store", storage.RegistrationStore(str(tmp_path / "registrations.csv")))
+    storage.add_registration(111, "Aliyev Sardor", "+998 90 000 00 01", "Samarqand")
+    monkeypatch.setattr(async_storage, "_readers", ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(async_storage, "_writer", ThreadPoolExecutor(max_workers=1))
+    sheet = tmp_path / "sheet.csv"
+    sheet.write_text(
+        "full_name,phone,region,telegram_id\n"
+        "Karimov Anvar,+998 90 000 00 01,samarqand,\n"  # phone on disk
+        "Karimov Anvar,+998 90 000 00 02,buxoro,\n"  # phone in the queue
+        "Karimov Anvar,+998 90 000 00 03,buxoro,222\n"  # telegram_id in the queue
+        "Karimov Anvar,+998 90 000 00 04,buxoro,\n",
+        encoding="utf-8",
+    )
+
+    async def run():
+        # not started: the submitted rows stay pending, as between two batches
+        queue = RegistrationQueue(commit=async_storage.commit_registrations, check=async_storage._check_committed)
+        monkeypatch.setattr(async_storage, "_queue", queue)
+        await queue.submit(222, "Aliyev Sardor", "+998 90 000 00 02", "Buxoro")
+        return await importer.run_import(str(sheet), "csv")
+
+    result = asyncio.run(run())
+    assert result.total == 4 and result.accepted == 1
+    assert result.rejected == [(2, "phone_already_used"), (3, "phone_already_used"),
+                               (4, "already_registered_by_tg")]
+    assert storage.find_by_phone("998900000004")["region"] == "Buxoro"
+
+
+def test_normalize_phones_matches_storage():
+    import pandas as pd
+
+    raw = ["+998 90 123-45-67", "(90) 123 45 67", "", "tel: +998"]
+    assert importer.normalize_phones(pd.Series(raw)).tolist() == [storage.normalize_phone(p) for p in raw]
+    assert importer.normalize_phones(pd.Series(["998901234567.0"])).tolist() == ["998901234567"]
@@ -0,0 +1,15 @@
+from telegram import KeyboardButton, ReplyKeyboardMarkup
+from telegram.request._requestparameter import RequestParameter
+
+import keyboards
+
+
+def test_static_keyboards_are_shared_markups_with_a_cached_dict():
+    kb = keyboards.kb_after_registered()
+    plain = ReplyKeyboardMarkup(
+        [[KeyboardButton(keyboards.BTN_MY_INFO)], [KeyboardButton(keyboards.BTN_HELP)]],
+        resize_keyboard=True,
+    )
+    assert isinstance(kb, ReplyKeyboardMarkup) and kb is keyboards.kb_after_registered()
+    assert kb == plain and kb.to_dict() is kb.to_dict()
+    assert RequestParameter.from_input("reply_markup", kb).json_value == plain.to_json()
@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import async_storage
+import broadcast
+import main
+import storage
+from benchmarks.fake_telegram import FakeRequest, offline_bot
+
+
+def test_profile_startup_does_not_resume_a_broadcast(tmp_path, monkeypatch):
+    bot = offline_bot(str(tmp_path), patch=monkeypatch.setattr)
+    monkeypatch.setattr(async_storage, "_readers", ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(async_storage, "_writer", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(async_storage, "_warm", None)
+    monkeypatch.setattr(async_storage, "_queue", None)
+    # a broadcast checkpointed as running, with a recipient in the registry
+    storage.add_registration(111, "Aliyev Sardor", "+998 90 000 00 01", "Samarqand")
+    state = broadcast.BroadcastState(text="Yangilik!", region=None, admin_chat_id=1)
+    broadcast.save_state(bot.BROADCAST_CHECKPOINT_PATH, state)
+
+    fake = FakeRequest()
+    main.profile_startup(request=fake)
+
+    assert not any(m.startswith("send") for m in fake.counts)
+    assert broadcast.load_state(bot.BROADCAST_CHECKPOINT_PATH) == state
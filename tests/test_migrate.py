@@ -0,0 +1,73 @@
+import csv
+import json
+
+import pytest
+
+import migrate
+import storage
+from storage import FIELDNAMES, OLD_FIELDNAMES
+
+
+def _old_csv(path, n):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(OLD_FIELDNAMES)
+        for i in range(n):
+            w.writerow([f"Aliyev Sardor {i}", f"+998 90 {i:07d}", "Samarqand", "2026-01-01 10:00:00"])
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_stale_bak_is_not_reused(tmp_path):
+    path = str(tmp_path / "registrations.csv")
+    with open(path + ".bak", "w") as f:
+        f.write("earlier migration\n")
+    original = _old_csv(path, 10)
+
+    res = migrate.migrate_csv(path)
+
+    assert res.backup != path + ".bak"
+    with open(path + ".bak") as f:
+        assert f.read() == "earlier migration\n"
+    with open(res.backup, "rb") as f:
+        assert f.read() == original
+    assert _rows(path)[0] == FIELDNAMES and len(_rows(path)) == 11
+
+
+def test_resume_keeps_backup_from_checkpoint(tmp_path):
+    path = str(tmp_path / "registrations.csv")
+    original = _old_csv(path, 25)
+
+    def killed(cp, rate):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        migrate.migrate_csv(path, chunk_rows=10, progress=killed)
+    with open(path + ".migrate.json") as f:
+        cp = json.load(f)
+    assert cp["src_offset"] > 0 and cp["backup"] == path + ".bak"
+
+    res = migrate.migrate_csv(path, chunk_rows=10)
+
+    assert res.resumed and res.rows_out == 25 and res.backup == cp["backup"]
+    with open(res.backup, "rb") as f:
+        assert f.read() == original
+    rows = _rows(path)
+    assert [r[2] for r in rows[1:]] == [f"99890{i:07d}" for i in range(25)]
+
+
+def test_startup_migration_logs_instead_of_printing(tmp_path, capsys, caplog):
+    path = str(tmp_path / "registrations.csv")
+    _old_csv(path, 25)
+
+    with caplog.at_level("INFO", logger="storage"):
+        storage.migrate_old_csv_if_needed(path)
+
+    assert capsys.readouterr().out == ""
+    assert any("Migrated" in r.getMessage() for r in caplog.records)
+    assert _rows(path)[0] == FIELDNAMES
@@ -0,0 +1,43 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import Update
+
+import async_storage
+from benchmarks.fake_telegram import FakeRequest, make_update, offline_bot
+
+
+def test_user_data_is_emptied_after_flush(tmp_path, monkeypatch):
+    bot = offline_bot(str(tmp_path), patch=monkeypatch.setattr)
+    # app.shutdown() closes async_storage: give it its own executors and state
+    monkeypatch.setattr(async_storage, "_readers", ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(async_storage, "_writer", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(async_storage, "_warm", None)
+    monkeypatch.setattr(async_storage, "_queue", None)
+
+    async def run():
+        fake = FakeRequest()
+        app = bot.build_application(request=fake)
+        await app.initialize()
+        await app.post_init(app)
+        await async_storage.wait_warm()
+        try:
+            for user_id in range(1, 11):
+                await app.process_update(Update.de_json(make_update(user_id, text="/start"), app.bot))
+            # one user is mid-conversation: that data has to stay
+            await app.process_update(Update.de_json(make_update(11, text="/start"), app.bot))
+            app.user_data[11]["full_name"] = "Aliyev Sardor"
+
+            await app.update_persistence()
+            left = dict(app.user_data)
+            await app.update_persistence()  # the drops themselves reach the file
+            return left, dict(app.user_data)
+        finally:
+            await app.post_stop(app)
+            await app.shutdown()
+            await app.post_shutdown(app)
+
+    left, after = asyncio.run(run())
+    assert list(left) == [11] and list(after) == [11]
+    assert os.path.exists(bot.PERSISTENCE_PATH)
@@ -0,0 +1,56 @@
+import asyncio
+import csv
+
+import async_storage
+from write_queue import RegistrationQueue
+
+
+def test_stop_gives_up_on_failing_commits_and_spills(tmp_path):
+    async def broken_disk(rows):
+        raise OSError("No space left on device")
+
+    async def nothing_taken(telegram_id, phone_norm):
+        return None
+
+    async def run():
+        queue = RegistrationQueue(commit=broken_disk, check=nothing_taken, max_delay_s=0.001)
+        queue.start()
+        for i in range(3):
+            await queue.submit(100 + i, "Aliyev Sardor", f"+998 90 000 00 0{i}", "Samarqand")
+        return await asyncio.wait_for(queue.stop(timeout=0.3), 5)
+
+    unsaved = asyncio.run(run())
+    assert sorted(r["telegram_id"] for r in unsaved) == ["100", "101", "102"]
+
+    path = str(tmp_path / "registrations.unsaved.csv")
+    async_storage._spill(unsaved, path)
+    with open(path, newline="", encoding="utf-8") as f:
+        assert [r["phone"] for r in csv.DictReader(f)] == ["998900000000", "998900000001", "998900000002"]
+
+
+def test_sign_up_during_import_commit_is_refused():
+    import pytest
+
+    from storage import make_row
+
+    async def nothing_taken(telegram_id, phone_norm):
+        return None
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def slow_commit(rows):
+            await gate.wait()
+            return [None] * len(rows)
+
+        queue = RegistrationQueue(commit=slow_commit, check=nothing_taken)
+        await queue.submit(7, "Aliyev Sardor", "+998 90 000 00 07", "Samarqand")  # not started: pending
+        rows = [make_row("", "Karimov Anvar", p, "Buxoro") for p in ("998900000007", "998900000008")]
+        batch = asyncio.create_task(queue.add_batch(rows))
+        await asyncio.sleep(0)
+        with pytest.raises(ValueError, match="phone_already_used"):
+            await queue.submit(8, "Aliyev Sardor", "+998 90 000 00 08", "Samarqand")
+        gate.set()
+        return await batch
+
+    assert asyncio.run(run()) == ["phone_already_used", None]
@@ -0,0 +1,117 @@
+"""
+Anti-flood layer that runs before every other handler (group -1).
+
+Per user: a token bucket (rate/s, up to `burst` at once) and coalescing
+of identical consecutive messages (same text, contact or button press
+within `duplicate_window` seconds). A throttled update is stopped inside
+check_update, before PTB builds a context, so it never reaches
+persistence, storage or a handler. Only the first rate-limited update
+per `notify_interval` gets a short reply; the rest are dropped silently.
+
+Per-user state sits in an LRU capped at `max_users` entries.
+"""
+import time
+from collections import OrderedDict
+from typing import Collection, Optional
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, BaseHandler
+
+import metrics
+
+DUPLICATE = "duplicate"
+RATE = "rate"
+RATE_NOTIFY = "rate_notify"
+
+
+class _UserState:
+    __slots__ = ("tokens", "updated", "last_fp", "last_seen", "notified_at")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.last_fp: Optional[str] = None
+        self.last_seen = now
+        self.notified_at = float("-inf")
+
+
+class FloodGuard:
+    def __init__(self, rate: float = 1.0, burst: int = 5, duplicate_window: float = 3.0,
+                 notify_interval: float = 10.0, max_users: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.duplicate_window = duplicate_window
+        self.notify_interval = notify_interval
+        self.max_users = max_users
+        self._users: "OrderedDict[int, _UserState]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def check(self, user_id: int, fingerprint: Optional[str], now: Optional[float] = None) -> Optional[str]:
+        """None = let it through, otherwise DUPLICATE, RATE or RATE_NOTIFY."""
+        now = time.monotonic() if now is None else now
+        st = self._users.get(user_id)
+        if st is None:
+            st = self._users[user_id] = _UserState(self.burst, now)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+
+        if fingerprint is not None and fingerprint == st.last_fp \
+                and now - st.last_seen < self.duplicate_window:
+            st.last_seen = now  # a steady hammer stays coalesced
+            return DUPLICATE
+        st.last_fp, st.last_seen = fingerprint, now
+
+        st.tokens = min(self.burst, st.tokens + (now - st.updated) * self.rate)
+        st.updated = now
+        if st.tokens >= 1:
+            st.tokens -= 1
+            return None
+        if now - st.notified_at >= self.notify_interval:
+            st.notified_at = now
+            return RATE_NOTIFY
+        return RATE
+
+
+def fingerprint(update: Update) -> Optional[str]:
+    msg = update.message
+    if msg is not None:
+        if msg.text is not None:
+            return "t:" + msg.text
+        if msg.contact is not None:
+            return "c:" + msg.contact.phone_number
+        return None  # photos, stickers, ...: rate limit only
+    if update.callback_query is not None:
+        return "q:" + (update.callback_query.data or "")
+    return None
+
+
+class ThrottleHandler(BaseHandler):
+    """
+    check_update drops throttled updates by raising ApplicationHandlerStop
+    (PTB stops processing the update right there); RATE_NOTIFY is handed
+    to `callback`, which replies and stops the update itself.
+    """
+
+    def __init__(self, guard: FloodGuard, callback, exempt: Collection[int] = ()):
+        super().__init__(callback)
+        self.guard = guard
+        self.exempt = exempt
+
+    def check_update(self, update: object):
+        if not isinstance(update, Update) or update.effective_user is None:
+            return None
+        user_id = update.effective_user.id
+        if user_id in self.exempt:
+            return None
+        reason = self.guard.check(user_id, fingerprint(update))
+        if reason is None:
+            return None
+        if metrics.ENABLED:
+            metrics.inc("bot_throttled_total", "reason", reason)
+        if reason == RATE_NOTIFY:
+            return reason
+        raise ApplicationHandlerStop
@@ -0,0 +1,64 @@
+"""
+Concurrent update processing that keeps each conversation in order.
+
+Updates from different users run in parallel (up to
+max_concurrent_updates), updates from the same (chat, user) pair run one
+after another in arrival order - the same key ConversationHandler uses,
+so STATE_NAME -> STATE_PHONE -> STATE_REGION never interleave.
+"""
+import asyncio
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+Key = Tuple[Optional[int], Optional[int]]
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, max_concurrent_updates: int, max_pending_updates: Optional[int] = None):
+        # PTB's semaphore is taken before do_process_update and is also held
+        # while an update waits for its user's lock; keep it as a bound on
+        # in-flight updates and limit real work with our own semaphore, so one
+        # spamming user can't occupy every slot.
+        super().__init__(max_pending_updates or max_concurrent_updates * 16)
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._locks: Dict[Key, asyncio.Lock] = {}
+        self._waiting: Dict[Key, int] = {}
+
+    @staticmethod
+    def _key(update: object) -> Optional[Key]:
+        if not isinstance(update, Update):
+            return None
+        chat, user = update.effective_chat, update.effective_user
+        if chat is None and user is None:
+            return None
+        return (chat.id if chat else None, user.id if user else None)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            # asyncio.Lock wakes waiters FIFO -> arrival order per user
+            async with lock, self._running:
+                await coroutine
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                # keep memory bounded by the users active right now
+                del self._waiting[key]
+                del self._locks[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,244 @@
+"""
+Multi-process mode (WORKERS > 1).
+
+The supervisor (main.py) is the only process talking to Telegram for
+updates: it runs PTB's Updater (polling or webhook) and routes every
+update to worker user_id % WORKERS over a pipe. So one user always
+lands on the same worker: the conversation state, the per-user order
+(PerUserUpdateProcessor) and the flood guard stay per process. Workers
+send their replies themselves. Exception: /broadcast, /broadcast_stop and
+/broadcast_resume always go to worker 0, which owns the broadcast.
+
+What workers share is the registry: the CSV store takes an flock for
+writes and catches up with rows other workers appended
+(storage.RegistrationStore), SQLite handles it with its own locking.
+Workers don't use the write-behind queue (async_storage.init): every
+sign-up is checked and written under that lock before the user is told.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from telegram import Bot, Update
+from telegram.ext import Application, Updater
+
+logger = logging.getLogger(__name__)
+
+# a worker that dies more often than this is crash-looping: stop the bot
+RESTART_LIMIT = 5
+RESTART_WINDOW_S = 60.0
+WATCH_INTERVAL_S = 1.0
+
+
+# broadcasts run in worker 0 only (it also resumes them at startup): one
+# broadcast and one BROADCAST_CHECKPOINT_PATH writer for the whole bot
+BROADCAST_COMMANDS = frozenset({"/broadcast", "/broadcast_stop", "/broadcast_resume"})
+
+
+def _is_broadcast_command(update: Update) -> bool:
+    text = update.message.text if update.message is not None else None
+    if not text or not text.startswith("/broadcast"):
+        return False
+    return text.split(maxsplit=1)[0].split("@", 1)[0] in BROADCAST_COMMANDS
+
+
+def route(update: Update, workers: int) -> int:
+    if _is_broadcast_command(update):
+        return 0
+    user = update.effective_user
+    chat = update.effective_chat
+    key = user.id if user else (chat.id if chat else update.update_id)
+    return key % workers
+
+
+async def serve_pipe(app: Application, conn, on_ready=None) -> None:
+    """Run `app` on updates read from `conn` until the supervisor closes it."""
+    loop = asyncio.get_running_loop()
+    closed = asyncio.Event()
+
+    def reader():
+        # blocking recv in a thread; hand updates to the loop in order
+        try:
+            while True:
+                data = conn.recv_bytes()
+                update = Update.de_json(json.loads(data), app.bot)
+                loop.call_soon_threadsafe(app.update_queue.put_nowait, update)
+        except (EOFError, OSError):
+            pass
+        finally:
+            loop.call_soon_threadsafe(closed.set)
+
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    await app.start()
+    # SIGTERM (systemd, docker stop, kill of the process group): same as the
+    # pipe closing, queued updates and registrations are finished first
+    loop.add_signal_handler(signal.SIGTERM, closed.set)
+    threading.Thread(target=reader, name="worker-pipe", daemon=True).start()
+    if on_ready is not None:
+        on_ready()
+    try:
+        await closed.wait()
+        # finish what is already queued
+        while not app.update_queue.empty():
+            await asyncio.sleep(0.05)
+    finally:
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+def worker_main(conn) -> None:
+    # Ctrl+C goes to the whole process group; the supervisor closes the pipe.
+    # SIGTERM is handled in serve_pipe
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from bot import build_application
+    asyncio.run(serve_pipe(build_application(), conn))
+
+
+class Supervisor:
+    def __init__(self, workers: int, target=worker_main, args: tuple = ()):
+        self.workers = workers
+        self.target = target
+        self.args = args
+        self.procs: List[multiprocessing.Process] = []
+        self.conns = []
+        # one sender thread per worker: keeps the per-worker order, a slow
+        # worker doesn't hold up the others
+        self.senders: List[ThreadPoolExecutor] = []
+        self.restarts: List[List[float]] = []  # monotonic times, per worker
+        self._ctx = multiprocessing.get_context("spawn")
+
+    def _spawn(self, i: int):
+        recv, send = self._ctx.Pipe(duplex=False)
+        # config.WORKER_INDEX / WORKERS are read at import time in the child
+        saved = os.environ.get("WORKERS")
+        os.environ["WORKER_INDEX"] = str(i)
+        os.environ["WORKERS"] = str(self.workers)
+        try:
+            p = self._ctx.Process(target=self.target, args=(recv,) + self.args, name=f"bot-worker-{i}")
+            p.start()
+        finally:
+            os.environ.pop("WORKER_INDEX", None)
+            if saved is None:
+                os.environ.pop("WORKERS", None)
+            else:
+                os.environ["WORKERS"] = saved
+        recv.close()
+        return p, send
+
+    def start(self):
+        for i in range(self.workers):
+            p, send = self._spawn(i)
+            self.procs.append(p)
+            self.conns.append(send)
+            self.senders.append(ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"route-{i}"))
+            self.restarts.append([])
+
+    def restart(self, i: int):
+        """Replace a dead worker. RuntimeError if it keeps dying (RESTART_LIMIT)."""
+        now = time.monotonic()
+        recent = [t for t in self.restarts[i] if now - t < RESTART_WINDOW_S] + [now]
+        self.restarts[i] = recent
+        if len(recent) > RESTART_LIMIT:
+            raise RuntimeError(
+                f"bot-worker-{i} died {len(recent)} times in {RESTART_WINDOW_S:.0f} s "
+                f"(exit code {self.procs[i].exitcode})"
+            )
+        logger.error("bot-worker-%d died (exit code %s), restarting", i, self.procs[i].exitcode)
+        self.conns[i].close()
+        self.procs[i].join(0)
+        self.procs[i], self.conns[i] = self._spawn(i)
+
+    def check(self):
+        """Restart the workers that died (called by supervise every WATCH_INTERVAL_S)."""
+        for i, p in enumerate(self.procs):
+            if not p.is_alive():
+                self.restart(i)
+
+    async def dispatch(self, update: Update):
+        i = route(update, self.workers)
+        data = json.dumps(update.to_dict()).encode()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.senders[i], self.conns[i].send_bytes, data)
+        except OSError:  # BrokenPipeError: the worker is gone
+            if self.procs[i].is_alive():
+                raise
+            self.restart(i)
+            await loop.run_in_executor(self.senders[i], self.conns[i].send_bytes, data)
+
+    def stop(self, timeout: Optional[float] = 60):
+        for ex in self.senders:
+            ex.shutdown(wait=True)
+        for c in self.conns:
+            c.close()
+        for p in self.procs:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+
+
+async def supervise(token: str, workers: int, webhook: Optional[dict] = None):
+    """Fetch updates (polling, or webhook kwargs for Updater.start_webhook) and route them."""
+    sup = Supervisor(workers)
+    sup.start()
+
+    queue: asyncio.Queue = asyncio.Queue()
+    updater = Updater(Bot(token), update_queue=queue)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    failed: List[BaseException] = []
+
+    async def pump():
+        while True:
+            update = await queue.get()
+            try:
+                await sup.dispatch(update)
+            except RuntimeError as e:  # a worker is crash-looping
+                failed.append(e)
+                stop.set()
+                return
+            except Exception:
+                # Telegram already has the ack: log it, keep routing the rest
+                logger.exception("Update %s could not be routed", update.update_id)
+
+    async def watch():
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL_S)
+            try:
+                sup.check()
+            except RuntimeError as e:
+                failed.append(e)
+                stop.set()
+                return
+
+    async with updater:
+        if webhook:
+            await updater.start_webhook(**webhook)
+        else:
+            await updater.start_polling()
+        tasks = [asyncio.create_task(pump()), asyncio.create_task(watch())]
+        await stop.wait()
+        await updater.stop()
+        while not queue.empty() and not failed:
+            await asyncio.sleep(0.05)
+        for task in tasks:
+            task.cancel()
+    sup.stop()
+    if failed:
+        raise failed[0]
@@ -0,0 +1,212 @@
+"""
+Write-behind registration queue with group commit.
+
+handle_region gets an answer as soon as the row passes the uniqueness
+check; rows are committed in batches (every WRITE_QUEUE_MAX_DELAY_MS or
+WRITE_QUEUE_MAX_BATCH rows, whichever first) with one fsync per batch.
+Accepted-but-uncommitted rows stay visible through pending_by_*() so
+"already registered" answers are right immediately.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from storage import make_row
+
+logger = logging.getLogger(__name__)
+
+# async (rows) -> [error or None per row]
+CommitFn = Callable[[List[Dict[str, str]]], Awaitable[List[Optional[str]]]]
+# async (telegram_id, phone) -> error or None, checks committed data
+CheckFn = Callable[[str, str], Awaitable[Optional[str]]]
+
+
+class RegistrationQueue:
+    def __init__(self, commit: CommitFn, check: CheckFn,
+                 max_batch: int = 500, max_delay_s: float = 0.005, max_pending: int = 10_000):
+        self._commit = commit
+        self._check = check
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        # bounded backlog: submit() waits when it's full (backpressure)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._pending_tg: Dict[str, Dict[str, str]] = {}
+        self._pending_phone: Dict[str, Dict[str, str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # rows taken off the queue and not committed yet (see stop())
+        self._batch: List[Dict[str, str]] = []
+
+        self.committed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.commit_ms_last = 0.0
+        self.commit_ms_max = 0.0
+        self._commit_ms_total = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="registration-writer")
+
+    async def stop(self, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        """
+        Graceful shutdown: commit everything already accepted. If that takes
+        longer than timeout (commits keep failing), give up: the rows that
+        were never committed are returned, the caller has to keep them.
+        """
+        if self._task is None:
+            return []
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error("Registration queue not drained in %.0fs, stopping anyway", timeout)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        unsaved, self._batch = self._batch, []
+        while not self._queue.empty():
+            unsaved.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for row in unsaved:
+            self._release(row)
+        return unsaved
+
+    def pending_by_telegram_id(self, telegram_id) -> Optional[Dict[str, str]]:
+        return self._pending_tg.get(str(telegram_id).strip())
+
+    def pending_by_phone(self, phone_norm: str) -> Optional[Dict[str, str]]:
+        return self._pending_phone.get(phone_norm)
+
+    async def submit(self, telegram_id: int, full_name: str, phone: str, region: str) -> Dict[str, str]:
+        """
+        Accept a registration (same rules and errors as
+        storage.add_registration) and queue it for the next batch.
+        """
+        row = make_row(telegram_id, full_name, phone, region)
+        tid, phone_norm = row["telegram_id"], row["phone"]
+
+        # reserve before the first await, so two submits can't both pass
+        if tid in self._pending_tg:
+            raise ValueError("already_registered_by_tg")
+        if phone_norm and phone_norm in self._pending_phone:
+            raise ValueError("phone_already_used")
+        self._reserve(row)
+
+        try:
+            err = await self._check(tid, phone_norm)
+            if err:
+                raise ValueError(err)
+            await self._queue.put(row)
+        except BaseException:
+            self._release(row)
+            raise
+        return dict(row)
+
+    async def add_batch(self, rows: List[Dict[str, str]]) -> List[Optional[str]]:
+        """
+        Commit rows now as one batch (admin import), error or None per row.
+        Rows taken by a pending sign-up are refused; the rest are reserved
+        while the commit runs, so a sign-up submitted meanwhile is refused
+        too instead of being acked and then dropped at its own commit.
+        """
+        errors: List[Optional[str]] = [None] * len(rows)
+        reserved = []
+        for i, row in enumerate(rows):
+            if row["telegram_id"] and row["telegram_id"] in self._pending_tg:
+                errors[i] = "already_registered_by_tg"
+            elif row["phone"] and row["phone"] in self._pending_phone:
+                errors[i] = "phone_already_used"
+            else:
+                self._reserve(row)
+                reserved.append(i)
+        try:
+            committed = await self._commit([rows[i] for i in reserved])
+        finally:
+            for i in reserved:
+                self._release(rows[i])
+        for i, err in zip(reserved, committed):
+            errors[i] = err
+        return errors
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "pending": len(self._pending_tg),
+            "committed": self.committed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "commit_ms_last": self.commit_ms_last,
+            "commit_ms_avg": self._commit_ms_total / self.batches if self.batches else 0.0,
+            "commit_ms_max": self.commit_ms_max,
+        }
+
+    def _reserve(self, row: Dict[str, str]):
+        # imported rows may have no telegram_id
+        if row["telegram_id"]:
+            self._pending_tg[row["telegram_id"]] = row
+        if row["phone"]:
+            self._pending_phone[row["phone"]] = row
+
+    def _release(self, row: Dict[str, str]):
+        if self._pending_tg.get(row["telegram_id"]) is row:
+            del self._pending_tg[row["telegram_id"]]
+        if row["phone"] and self._pending_phone.get(row["phone"]) is row:
+            del self._pending_phone[row["phone"]]
+
+    async def _next_batch(self) -> List[Dict[str, str]]:
+        batch = self._batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_delay_s
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._commit_with_retry(batch)
+                self._batch = []
+            finally:
+                for row in batch:
+                    self._release(row)
+                    self._queue.task_done()
+
+    async def _commit_with_retry(self, batch: List[Dict[str, str]]):
+        delay = 0.1
+        while True:
+            t0 = time.perf_counter()
+            try:
+                errors = await self._commit(batch)
+                break
+            except Exception:
+                # disk full / locked db: keep the rows and try again
+                logger.exception("Registration batch commit failed, retrying in %.1fs", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+        ms = (time.perf_counter() - t0) * 1000
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.commit_ms_last = ms
+        self.commit_ms_max = max(self.commit_ms_max, ms)
+        self._commit_ms_total += ms
+
+        for row, err in zip(batch, errors):
+            if err:
+                # someone else (e.g. a manual edit of the file) took it first
+                self.rejected += 1
+                logger.warning("Queued registration dropped (%s): tg=%s", err, row["telegram_id"])
+            else:
+                self.committed += 1